@@ -1,5 +1,6 @@
 import argparse
 import time
+from collections import defaultdict
 
 import numpy as np
 
@@ -13,12 +14,69 @@ parser.add_argument("--disable-adaptive-block-size", action="store_true")
 parser.add_argument("--mem-resource-type", type=str,
                     choices=["cuda", "unified", "pinned"],
                     default="cuda", help="memory resource type")
+parser.add_argument("--backend", type=str, choices=["cuda", "cpu"],
+                    default="cuda", help="backend to store the graph")
+parser.add_argument("--num-ingest-threads", type=int, default=1,
+                    help="number of worker threads of add_edges")
+parser.add_argument("--compare-grouping", action="store_true",
+                    help="compare the sort-based grouping of the incoming "
+                    "edges with the per-edge hash map grouping")
 args = parser.parse_args()
 
 MB = 1 << 20
 GB = 1 << 30
 
 
+def group_by_hash_map(src_nodes, dst_nodes, timestamps, eids):
+    # NB: the per-edge hash map grouping that `AddEdges` used to do
+    src_to_dst_map = defaultdict(list)
+    src_to_ts_map = defaultdict(list)
+    src_to_eid_map = defaultdict(list)
+    for src, dst, ts, eid in zip(src_nodes.tolist(), dst_nodes.tolist(),
+                                 timestamps.tolist(), eids.tolist()):
+        src_to_dst_map[src].append(dst)
+        src_to_ts_map[src].append(ts)
+        src_to_eid_map[src].append(eid)
+
+    groups = {}
+    for src in src_to_dst_map:
+        idx = np.argsort(src_to_ts_map[src], kind="stable")
+        groups[src] = (np.array(src_to_dst_map[src])[idx],
+                       np.array(src_to_ts_map[src])[idx],
+                       np.array(src_to_eid_map[src])[idx])
+    return groups
+
+
+def group_by_sort(src_nodes, dst_nodes, timestamps, eids):
+    order = np.lexsort((timestamps, src_nodes))
+    src_nodes = src_nodes[order]
+    boundaries = np.flatnonzero(np.diff(src_nodes)) + 1
+    return (boundaries, dst_nodes[order], timestamps[order], eids[order])
+
+
+def benchmark_grouping(df):
+    hash_map_time = 0
+    sort_time = 0
+    for i in range(0, len(df), args.ingestion_batch_size):
+        batch = df[i:i + args.ingestion_batch_size]
+        edges = (batch["src"].values.astype(np.int64),
+                 batch["dst"].values.astype(np.int64),
+                 batch["time"].values.astype(np.float32),
+                 batch["eid"].values.astype(np.int64))
+
+        start = time.time()
+        group_by_hash_map(*edges)
+        hash_map_time += time.time() - start
+
+        start = time.time()
+        group_by_sort(*edges)
+        sort_time += time.time() - start
+
+    print('grouping time: hash map {:.2f}s, sort {:.2f}s, '
+          'speedup: {:.2f}x'.format(hash_map_time, sort_time,
+                                    hash_map_time / sort_time))
+
+
 def main():
     # Create a dynamic graph
     _, _, _, df = load_dataset(args.dataset)
@@ -27,8 +85,9 @@ def main():
     dataset_config["mem_resource_type"] = args.mem_resource_type
     dgraph = build_dynamic_graph(
         **dataset_config,
-        adaptive_block_size=not args.disable_adaptive_block_size)
-    
+        adaptive_block_size=not args.disable_adaptive_block_size,
+        backend=args.backend, num_ingest_threads=args.num_ingest_threads)
+
     for i in range(0, len(df), args.ingestion_batch_size):
         batch = df[i:i + args.ingestion_batch_size]
         src_nodes = batch["src"].values.astype(np.int64)
@@ -40,11 +99,20 @@ def main():
     build_end = time.time()
     build_time = build_end - build_start
 
-    print('build graph time: {:.2f}s, avg_linked_list_length: {:.2f}, graph mem usage: {:.2f}MB, metadata (on GPU) mem usage: {:.2f}MB (adaptive-block-size: {}, mem-resource-type: {})'.format(
-        build_time, dgraph.avg_linked_list_length(),
+    print('build graph time: {:.2f}s, throughput: {:.2f}M edges/s, '
+          'avg_linked_list_length: {:.2f}, graph mem usage: {:.2f}MB, '
+          'metadata (on GPU) mem usage: {:.2f}MB (adaptive-block-size: {}, '
+          'mem-resource-type: {}, backend: {}, '
+          'num-ingest-threads: {})'.format(
+        build_time, 2 * len(df) / build_time / 1e6,
+        dgraph.avg_linked_list_length(),
         dgraph.get_graph_memory_usage() / MB,
         dgraph.get_metadata_memory_usage() / MB,
-        not args.disable_adaptive_block_size, args.mem_resource_type))
+        not args.disable_adaptive_block_size, args.mem_resource_type,
+        args.backend, args.num_ingest_threads))
+
+    if args.compare_grouping:
+        benchmark_grouping(df)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,79 @@
+import argparse
+import time
+
+import numpy as np
+
+from gnnflow.config import get_default_config
+from gnnflow.temporal_sampler import TemporalSampler
+from gnnflow.utils import build_dynamic_graph, load_dataset
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--datasets", type=str, nargs="+",
+                    default=["REDDIT", "GDELT"])
+parser.add_argument("--model", type=str, default="TGAT")
+parser.add_argument("--batch-size", type=int, default=600)
+parser.add_argument("--num-batches", type=int, default=200)
+parser.add_argument("--backend", type=str, choices=["cuda", "cpu"],
+                    default="cuda")
+parser.add_argument("--seed", type=int, default=42)
+args = parser.parse_args()
+
+
+def get_batches(df, num_nodes):
+    """
+    Yield the (root nodes, timestamps) of the batches: the sources, the
+    destinations, and random negative destinations of the edges.
+    """
+    rng = np.random.default_rng(args.seed)
+    for i in range(args.num_batches):
+        rows = df[i * args.batch_size:(i + 1) * args.batch_size]
+        if len(rows) == 0:
+            break
+        root_nodes = np.concatenate(
+            [rows.src.values, rows.dst.values,
+             rng.integers(0, num_nodes, len(rows))]).astype(np.int64)
+        ts = np.tile(rows.time.values, 3).astype(np.float32)
+        yield root_nodes, ts
+
+
+def benchmark(dgraph, model_config, df, dedup_frontier):
+    sampler = TemporalSampler(dgraph, seed=args.seed,
+                              dedup_frontier=dedup_frontier, **model_config)
+    num_sampled_nodes = 0
+    start = time.time()
+    for root_nodes, ts in get_batches(df, dgraph.num_vertices()):
+        for blocks in sampler.sample(root_nodes, ts):
+            for block in blocks:
+                num_sampled_nodes += block.num_src_nodes() - \
+                    block.num_dst_nodes()
+    return time.time() - start, num_sampled_nodes, sampler.frontier_stats()
+
+
+def main():
+    for dataset in args.datasets:
+        _, _, _, df = load_dataset(dataset)
+        model_config, dataset_config = get_default_config(args.model, dataset)
+        dataset_config = dict(dataset_config, backend=args.backend)
+        dgraph = build_dynamic_graph(**dataset_config, dataset_df=df)
+
+        # sample the batches in the middle of the history
+        df = df[len(df) // 2:]
+        base_time, base_sampled_nodes, _ = benchmark(
+            dgraph, model_config, df, False)
+        dedup_time, dedup_sampled_nodes, stats = benchmark(
+            dgraph, model_config, df, True)
+
+        print("{} ({}, fanouts {}):".format(
+            dataset, args.model, model_config["fanouts"]))
+        print("  targets: {} total, {} unique ({:.2%})".format(
+            stats["num_targets"], stats["num_unique_targets"],
+            stats["num_unique_targets"] / max(stats["num_targets"], 1)))
+        print("  sampled nodes: {} / {}".format(base_sampled_nodes,
+                                                dedup_sampled_nodes))
+        print("  time: {:.2f}s without dedup, {:.2f}s with dedup "
+              "({:.2f}x)".format(base_time, dedup_time,
+                                 base_time / dedup_time))
+
+
+if __name__ == "__main__":
+    main()
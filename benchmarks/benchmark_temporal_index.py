@@ -0,0 +1,73 @@
+import argparse
+import time
+
+import numpy as np
+
+from gnnflow import DynamicGraph, TemporalSampler
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--num-nodes", type=int, default=1000)
+parser.add_argument("--list-lengths", type=int, nargs="+",
+                    default=[16, 64, 256, 1024])
+parser.add_argument("--block-size", type=int, default=8)
+parser.add_argument("--batch-size", type=int, default=600)
+parser.add_argument("--num-batches", type=int, default=20)
+parser.add_argument("--fanout", type=int, default=10)
+parser.add_argument("--strategy", type=str, choices=["recent", "uniform"],
+                    default="recent")
+parser.add_argument("--seed", type=int, default=42)
+args = parser.parse_args()
+
+MB = 1 << 20
+GB = 1 << 30
+
+
+def build_graph(list_length, temporal_index):
+    """
+    Build a graph where every node has `list_length` full blocks.
+    """
+    dgraph = DynamicGraph(
+        initial_pool_size=1 * GB, maximum_pool_size=4 * GB,
+        mem_resource_type="cuda", minimum_block_size=args.block_size,
+        blocks_to_preallocate=args.num_nodes * list_length,
+        insertion_policy="insert", adaptive_block_size=False,
+        backend="cpu", temporal_index=temporal_index)
+    num_edges = args.num_nodes * args.block_size
+    src_nodes = np.repeat(np.arange(args.num_nodes), args.block_size)
+    rng = np.random.default_rng(args.seed)
+    for i in range(list_length):
+        dst_nodes = rng.integers(0, args.num_nodes, num_edges)
+        timestamps = np.tile(np.arange(args.block_size, dtype=np.float32),
+                             args.num_nodes) + i * args.block_size
+        dgraph.add_edges(src_nodes, dst_nodes, timestamps)
+    return dgraph
+
+
+def benchmark(dgraph, list_length):
+    sampler = TemporalSampler(dgraph, [args.fanout],
+                              sample_strategy=args.strategy, seed=args.seed)
+    rng = np.random.default_rng(args.seed)
+    max_timestamp = list_length * args.block_size
+    start = time.time()
+    for _ in range(args.num_batches):
+        root_nodes = rng.integers(0, args.num_nodes, args.batch_size)
+        # query timestamps spread over the whole history
+        timestamps = rng.uniform(0, max_timestamp, args.batch_size).astype(
+            np.float32)
+        sampler._sampler.sample(root_nodes, timestamps)
+    return time.time() - start
+
+
+def main():
+    for list_length in args.list_lengths:
+        times = []
+        for temporal_index in [False, True]:
+            dgraph = build_graph(list_length, temporal_index)
+            times.append(benchmark(dgraph, list_length))
+        print('list length: {}, linked list walk: {:.3f}s, temporal index: '
+              '{:.3f}s, speedup: {:.2f}x'.format(
+                  list_length, times[0], times[1], times[0] / times[1]))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,10 @@
+import io
+import os
 import sys
+from typing import Optional
+
+import numpy as np
+import pandas as pd
 
 MiB = 1 << 20
 GiB = 1 << 30
@@ -16,8 +22,9 @@ def get_default_config(model: str, dataset: str):
         Default configuration for the model and dataset.
     """
     model, dataset = model.lower(), dataset.lower()
-    assert model in ["tgn", "tgat", "dysat", "graphsage", "gat"] and dataset in [
-        "wiki", "reddit", "mooc", "lastfm", "gdelt", "mag"], "Invalid model or dataset."
+    assert model in ["tgn", "tgat", "dysat", "graphsage", "gat"] and \
+        dataset in ["wiki", "reddit", "mooc", "lastfm", "gdelt", "mag"], \
+        "Invalid model or dataset."
 
     mod = sys.modules[__name__]
     return getattr(
@@ -177,3 +184,186 @@ _mag_default_config = {
     "node_feature": True,
     "edge_feature": False,
 }
+
+
+def profile_edges(df: pd.DataFrame, undirected: bool = False,
+                  num_edges: Optional[int] = None,
+                  batch_size: Optional[int] = None) -> dict:
+    """
+    Profile a sample of the edges and tune the data config for it.
+
+    The minimum block size is the median number of edges that a source
+    vertex gets in an ingestion batch. The degrees are skewed, so the mean
+    would over-allocate the blocks of most (low-degree) vertices, while the
+    few larger insertions get blocks of their own size anyway. The graph
+    memory usage and the number of blocks are predicted from the sample
+    and scaled by `num_edges`. If the sample is smaller than the dataset,
+    the source vertices that are not in the sample are estimated with the
+    Chao1 estimator. They count as degree-1 vertices for the median and get
+    a block of the minimum size each.
+
+    Args:
+        df: the sampled edges, ordered by time, with "src", "dst" and "time"
+            columns. The sample should be spread over the whole dataset
+            (e.g., the chunks read by `profile_dataset`) rather than a
+            prefix of it.
+        undirected: whether the graph is undirected.
+        num_edges: optional, the number of edges in the whole dataset.
+            Default: the number of sampled edges.
+        batch_size: optional, the number of edges in an ingestion batch.
+            Default: the whole dataset is added at once, like
+            `build_dynamic_graph`.
+
+    Returns:
+        A dict of the tuned data config ("config"), the predicted graph
+        memory usage in bytes and number of blocks, and the profile: the
+        degree histogram of the sampled source vertices and the average
+        per-source batch size.
+    """
+    # NB: imported here to keep the config importable without the graph
+    from .dynamic_graph import DynamicGraph, _log2_histogram, kBlockSpaceSize
+
+    src = df["src"].values.astype(np.int64)
+    dst = df["dst"].values.astype(np.int64)
+    ts = df["time"].values.astype(np.float32)
+    num_sampled_edges = len(src)
+    if num_sampled_edges == 0:
+        raise ValueError("No edges to profile")
+    num_edges = num_sampled_edges if num_edges is None else int(num_edges)
+    scale = num_edges / num_sampled_edges
+
+    sources = np.concatenate([src, dst]) if undirected else src
+    source_ids, degrees = np.unique(sources, return_counts=True)
+
+    if batch_size is None:
+        # one insertion per source vertex: a block of its whole degree
+        avg_batch_size = len(sources) * scale / len(source_ids)
+        num_unseen = _estimate_unseen(degrees) if scale > 1 else 0
+        # NB: the unseen vertices count as the lowest degree
+        minimum_block_size = int(np.ceil(np.median(np.concatenate(
+            [degrees * scale, np.ones(num_unseen)]))))
+        capacities = np.maximum(np.ceil(degrees * scale), minimum_block_size)
+        graph_memory_usage = (int(capacities.sum()) +
+                              num_unseen * minimum_block_size) * \
+            kBlockSpaceSize
+        num_blocks = len(source_ids) + num_unseen
+    else:
+        batch_ids = np.arange(num_sampled_edges) // batch_size
+        if undirected:
+            batch_ids = np.concatenate([batch_ids, batch_ids])
+        _, insertion_sizes = np.unique(
+            batch_ids * (int(source_ids[-1]) + 1) + sources,
+            return_counts=True)
+        avg_batch_size = len(sources) / len(insertion_sizes)
+        minimum_block_size = int(np.ceil(np.median(insertion_sizes)))
+
+        # replay the sample on the cpu backend, which allocates the blocks
+        # in the same way as the cuda backend
+        dgraph = DynamicGraph(0, 1 << 62, "cuda", minimum_block_size, 0,
+                              "insert", backend="cpu")
+        for i in range(0, num_sampled_edges, batch_size):
+            dgraph.add_edges(src[i:i + batch_size], dst[i:i + batch_size],
+                             ts[i:i + batch_size], add_reverse=undirected)
+        stats = dgraph.stats()
+        graph_memory_usage = int(stats["graph_memory_usage"] * scale)
+        num_blocks = int(np.ceil(stats["num_blocks"] * scale))
+
+    initial_pool_size = max(_align_up(graph_memory_usage, MiB), MiB)
+    return {
+        "config": {
+            "initial_pool_size": initial_pool_size,
+            "maximum_pool_size": 2 * initial_pool_size,
+            "minimum_block_size": minimum_block_size,
+            "blocks_to_preallocate": int(np.clip(
+                1 << (num_blocks - 1).bit_length(), 1024, 65536)),
+        },
+        "predicted_graph_memory_usage": graph_memory_usage,
+        "predicted_num_blocks": num_blocks,
+        "num_edges": num_edges,
+        "num_sampled_edges": num_sampled_edges,
+        "num_sampled_source_vertices": len(source_ids),
+        "degree_histogram": _log2_histogram(degrees),
+        "avg_batch_size": avg_batch_size,
+    }
+
+
+def profile_dataset(dataset: str, data_dir: Optional[str] = None,
+                    sample_size: int = 1000000, undirected: bool = False,
+                    batch_size: Optional[int] = None,
+                    num_chunks: int = 100) -> dict:
+    """
+    Profile about `sample_size` edges of a dataset and tune the data config
+    for it. See `profile_edges`.
+
+    The edges are read in `num_chunks` contiguous chunks at evenly spaced
+    offsets of edges.csv, so that the sample covers the whole time span
+    while the ingestion batches within a chunk stay intact. The number of
+    edges of the whole dataset is estimated from the size of edges.csv if
+    the chunks do not cover all of it.
+
+    Args:
+        dataset: the name of the dataset.
+        data_dir: the directory where the dataset is stored.
+        sample_size: the number of edges to scan.
+        undirected: whether the graph is undirected.
+        batch_size: optional, the number of edges in an ingestion batch.
+        num_chunks: the number of chunks to read.
+    """
+    if data_dir is None:
+        data_dir = os.path.join(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            "data")
+
+    path = os.path.join(data_dir, dataset, 'edges.csv')
+    if not os.path.exists(path):
+        raise ValueError('{} does not exist'.format(path))
+
+    chunk_size = max(sample_size // num_chunks, 1)
+    if batch_size is not None:
+        # NB: keep the ingestion batches within the chunks
+        chunk_size = max(chunk_size // batch_size, 1) * batch_size
+        num_chunks = max(sample_size // chunk_size, 1)
+
+    lines = []
+    with open(path, 'rb') as f:
+        header = f.readline()
+        data_size = os.path.getsize(path) - len(header)
+        offsets = [len(header) + data_size * i // num_chunks
+                   for i in range(num_chunks + 1)]
+        covered = True
+        for begin, end in zip(offsets[:-1], offsets[1:]):
+            # start at the first line that starts at or after `begin`
+            f.seek(begin - 1)
+            f.readline()
+            for _ in range(chunk_size):
+                if f.tell() >= end:
+                    break
+                lines.append(f.readline())
+            else:
+                covered = covered and f.tell() >= end
+
+    df = pd.read_csv(io.BytesIO(header + b''.join(lines)),
+                     usecols=['src', 'dst', 'time'])
+    num_edges = len(df)
+    if not covered:
+        # estimate the number of edges by the average size of a line
+        sample_bytes = sum(len(line) for line in lines)
+        num_lines = data_size * len(lines) / max(sample_bytes, 1)
+        num_edges = max(int(round(num_lines)), len(lines))
+
+    return profile_edges(df, undirected, num_edges, batch_size)
+
+
+def _estimate_unseen(degrees: np.ndarray) -> int:
+    """
+    Estimate the number of source vertices that are not in a sample from
+    the numbers of vertices seen once and twice (Chao1).
+    """
+    num_singletons = int(np.count_nonzero(degrees == 1))
+    num_doubletons = int(np.count_nonzero(degrees == 2))
+    return num_singletons * (num_singletons - 1) // \
+        (2 * (num_doubletons + 1))
+
+
+def _align_up(size: int, alignment: int) -> int:
+    return (size + alignment - 1) // alignment * alignment
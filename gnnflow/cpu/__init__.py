@@ -0,0 +1,2 @@
+from .dynamic_graph import _DynamicGraph
+from .temporal_sampler import SamplingResult, _TemporalSampler
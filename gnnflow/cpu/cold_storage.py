@@ -0,0 +1,119 @@
+import os
+import tempfile
+from typing import Tuple
+
+import numpy as np
+
+from .utils import grow
+
+MB = 1 << 20
+
+
+class _ColdBlockStore:
+    """
+    An append-only store of cold temporal blocks on disk.
+
+    Blocks are packed into large segment files. A new segment file is started
+    once the current one exceeds `segment_size` bytes. Each block is stored as
+    its dst_nodes (int64), timestamps (float32), and eids (int64) arrays
+    back to back, and is located by a row of the in-memory index.
+    """
+
+    def __init__(self, directory: str, segment_size: int = 256 * MB):
+        """
+        Args:
+            directory: the directory of the segment files. Each store
+                writes to its own subdirectory so that several graphs can
+                share the directory.
+            segment_size: the size of a segment file in bytes.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self._directory = tempfile.mkdtemp(prefix="cold_", dir=directory)
+        self._segment_size = segment_size
+
+        self._segment_paths = []
+        self._file = None
+        self._file_size = 0
+
+        # index of the cold blocks
+        self._segment = np.zeros(0, dtype=np.int64)
+        self._offset = np.zeros(0, dtype=np.int64)
+        self._size = np.zeros(0, dtype=np.int64)
+        self._start_timestamp = np.zeros(0, dtype=np.float32)
+        self._end_timestamp = np.zeros(0, dtype=np.float32)
+        self._num_blocks = 0
+        self._num_bytes = 0
+
+    def __del__(self):
+        if self._file is not None:
+            self._file.close()
+
+    def append(self, dst_nodes: np.ndarray, timestamps: np.ndarray,
+               eids: np.ndarray) -> int:
+        """
+        Append a block to the current segment file.
+
+        Returns: the id of the cold block.
+        """
+        if self._file is None or self._file_size >= self._segment_size:
+            self._roll_segment()
+
+        block = self._num_blocks
+        self._num_blocks += 1
+        num_blocks = self._num_blocks
+        self._segment = grow(self._segment, num_blocks)
+        self._offset = grow(self._offset, num_blocks)
+        self._size = grow(self._size, num_blocks)
+        self._start_timestamp = grow(self._start_timestamp, num_blocks)
+        self._end_timestamp = grow(self._end_timestamp, num_blocks)
+
+        self._segment[block] = len(self._segment_paths) - 1
+        self._offset[block] = self._file_size
+        self._size[block] = len(dst_nodes)
+        self._start_timestamp[block] = timestamps[0]
+        self._end_timestamp[block] = timestamps[-1]
+
+        for array, dtype in [(dst_nodes, np.int64), (timestamps, np.float32),
+                             (eids, np.int64)]:
+            data = np.ascontiguousarray(array, dtype=dtype).tobytes()
+            self._file.write(data)
+            self._file_size += len(data)
+            self._num_bytes += len(data)
+        self._file.flush()
+        return block
+
+    def read(self, block: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Read a block back from its segment file.
+
+        Returns: A tuple of (dst_nodes, timestamps, eids).
+        """
+        size = int(self._size[block])
+        path = self._segment_paths[int(self._segment[block])]
+        with open(path, "rb") as f:
+            f.seek(int(self._offset[block]))
+            dst_nodes = np.fromfile(f, dtype=np.int64, count=size)
+            timestamps = np.fromfile(f, dtype=np.float32, count=size)
+            eids = np.fromfile(f, dtype=np.int64, count=size)
+        return dst_nodes, timestamps, eids
+
+    def start_timestamp(self, block: int) -> float:
+        return float(self._start_timestamp[block])
+
+    def end_timestamp(self, block: int) -> float:
+        return float(self._end_timestamp[block])
+
+    def num_blocks(self) -> int:
+        return self._num_blocks
+
+    def num_bytes(self) -> int:
+        return self._num_bytes
+
+    def _roll_segment(self):
+        if self._file is not None:
+            self._file.close()
+        path = os.path.join(self._directory, "segment_{}.bin".format(
+            len(self._segment_paths)))
+        self._segment_paths.append(path)
+        self._file = open(path, "wb")
+        self._file_size = 0
@@ -0,0 +1,1746 @@
+import heapq
+import os
+import types
+from collections import OrderedDict
+from typing import Tuple
+
+import numpy as np
+
+from .cold_storage import _ColdBlockStore
+from .utils import grow, lower_bound, ragged_arange
+
+# NB: keep in sync with `kBlockSpaceSize` in csrc/common.h
+kBlockSpaceSize = np.dtype(np.int64).itemsize * 2 + \
+    np.dtype(np.float32).itemsize
+
+kInvalidBlock = -1
+kMaxEid = np.iinfo(np.int64).max
+
+kInt32Min = np.iinfo(np.int32).min
+kInt32Max = np.iinfo(np.int32).max
+
+
+def _next_power_of_two(n: np.ndarray) -> np.ndarray:
+    n = np.maximum(np.asarray(n, dtype=np.int64), 1)
+    return np.left_shift(1, np.ceil(np.log2(n)).astype(np.int64))
+
+
+class _DynamicGraph:
+    """
+    A pure-CPU dynamic graph with the same interface as
+    `libgnnflow._DynamicGraph`.
+
+    It keeps the block adjacency list layout of the CUDA implementation in
+    NumPy arrays. Edges live in a memory pool of three flat arrays
+    (dst_nodes, timestamps, eids). A temporal block is a slice of the pool
+    described by a row of the block table. Each node has a doubly linked list
+    of blocks (head is the oldest, tail is the newest).
+
+    With the compact payload, the pool stores the dst_nodes as int32 and the
+    eids as int32 deltas from a base eid, i.e., 12 bytes per edge instead of
+    `kBlockSpaceSize`. The pool is widened to int64 once they overflow. The
+    edges are decoded on read (see `_read_payload`).
+    """
+
+    def __init__(self, initial_pool_size: int, maximum_pool_size: int,
+                 minimum_block_size: int, blocks_to_preallocate: int,
+                 insertion_policy: str, adaptive_block_size: bool,
+                 compact_payload: bool = False):
+        """
+        Args:
+            initial_pool_size: the initial size of the memory pool in bytes.
+            maximum_pool_size: the maximum size of the memory pool in bytes.
+            minimum_block_size: the minimum size of the temporal block.
+            blocks_to_preallocate: the number of blocks to preallocate.
+            insertion_policy: "insert" or "replace".
+            adaptive_block_size: whether to use adaptive block size.
+            compact_payload: whether to use the compact payload encoding.
+        """
+        if insertion_policy not in ["insert", "replace"]:
+            raise ValueError("Invalid insertion policy: {}".format(
+                insertion_policy))
+
+        self._insertion_policy = insertion_policy
+        self._minimum_block_size = max(int(minimum_block_size), 1)
+        self._adaptive_block_size = adaptive_block_size
+
+        # memory pool
+        id_dtype = np.int32 if compact_payload else np.int64
+        # the bytes of an edge in the pool
+        self._edge_size = 2 * np.dtype(id_dtype).itemsize + \
+            np.dtype(np.float32).itemsize
+        self._maximum_pool_edges = maximum_pool_size // self._edge_size
+        pool_edges = min(initial_pool_size, maximum_pool_size) // \
+            self._edge_size
+        self._pool_dst_nodes = np.zeros(pool_edges, dtype=id_dtype)
+        self._pool_timestamps = np.zeros(pool_edges, dtype=np.float32)
+        self._pool_eids = np.zeros(pool_edges, dtype=id_dtype)
+        # the eids in an int32 pool are deltas from it. It is set by the
+        # first insertion.
+        self._eid_base = None if compact_payload else 0
+        self._pool_used = 0
+        # capacity -> offsets of free chunks
+        self._pool_free_chunks = {}
+        self._allocated = 0
+
+        # block table
+        num_blocks = max(int(blocks_to_preallocate), 1)
+        self._block_offset = np.zeros(num_blocks, dtype=np.int64)
+        self._block_size = np.zeros(num_blocks, dtype=np.int64)
+        self._block_capacity = np.zeros(num_blocks, dtype=np.int64)
+        self._block_start_timestamp = np.zeros(num_blocks, dtype=np.float32)
+        self._block_end_timestamp = np.zeros(num_blocks, dtype=np.float32)
+        self._block_prev = np.full(num_blocks, kInvalidBlock, dtype=np.int64)
+        self._block_next = np.full(num_blocks, kInvalidBlock, dtype=np.int64)
+        # the node whose linked list the block belongs to
+        self._block_node = np.zeros(num_blocks, dtype=np.int64)
+        self._block_num_deleted = np.zeros(num_blocks, dtype=np.int64)
+        # a superset of the range of the eids in the block, which narrows
+        # the search of `_locate_edges`
+        self._block_min_eid = np.full(num_blocks, kMaxEid, dtype=np.int64)
+        self._block_max_eid = np.full(num_blocks, -1, dtype=np.int64)
+        self._num_blocks = 0
+        self._free_blocks = []
+
+        # tombstones of the deleted edges in the pool. They keep their
+        # timestamps so that the blocks stay sorted. It is only allocated
+        # once an edge is deleted.
+        self._pool_deleted = None
+        self._num_deleted = 0
+        # bumped whenever the edges at existing pool positions may be moved
+        # or rewritten (rather than appended), so that the samplers can
+        # tell when their per-block data is stale
+        self._layout_version = 0
+
+        # node table
+        self._head = np.zeros(0, dtype=np.int64)
+        self._tail = np.zeros(0, dtype=np.int64)
+        self._list_num_edges = np.zeros(0, dtype=np.int64)
+        self._list_num_insertions = np.zeros(0, dtype=np.int64)
+        self._list_size = np.zeros(0, dtype=np.int64)
+        self._max_node_id = 0
+
+        self._node_mask = np.zeros(0, dtype=bool)
+        self._src_node_mask = np.zeros(0, dtype=bool)
+        self._num_nodes = 0
+        self._num_src_nodes = 0
+
+        self._edge_mask = np.zeros(0, dtype=bool)
+        self._num_edges = 0
+        # eid -> number of copies in the graph. It is only allocated once an
+        # edge id is added more than once (e.g., `add_reverse`).
+        self._edge_refcount = None
+
+        self._num_saved_blocks = {}
+
+        # retention policy
+        self._retention_window = 0.0
+        self._max_edges = 0
+        # the latest timestamp in the graph
+        self._clock = 0.0
+        # a min-heap of (the end timestamp of the oldest block, node)
+        # NB: the end timestamp can be stale since the oldest block can still
+        # grow.
+        self._oldest_blocks = []
+        self._num_evicted_blocks = 0
+        self._num_evicted_bytes = 0
+
+        # cold storage
+        self._cold_store = None
+        self._cold_cache_size = 0
+        # node -> ids of the cold blocks (oldest first)
+        self._cold_blocks = {}
+        # node -> number of the newest cold blocks faulted back
+        self._num_faulted = {}
+        # faulted block -> (node, position in the cold blocks of the node),
+        # in LRU order
+        self._faulted = OrderedDict()
+        self._cold_cache_hits = 0
+        self._cold_cache_misses = 0
+
+        # temporal index: the blocks of each node (oldest first) and their
+        # start timestamps, packed into a pool like the edges. The entries
+        # of a node are [offset, offset + length) of its region
+        # [begin, begin + capacity) in the pool.
+        # NB: unlike the end timestamp, the start timestamp of a block does
+        # not change once the block is linked.
+        self._temporal_index = False
+        self._index_blocks = np.zeros(0, dtype=np.int64)
+        self._index_start_timestamps = np.zeros(0, dtype=np.float32)
+        self._index_used = 0
+        self._index_garbage = 0
+        self._index_begin = np.zeros(0, dtype=np.int64)
+        self._index_offset = np.zeros(0, dtype=np.int64)
+        self._index_length = np.zeros(0, dtype=np.int64)
+        self._index_capacity = np.zeros(0, dtype=np.int64)
+
+        # snapshots
+        self._num_snapshots = 0
+        # the pool chunks freed while snapshots are alive, as (offset,
+        # capacity). They are not reused until all snapshots are released.
+        self._deferred_chunks = []
+
+    def add_edges(self, source_vertices: np.ndarray,
+                  target_vertices: np.ndarray, timestamps: np.ndarray,
+                  eids: np.ndarray):
+        self._add_edges(source_vertices, target_vertices, timestamps, eids,
+                        merge=False)
+
+    def merge_edges(self, source_vertices: np.ndarray,
+                    target_vertices: np.ndarray, timestamps: np.ndarray,
+                    eids: np.ndarray):
+        """
+        Like `add_edges`, but the edges can be older than the existing edges
+        of their source nodes. The linked list of such a node is merged with
+        its edges into one block, which is much slower than appending.
+        """
+        self._add_edges(source_vertices, target_vertices, timestamps, eids,
+                        merge=True)
+
+    def _add_edges(self, source_vertices: np.ndarray,
+                   target_vertices: np.ndarray, timestamps: np.ndarray,
+                   eids: np.ndarray, merge: bool):
+        src_nodes = np.asarray(source_vertices, dtype=np.int64)
+        dst_nodes = np.asarray(target_vertices, dtype=np.int64)
+        timestamps = np.asarray(timestamps, dtype=np.float32)
+        eids = np.asarray(eids, dtype=np.int64)
+        if len(src_nodes) == 0:
+            raise ValueError("No edges to add")
+        if not len(src_nodes) == len(dst_nodes) == len(timestamps) == \
+                len(eids):
+            raise ValueError("The number of source vertices, target "
+                             "vertices, timestamps, and edge ids must be "
+                             "the same.")
+
+        self._add_nodes(max(src_nodes.max(), dst_nodes.max()))
+        self._update_bookkeeping(src_nodes, dst_nodes, eids)
+
+        if self._faulted:
+            # NB: new edges must not be appended to the faulted cold blocks
+            tails = self._tail[np.unique(src_nodes)]
+            for block in tails[tails != kInvalidBlock].tolist():
+                if block in self._faulted:
+                    self._release_cold_blocks(self._faulted[block][0])
+
+        # group the edges by source node and sort them by timestamp
+        # NB: lexsort is stable
+        order = np.lexsort((timestamps, src_nodes))
+        src_nodes = src_nodes[order]
+        dst_nodes = dst_nodes[order]
+        timestamps = timestamps[order]
+        eids = eids[order]
+
+        boundaries = np.flatnonzero(np.diff(src_nodes)) + 1
+        starts = np.concatenate([[0], boundaries])
+        ends = np.concatenate([boundaries, [len(src_nodes)]])
+        if merge:
+            self._merge_edge_segments(src_nodes[starts], starts, ends,
+                                      dst_nodes, timestamps, eids)
+        else:
+            self._add_edge_segments(src_nodes[starts], starts, ends,
+                                    dst_nodes, timestamps, eids)
+
+        self._clock = max(self._clock, float(timestamps.max()))
+        self.apply_retention_policy()
+
+    def load_csr(self, indptr: np.ndarray, indices: np.ndarray,
+                 timestamps: np.ndarray, eids: np.ndarray):
+        """
+        Initialize an empty graph from CSR arrays without copying the edges.
+
+        The arrays (e.g., memory-mapped files) become the memory pool and
+        each non-empty row becomes a single full block. The pool is copied
+        on the first insertion that needs to grow it.
+        """
+        if self._num_blocks > 0:
+            raise RuntimeError("The graph must be empty")
+
+        self._layout_version += 1
+        indptr = np.asarray(indptr, dtype=np.int64)
+        num_edges = len(indices)
+        if num_edges == 0:
+            return
+
+        degrees = np.diff(indptr)
+        rows = np.flatnonzero(degrees)
+        self._add_nodes(max(rows[-1], indices.max()))
+
+        if self._pool_eids.dtype == np.int32:
+            # NB: the arrays are copied to encode them
+            indices, eids = self._encode_payload(indices, eids)
+            self._pool_dst_nodes = np.asarray(
+                indices, dtype=self._pool_dst_nodes.dtype)
+            self._pool_eids = np.asarray(eids, dtype=self._pool_eids.dtype)
+        else:
+            self._pool_dst_nodes = indices
+            self._pool_eids = eids
+        self._pool_timestamps = timestamps
+        self._pool_used = num_edges
+        self._allocated = num_edges * self._edge_size
+        self._maximum_pool_edges = max(self._maximum_pool_edges, num_edges)
+
+        num_blocks = len(rows)
+        self._num_blocks = num_blocks
+        self._block_offset = indptr[rows]
+        self._block_size = degrees[rows]
+        self._block_capacity = degrees[rows]
+        self._block_start_timestamp = timestamps[indptr[rows]]
+        self._block_end_timestamp = timestamps[indptr[rows + 1] - 1]
+        self._block_prev = np.full(num_blocks, kInvalidBlock, dtype=np.int64)
+        self._block_next = np.full(num_blocks, kInvalidBlock, dtype=np.int64)
+        self._block_node = rows.astype(np.int64)
+        self._block_num_deleted = np.zeros(num_blocks, dtype=np.int64)
+        self._block_min_eid = np.minimum.reduceat(
+            np.asarray(eids, dtype=np.int64), indptr[rows])
+        self._block_max_eid = np.maximum.reduceat(
+            np.asarray(eids, dtype=np.int64), indptr[rows])
+        self._pool_deleted = None
+        self._num_deleted = 0
+
+        blocks = np.arange(num_blocks, dtype=np.int64)
+        self._head[rows] = blocks
+        self._tail[rows] = blocks
+        self._list_num_edges[rows] = degrees[rows]
+        self._list_num_insertions[rows] = 1
+        self._list_size[rows] = 1
+
+        self._src_node_mask[rows] = True
+        self._node_mask[rows] = True
+        self._node_mask[indices] = True
+        self._num_src_nodes = num_blocks
+        self._num_nodes = int(np.count_nonzero(self._node_mask))
+
+        refcount = np.bincount(eids).astype(np.int32)
+        self._edge_mask = refcount > 0
+        self._num_edges = int(np.count_nonzero(self._edge_mask))
+        if self._num_edges < num_edges:
+            self._edge_refcount = refcount
+
+        self._clock = float(self._block_end_timestamp.max())
+        self.set_retention_policy(self._retention_window, self._max_edges)
+        if self._temporal_index:
+            self._rebuild_temporal_index()
+
+    def _add_nodes(self, max_node: int):
+        max_node = int(max_node)
+        if max_node < self._max_node_id:
+            return
+        self._max_node_id = max_node
+        num_nodes = max_node + 1
+        if num_nodes <= len(self._head):
+            return
+        self._head = grow(self._head, num_nodes, kInvalidBlock)
+        self._tail = grow(self._tail, num_nodes, kInvalidBlock)
+        self._list_num_edges = grow(self._list_num_edges, num_nodes)
+        self._list_num_insertions = grow(self._list_num_insertions, num_nodes)
+        self._list_size = grow(self._list_size, num_nodes)
+        self._node_mask = grow(self._node_mask, num_nodes, False)
+        self._src_node_mask = grow(self._src_node_mask, num_nodes, False)
+        if self._temporal_index:
+            self._index_begin = grow(self._index_begin, num_nodes)
+            self._index_offset = grow(self._index_offset, num_nodes)
+            self._index_length = grow(self._index_length, num_nodes)
+            self._index_capacity = grow(self._index_capacity, num_nodes)
+
+    def _update_bookkeeping(self, src_nodes: np.ndarray, dst_nodes: np.ndarray,
+                            eids: np.ndarray):
+        src_nodes = np.unique(src_nodes)
+        nodes = np.unique(np.concatenate([src_nodes, dst_nodes]))
+        self._num_src_nodes += int(
+            np.count_nonzero(~self._src_node_mask[src_nodes]))
+        self._num_nodes += int(np.count_nonzero(~self._node_mask[nodes]))
+        self._src_node_mask[src_nodes] = True
+        self._node_mask[nodes] = True
+
+        self._edge_mask = grow(self._edge_mask, int(eids.max()) + 1, False)
+        unique_eids, counts = np.unique(eids, return_counts=True)
+        is_new = ~self._edge_mask[unique_eids]
+        if self._edge_refcount is None and (
+                len(unique_eids) < len(eids) or not np.all(is_new)):
+            # the edge ids are duplicated
+            self._edge_refcount = self._edge_mask.astype(np.int32)
+        self._num_edges += int(np.count_nonzero(is_new))
+        self._edge_mask[unique_eids] = True
+        if self._edge_refcount is not None:
+            self._edge_refcount = grow(self._edge_refcount,
+                                        len(self._edge_mask))
+            self._edge_refcount[unique_eids] += counts.astype(np.int32)
+
+    def _add_edge_segments(self, nodes: np.ndarray, starts: np.ndarray,
+                           ends: np.ndarray, dst_nodes: np.ndarray,
+                           timestamps: np.ndarray, eids: np.ndarray):
+        """
+        Add the edges in [starts[i], ends[i]) to the linked list of nodes[i]
+        for all i at once. The nodes are unique and the edges of each segment
+        are sorted by timestamps.
+        """
+        num_edges = ends - starts
+        tails = self._tail[nodes]
+        has_tail = tails != kInvalidBlock
+
+        if self._insertion_policy == "replace":
+            # reallocate the tail blocks without enough space
+            tail_blocks = tails[has_tail]
+            realloc = self._block_size[tail_blocks] + num_edges[has_tail] > \
+                self._block_capacity[tail_blocks]
+            for block, size in zip(
+                    tail_blocks[realloc].tolist(),
+                    (self._block_size[tail_blocks[realloc]] +
+                     num_edges[has_tail][realloc]).tolist()):
+                self._reallocate_block(block, size)
+
+        # fill the tail blocks first
+        num_to_tail = np.zeros(len(nodes), dtype=np.int64)
+        num_to_tail[has_tail] = np.minimum(
+            num_edges[has_tail], self._block_capacity[tails[has_tail]] -
+            self._block_size[tails[has_tail]])
+        num_to_new = num_edges - num_to_tail
+
+        # NB: the incoming edges must not be older than the tails, whether
+        # they go into the tails or into new blocks after them
+        to_tail = num_to_tail > 0
+        to_new = num_to_new > 0
+        if np.any(timestamps[starts] < 0):
+            raise ValueError("The timestamps must be non-negative")
+        if np.any(self._block_end_timestamp[tails[has_tail]] >
+                  timestamps[starts[has_tail]]):
+            raise ValueError("The timestamps are older than the existing "
+                             "edges in the graph")
+
+        self._copy_edge_segments(tails[to_tail], starts[to_tail],
+                                 num_to_tail[to_tail], dst_nodes, timestamps,
+                                 eids)
+
+        # allocate and insert new blocks for the rest of the edges
+        if np.any(to_new):
+            nodes_to_new = nodes[to_new]
+            num_insertions = self._list_num_insertions[nodes_to_new]
+            avg_edges_per_insertion = np.where(
+                num_insertions == 0, num_to_new[to_new],
+                self._list_num_edges[nodes_to_new] //
+                np.maximum(num_insertions, 1))
+            new_block_sizes = num_to_new[to_new]
+            if self._adaptive_block_size:
+                # NB: the first block of a list is not rounded up
+                new_block_sizes = np.where(
+                    has_tail[to_new],
+                    _next_power_of_two(np.maximum(new_block_sizes,
+                                                  avg_edges_per_insertion)),
+                    new_block_sizes)
+
+            blocks = self._allocate_blocks(new_block_sizes)
+            self._copy_edge_segments(blocks,
+                                     starts[to_new] + num_to_tail[to_new],
+                                     num_to_new[to_new], dst_nodes, timestamps,
+                                     eids)
+            self._insert_blocks(nodes_to_new, blocks)
+
+        self._list_num_edges[nodes] += num_edges
+        self._list_num_insertions[nodes] += 1
+
+    def _merge_edge_segments(self, nodes: np.ndarray, starts: np.ndarray,
+                             ends: np.ndarray, dst_nodes: np.ndarray,
+                             timestamps: np.ndarray, eids: np.ndarray):
+        """
+        Like `_add_edge_segments`, but the edges of a segment can be older
+        than the tail of the node. Such a linked list is merged with the
+        edges into one block.
+        """
+        tails = self._tail[nodes]
+        append = (tails == kInvalidBlock) | \
+            (timestamps[starts] >= self._block_end_timestamp[tails])
+        if np.any(append):
+            self._add_edge_segments(nodes[append], starts[append],
+                                    ends[append], dst_nodes, timestamps, eids)
+        if np.all(append):
+            return
+
+        self._layout_version += 1
+        for node, start, end in zip(nodes[~append].tolist(),
+                                    starts[~append].tolist(),
+                                    ends[~append].tolist()):
+            if self._cold_blocks.get(node):
+                raise RuntimeError(
+                    "Edges older than the tail cannot be inserted once the "
+                    "blocks are spilled to the cold storage")
+            self._check_no_snapshots("Inserting edges older than the tail")
+            blocks = []
+            block = int(self._head[node])
+            while block != kInvalidBlock:
+                blocks.append(block)
+                block = int(self._block_next[block])
+            self._merge_blocks(node, np.array(blocks, dtype=np.int64),
+                               dst_nodes[start:end], timestamps[start:end],
+                               eids[start:end])
+            self._list_num_edges[node] += end - start
+            self._list_num_insertions[node] += 1
+        if self._temporal_index:
+            self._rebuild_temporal_index()
+
+    def _copy_edge_segments(self, blocks: np.ndarray, starts: np.ndarray,
+                            num_edges: np.ndarray, dst_nodes: np.ndarray,
+                            timestamps: np.ndarray, eids: np.ndarray):
+        """
+        Append the edges in [starts[i], starts[i] + num_edges[i]) to blocks[i]
+        for all i at once.
+        """
+        if len(blocks) == 0:
+            return
+        sizes = self._block_size[blocks]
+        if np.any(sizes + num_edges > self._block_capacity[blocks]):
+            raise RuntimeError("Not enough space in the temporal block")
+
+        positions = ragged_arange(self._block_offset[blocks] + sizes,
+                                  num_edges)
+        indices = ragged_arange(starts, num_edges)
+        encoded_dst_nodes, encoded_eids = self._encode_payload(
+            dst_nodes[indices], eids[indices])
+        self._pool_dst_nodes[positions] = encoded_dst_nodes
+        self._pool_timestamps[positions] = timestamps[indices]
+        self._pool_eids[positions] = encoded_eids
+        if self._pool_deleted is not None:
+            self._pool_deleted[positions] = False
+
+        self._block_size[blocks] = sizes + num_edges
+        self._block_start_timestamp[blocks] = np.minimum(
+            self._block_start_timestamp[blocks], timestamps[starts])
+        self._block_end_timestamp[blocks] = timestamps[starts + num_edges - 1]
+        segments = np.repeat(np.arange(len(blocks)), num_edges)
+        min_eids = np.full(len(blocks), kMaxEid, dtype=np.int64)
+        max_eids = np.full(len(blocks), -1, dtype=np.int64)
+        np.minimum.at(min_eids, segments, eids[indices])
+        np.maximum.at(max_eids, segments, eids[indices])
+        self._block_min_eid[blocks] = np.minimum(
+            self._block_min_eid[blocks], min_eids)
+        self._block_max_eid[blocks] = np.maximum(
+            self._block_max_eid[blocks], max_eids)
+
+    def _encode_payload(self, dst_nodes: np.ndarray,
+                        eids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Encode the edges for the pool. An int32 pool is widened first if
+        the edges do not fit in it.
+
+        Returns: A tuple of (dst_nodes, eids) to store.
+        """
+        if len(eids) == 0 or self._pool_eids.dtype == np.int64 and \
+                self._pool_dst_nodes.dtype == np.int64:
+            return dst_nodes, eids
+
+        widen_dst_nodes = self._pool_dst_nodes.dtype == np.int32 and \
+            int(dst_nodes.max()) > kInt32Max
+        widen_eids = False
+        if self._pool_eids.dtype == np.int32:
+            if self._eid_base is None:
+                self._eid_base = int(eids.min())
+            widen_eids = int(eids.min()) - self._eid_base < kInt32Min or \
+                int(eids.max()) - self._eid_base > kInt32Max
+        if widen_dst_nodes or widen_eids:
+            self._widen_pool(widen_dst_nodes, widen_eids)
+
+        if self._pool_eids.dtype == np.int32:
+            eids = eids - self._eid_base
+        return dst_nodes, eids
+
+    def _widen_pool(self, dst_nodes: bool, eids: bool):
+        """
+        Convert the int32 dst_nodes and/or eids of the pool to int64.
+        """
+        old_edge_size = self._edge_size
+        if dst_nodes:
+            self._pool_dst_nodes = self._pool_dst_nodes.astype(np.int64)
+        if eids:
+            self._pool_eids = self._pool_eids.astype(np.int64) + \
+                (self._eid_base or 0)
+            self._eid_base = 0
+        self._edge_size = self._pool_dst_nodes.itemsize + \
+            self._pool_timestamps.itemsize + self._pool_eids.itemsize
+        self._allocated = self._allocated // old_edge_size * self._edge_size
+        self._maximum_pool_edges = self._maximum_pool_edges * \
+            old_edge_size // self._edge_size
+
+    def _read_eids(self, positions) -> np.ndarray:
+        """
+        Return the decoded eids at the positions (a slice or an array) of
+        the pool.
+        """
+        eids = self._pool_eids[positions]
+        if eids.dtype == np.int64:
+            return eids
+        return eids.astype(np.int64) + (self._eid_base or 0)
+
+    def _read_payload(self, positions) -> \
+            Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return the decoded (dst_nodes, timestamps, eids) at the positions (a
+        slice or an array) of the pool.
+        """
+        return (self._pool_dst_nodes[positions].astype(np.int64, copy=False),
+                self._pool_timestamps[positions], self._read_eids(positions))
+
+    def edge_size(self) -> int:
+        """
+        Return the bytes of an edge in the memory pool.
+        """
+        return self._edge_size
+
+    def _reserve_pool(self, size: int):
+        if size <= len(self._pool_dst_nodes):
+            return
+        if size > self._maximum_pool_edges:
+            raise MemoryError(
+                "Failed to allocate memory for temporal blocks of total "
+                "size {}".format(size - self._pool_used))
+        new_size = min(max(size, 2 * len(self._pool_dst_nodes)),
+                       self._maximum_pool_edges)
+        self._pool_dst_nodes = grow(self._pool_dst_nodes, new_size)
+        self._pool_timestamps = grow(self._pool_timestamps, new_size)
+        self._pool_eids = grow(self._pool_eids, new_size)
+        if self._pool_deleted is not None:
+            self._pool_deleted = grow(self._pool_deleted, new_size, False)
+
+    def _allocate_pool(self, capacity: int) -> int:
+        free_chunks = self._pool_free_chunks.get(capacity)
+        if free_chunks:
+            offset = free_chunks.pop()
+        else:
+            offset = self._pool_used
+            self._reserve_pool(offset + capacity)
+            self._pool_used += capacity
+        self._allocated += capacity * self._edge_size
+        return offset
+
+    def _deallocate_pool(self, offset: int, capacity: int):
+        self._layout_version += 1
+        if self._num_snapshots > 0:
+            # NB: a snapshot may still read the old copy of a reallocated
+            # block
+            self._deferred_chunks.append((offset, capacity))
+        else:
+            self._pool_free_chunks.setdefault(capacity, []).append(offset)
+        self._allocated -= capacity * self._edge_size
+
+    def _allocate_blocks(self, sizes: np.ndarray) -> np.ndarray:
+        capacities = np.maximum(np.asarray(sizes, dtype=np.int64),
+                                self._minimum_block_size)
+        num_blocks = len(capacities)
+
+        if any(self._pool_free_chunks.values()):
+            # reuse the freed chunks
+            offsets = np.array([self._allocate_pool(capacity)
+                                for capacity in capacities.tolist()],
+                               dtype=np.int64)
+        else:
+            # bump allocation
+            ends = self._pool_used + np.cumsum(capacities)
+            self._reserve_pool(int(ends[-1]))
+            offsets = ends - capacities
+            self._pool_used = int(ends[-1])
+            self._allocated += int(capacities.sum()) * self._edge_size
+
+        num_reused = min(len(self._free_blocks), num_blocks)
+        reused = [self._free_blocks.pop() for _ in range(num_reused)]
+        blocks = np.concatenate([
+            np.array(reused, dtype=np.int64),
+            np.arange(self._num_blocks,
+                      self._num_blocks + num_blocks - num_reused)])
+        self._num_blocks += num_blocks - num_reused
+
+        size = self._num_blocks
+        self._block_offset = grow(self._block_offset, size)
+        self._block_size = grow(self._block_size, size)
+        self._block_capacity = grow(self._block_capacity, size)
+        self._block_start_timestamp = grow(self._block_start_timestamp, size)
+        self._block_end_timestamp = grow(self._block_end_timestamp, size)
+        self._block_prev = grow(self._block_prev, size, kInvalidBlock)
+        self._block_next = grow(self._block_next, size, kInvalidBlock)
+        self._block_node = grow(self._block_node, size)
+        self._block_num_deleted = grow(self._block_num_deleted, size)
+        self._block_min_eid = grow(self._block_min_eid, size, kMaxEid)
+        self._block_max_eid = grow(self._block_max_eid, size, -1)
+
+        self._block_offset[blocks] = offsets
+        self._block_size[blocks] = 0
+        self._block_capacity[blocks] = capacities
+        self._block_start_timestamp[blocks] = np.finfo(np.float32).max
+        self._block_end_timestamp[blocks] = 0
+        self._block_prev[blocks] = kInvalidBlock
+        self._block_next[blocks] = kInvalidBlock
+        self._block_num_deleted[blocks] = 0
+        self._block_min_eid[blocks] = kMaxEid
+        self._block_max_eid[blocks] = -1
+        return blocks
+
+    def _deallocate_block(self, block: int):
+        if self._block_num_deleted[block] > 0:
+            self._pool_deleted[self._block_slice(block)] = False
+            self._num_deleted -= int(self._block_num_deleted[block])
+            self._block_num_deleted[block] = 0
+        if self._block_capacity[block] > 0:
+            self._deallocate_pool(int(self._block_offset[block]),
+                                  int(self._block_capacity[block]))
+        self._block_size[block] = 0
+        self._block_capacity[block] = 0
+        self._free_blocks.append(block)
+
+    def _reallocate_block(self, block: int, size: int):
+        capacity = max(int(size), self._minimum_block_size)
+        offset = self._allocate_pool(capacity)
+        old_offset = int(self._block_offset[block])
+        num_edges = int(self._block_size[block])
+        pools = [self._pool_dst_nodes, self._pool_timestamps, self._pool_eids]
+        if self._pool_deleted is not None:
+            pools.append(self._pool_deleted)
+        for pool in pools:
+            pool[offset:offset + num_edges] = \
+                pool[old_offset:old_offset + num_edges]
+        self._deallocate_pool(old_offset, int(self._block_capacity[block]))
+        self._block_offset[block] = offset
+        self._block_capacity[block] = capacity
+
+    def _insert_blocks(self, nodes: np.ndarray, blocks: np.ndarray):
+        """
+        Append blocks[i] to the tail of the linked list of nodes[i]. The
+        nodes are unique.
+        """
+        tails = self._tail[nodes]
+        has_tail = tails != kInvalidBlock
+        self._head[nodes[~has_tail]] = blocks[~has_tail]
+        if self._retention_window > 0 or self._max_edges > 0:
+            for block, node in zip(blocks[~has_tail].tolist(),
+                                   nodes[~has_tail].tolist()):
+                heapq.heappush(self._oldest_blocks, (
+                    float(self._block_end_timestamp[block]), node))
+        self._block_next[tails[has_tail]] = blocks[has_tail]
+        self._block_prev[blocks] = tails
+        self._block_next[blocks] = kInvalidBlock
+        self._block_node[blocks] = nodes
+        self._tail[nodes] = blocks
+        self._list_size[nodes] += 1
+        if self._temporal_index:
+            self._index_append(nodes, blocks)
+
+    def _remove_block(self, node: int, block: int):
+        prev = int(self._block_prev[block])
+        next = int(self._block_next[block])
+        if prev == kInvalidBlock:
+            self._head[node] = next
+        else:
+            self._block_next[prev] = next
+        if next == kInvalidBlock:
+            self._tail[node] = prev
+        else:
+            self._block_prev[next] = prev
+        self._list_size[node] -= 1
+        if self._temporal_index:
+            self._index_remove(node, block)
+
+    def _block_slice(self, block: int) -> slice:
+        offset = int(self._block_offset[block])
+        return slice(offset, offset + int(self._block_size[block]))
+
+    def _live_mask(self, positions) -> np.ndarray:
+        """
+        Return whether the edges at the positions (a slice or an array) of
+        the pool are not deleted.
+        """
+        if self._num_deleted == 0:
+            if isinstance(positions, slice):
+                return np.ones(positions.stop - positions.start, dtype=bool)
+            return np.ones(len(positions), dtype=bool)
+        return ~self._pool_deleted[positions]
+
+    def _save_block_to_file(self, block: int, node: int):
+        # NB: same layout as `TemporalBlockAllocator::SaveToFile`, except that
+        # prev/next are block ids instead of pointers.
+        file_name = "temporal_block_{}-{}.bin".format(
+            node, self._num_saved_blocks.get(node, 0))
+        s = self._block_slice(block)
+        with open(file_name, "wb") as f:
+            np.array([self._block_size[block], self._block_capacity[block]],
+                     dtype=np.uint64).tofile(f)
+            np.array([self._block_start_timestamp[block],
+                      self._block_end_timestamp[block]],
+                     dtype=np.float32).tofile(f)
+            for array in self._read_payload(s):
+                array.tofile(f)
+            np.array([self._block_prev[block], self._block_next[block]],
+                     dtype=np.int64).tofile(f)
+        self._num_saved_blocks[node] = self._num_saved_blocks.get(node, 0) + 1
+        return os.path.abspath(file_name)
+
+    def _remove_edge_ids(self, eids: np.ndarray):
+        if self._edge_refcount is None:
+            removed = eids
+        else:
+            unique_eids, counts = np.unique(eids, return_counts=True)
+            self._edge_refcount[unique_eids] -= counts.astype(np.int32)
+            removed = unique_eids[self._edge_refcount[unique_eids] == 0]
+        self._edge_mask[removed] = False
+        self._num_edges -= len(removed)
+
+    def delete_edges(self, eids: np.ndarray) -> int:
+        """
+        Delete all copies of the edges by tombstoning them in their blocks.
+        The tombstones are dropped by `compact` or once they take up half of
+        the edges in the blocks.
+
+        Returns: the number of deleted edges.
+        """
+        self._check_no_cold_blocks()
+        self._check_no_snapshots("Deleting edges")
+        eids = np.unique(np.asarray(eids, dtype=np.int64))
+        eids = eids[(eids >= 0) & (eids < len(self._edge_mask))]
+        eids = eids[self._edge_mask[eids]]
+        if len(eids) == 0:
+            return 0
+
+        self._tombstone(*self._locate_edges(eids))
+        self._edge_mask[eids] = False
+        if self._edge_refcount is not None:
+            self._edge_refcount[eids] = 0
+        self._num_edges -= len(eids)
+        self._maybe_purge_tombstones()
+        return len(eids)
+
+    def update_edges(self, eids: np.ndarray, timestamps: np.ndarray):
+        """
+        Move all copies of the edges to new timestamps. The old copies are
+        tombstoned and the edges are inserted again. They are appended to
+        the linked list if they are newer than its edges. Otherwise, the
+        linked list is merged with them into one block.
+        """
+        self._check_no_cold_blocks()
+        self._check_no_snapshots("Updating edges")
+        eids = np.asarray(eids, dtype=np.int64)
+        timestamps = np.asarray(timestamps, dtype=np.float32)
+        if len(eids) != len(timestamps):
+            raise ValueError("The number of edge ids and timestamps must be "
+                             "the same.")
+        if len(np.unique(eids)) != len(eids):
+            raise ValueError("The edge ids must be unique")
+        present = (eids >= 0) & (eids < len(self._edge_mask))
+        present[present] = self._edge_mask[eids[present]]
+        if not np.all(present):
+            raise ValueError("Edges not found: {}".format(
+                eids[~present].tolist()))
+        if np.any(timestamps < 0):
+            raise ValueError("The timestamps must be non-negative")
+        if len(eids) == 0:
+            return
+
+        blocks, positions = self._locate_edges(eids)
+        nodes = self._block_node[blocks]
+        dst_nodes, _, moved_eids = self._read_payload(positions)
+        order = np.argsort(eids)
+        new_timestamps = timestamps[order][np.searchsorted(eids[order],
+                                                           moved_eids)]
+        self._tombstone(blocks, positions)
+
+        # group the edges by node and sort them by the new timestamps
+        order = np.lexsort((new_timestamps, nodes))
+        nodes = nodes[order]
+        dst_nodes = dst_nodes[order]
+        new_timestamps = new_timestamps[order]
+        moved_eids = moved_eids[order]
+        boundaries = np.flatnonzero(np.diff(nodes)) + 1
+        starts = np.concatenate([[0], boundaries])
+        ends = np.concatenate([boundaries, [len(nodes)]])
+        self._merge_edge_segments(nodes[starts], starts, ends, dst_nodes,
+                                  new_timestamps, moved_eids)
+
+        self._clock = max(self._clock, float(new_timestamps.max()))
+        self.apply_retention_policy()
+        self._maybe_purge_tombstones()
+
+    def _check_no_cold_blocks(self):
+        if self._cold_store is not None and self._cold_store.num_blocks() > 0:
+            raise RuntimeError("Edges cannot be deleted or updated once "
+                               "blocks are spilled to the cold storage")
+
+    def _locate_edges(self, eids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Scan the blocks whose eid ranges contain any of the edges for the
+        live copies of the edges.
+
+        Returns: A tuple of (blocks, positions in the pool) of the copies.
+        """
+        eids = np.sort(eids)
+        blocks = np.flatnonzero(self._block_size[:self._num_blocks] > 0)
+        # NB: the eids mostly grow with the timestamps, so the ranges of
+        # the blocks are narrow and only a few blocks are candidates
+        blocks = blocks[
+            np.searchsorted(eids, self._block_max_eid[blocks], side="right") >
+            np.searchsorted(eids, self._block_min_eid[blocks])]
+        sizes = self._block_size[blocks]
+        positions = ragged_arange(self._block_offset[blocks], sizes)
+        found = np.isin(self._read_eids(positions), eids) & \
+            self._live_mask(positions)
+        return np.repeat(blocks, sizes)[found], positions[found]
+
+    def _tombstone(self, blocks: np.ndarray, positions: np.ndarray):
+        if self._pool_deleted is None:
+            self._pool_deleted = np.zeros(len(self._pool_eids), dtype=bool)
+        self._pool_deleted[positions] = True
+        np.add.at(self._block_num_deleted, blocks, 1)
+        np.subtract.at(self._list_num_edges, self._block_node[blocks], 1)
+        self._num_deleted += len(positions)
+
+    def _maybe_purge_tombstones(self):
+        if 2 * self._num_deleted > \
+                int(self._block_size[:self._num_blocks].sum()):
+            self._purge_tombstones()
+
+    def _purge_tombstones(self) -> Tuple[int, int]:
+        """
+        Drop the deleted edges from the blocks in place. The blocks left
+        empty are removed.
+
+        Returns: A tuple of (reclaimed bytes, reclaimed blocks).
+        """
+        if self._num_deleted == 0:
+            return 0, 0
+
+        self._layout_version += 1
+        blocks = np.flatnonzero(self._block_num_deleted[:self._num_blocks] > 0)
+        sizes = self._block_size[blocks]
+        positions = ragged_arange(self._block_offset[blocks], sizes)
+        live = ~self._pool_deleted[positions]
+        new_sizes = np.bincount(np.repeat(np.arange(len(blocks)), sizes)[live],
+                                minlength=len(blocks))
+        dst = ragged_arange(self._block_offset[blocks], new_sizes)
+        for pool in [self._pool_dst_nodes, self._pool_timestamps,
+                     self._pool_eids]:
+            pool[dst] = pool[positions[live]]
+        self._pool_deleted[positions] = False
+        self._block_size[blocks] = new_sizes
+        self._block_num_deleted[blocks] = 0
+        self._num_deleted = 0
+
+        nonempty = new_sizes > 0
+        first = self._block_offset[blocks[nonempty]]
+        self._block_start_timestamp[blocks[nonempty]] = \
+            self._pool_timestamps[first]
+        self._block_end_timestamp[blocks[nonempty]] = \
+            self._pool_timestamps[first + new_sizes[nonempty] - 1]
+
+        empty = blocks[~nonempty]
+        num_bytes = int(self._block_capacity[empty].sum()) * self._edge_size
+        for block in empty.tolist():
+            self._remove_block(int(self._block_node[block]), block)
+            self._deallocate_block(block)
+
+        # NB: the start and end timestamps of the blocks may have changed
+        if self._temporal_index:
+            self._rebuild_temporal_index()
+        if self._retention_window > 0 or self._max_edges > 0:
+            self.set_retention_policy(self._retention_window, self._max_edges)
+        return num_bytes, len(empty)
+
+    def offload_old_blocks(self, timestamp: float,
+                           to_file: bool = False) -> int:
+        self._check_no_snapshots("Offloading blocks")
+        self._release_cold_blocks()
+        num_blocks = 0
+        for node in np.flatnonzero(self._node_mask).tolist():
+            cur = int(self._head[node])  # the oldest block for the node
+            while cur != kInvalidBlock:
+                next = int(self._block_next[cur])
+                if self._block_end_timestamp[cur] < timestamp:
+                    self._evict_block(node, cur, to_file)
+                    num_blocks += 1
+                cur = next
+        return num_blocks
+
+    def _evict_block(self, node: int, block: int, to_file: bool):
+        s = self._block_slice(block)
+        # NB: the ids of the deleted edges are already removed
+        self._remove_edge_ids(self._read_eids(s)[self._live_mask(s)])
+        self._remove_block(node, block)
+        self._num_evicted_blocks += 1
+        self._num_evicted_bytes += int(self._block_capacity[block]) * \
+            self._edge_size
+        if to_file:
+            self._save_block_to_file(block, node)
+        self._deallocate_block(block)
+
+    def set_retention_policy(self, retention_window: float, max_edges: int):
+        self._retention_window = float(retention_window)
+        self._max_edges = int(max_edges)
+
+        # rebuild the index of the oldest blocks
+        self._oldest_blocks = []
+        if self._retention_window > 0 or self._max_edges > 0:
+            nodes = np.flatnonzero(self._head != kInvalidBlock)
+            self._oldest_blocks = list(zip(
+                self._block_end_timestamp[self._head[nodes]].tolist(),
+                nodes.tolist()))
+            heapq.heapify(self._oldest_blocks)
+
+    def apply_retention_policy(self) -> int:
+        if self._num_snapshots > 0:
+            # NB: deferred until the snapshots are released
+            return 0
+        if self._faulted and (self._retention_window > 0 or
+                              self._max_edges > 0):
+            self._release_cold_blocks()
+        num_blocks = 0
+        heap = self._oldest_blocks
+        if self._retention_window > 0:
+            cutoff = self._clock - self._retention_window
+            while heap and heap[0][0] < cutoff:
+                _, node = heapq.heappop(heap)
+                head = int(self._head[node])
+                while head != kInvalidBlock and \
+                        self._block_end_timestamp[head] < cutoff:
+                    self._evict_block(node, head, False)
+                    num_blocks += 1
+                    head = int(self._head[node])
+                if head != kInvalidBlock:
+                    heapq.heappush(heap, (
+                        float(self._block_end_timestamp[head]), node))
+
+        if self._max_edges > 0:
+            # evict the oldest blocks in the graph first
+            while self._num_edges > self._max_edges and heap:
+                end_timestamp, node = heapq.heappop(heap)
+                head = int(self._head[node])
+                if head == kInvalidBlock:
+                    continue
+                if self._block_end_timestamp[head] == end_timestamp:
+                    self._evict_block(node, head, False)
+                    num_blocks += 1
+                    head = int(self._head[node])
+                if head != kInvalidBlock:
+                    heapq.heappush(heap, (
+                        float(self._block_end_timestamp[head]), node))
+        return num_blocks
+
+    def compact(self, min_fill: float) -> Tuple[int, int]:
+        """
+        Merge the runs of adjacent sparse blocks of each node into
+        right-sized blocks. A block is sparse if it holds fewer edges than
+        `min_fill` times the largest block of the node. A run is cut before
+        it outgrows the largest block. A single sparse block is only
+        rewritten if it is less than `min_fill` full. The tail is skipped
+        since it is still being filled. The deleted edges are dropped first.
+
+        Returns: A tuple of (reclaimed bytes, reclaimed blocks).
+        """
+        if not 0 < min_fill <= 1:
+            raise ValueError("min_fill must be in (0, 1]")
+        self._check_no_snapshots("Compacting blocks")
+
+        self._release_cold_blocks()
+        num_bytes, num_blocks = self._purge_tombstones()
+        for node in np.flatnonzero(self._list_size > 1).tolist():
+            blocks = []
+            block = int(self._head[node])
+            while block != kInvalidBlock:
+                blocks.append(block)
+                block = int(self._block_next[block])
+            blocks = np.array(blocks, dtype=np.int64)
+            sizes = self._block_size[blocks]
+            capacities = self._block_capacity[blocks]
+            target = int(capacities.max())
+            sparse = sizes < min_fill * target
+            sparse[-1] = False
+
+            i = 0
+            while i < len(blocks) - 1:
+                if not sparse[i]:
+                    i += 1
+                    continue
+                j = i + 1
+                total = int(sizes[i])
+                while sparse[j] and total + sizes[j] <= target:
+                    total += int(sizes[j])
+                    j += 1
+                if total > 0 and (j - i > 1 or
+                                  sizes[i] < min_fill * capacities[i]):
+                    block = self._merge_blocks(node, blocks[i:j])
+                    num_blocks += j - i - 1
+                    num_bytes += (int(capacities[i:j].sum()) -
+                                  int(self._block_capacity[block])) * \
+                        self._edge_size
+                i = j
+
+        if self._temporal_index:
+            self._rebuild_temporal_index()
+        return num_bytes, num_blocks
+
+    def _merge_blocks(self, node: int, blocks: np.ndarray,
+                      dst_nodes: np.ndarray = None,
+                      timestamps: np.ndarray = None,
+                      eids: np.ndarray = None) -> int:
+        """
+        Replace adjacent blocks of the node with one right-sized block. The
+        deleted edges are dropped. If given, the edges (dst_nodes,
+        timestamps, eids) are merged into the block in timestamp order.
+        """
+        positions = ragged_arange(self._block_offset[blocks],
+                                  self._block_size[blocks])
+        positions = positions[self._live_mask(positions)]
+        merged = list(self._read_payload(positions))
+        if dst_nodes is not None:
+            merged = [np.concatenate([a, b]) for a, b in zip(
+                merged, [dst_nodes, timestamps, eids])]
+            order = np.argsort(merged[1], kind="stable")
+            merged = [a[order] for a in merged]
+        dst_nodes, timestamps, eids = merged
+        num_edges = len(dst_nodes)
+
+        block = int(self._allocate_blocks(np.array([num_edges]))[0])
+        self._copy_edge_segments(np.array([block]), np.array([0]),
+                                 np.array([num_edges]), dst_nodes,
+                                 timestamps, eids)
+
+        prev = int(self._block_prev[blocks[0]])
+        next = int(self._block_next[blocks[-1]])
+        self._block_node[block] = node
+        self._block_prev[block] = prev
+        self._block_next[block] = next
+        if prev == kInvalidBlock:
+            self._head[node] = block
+        else:
+            self._block_next[prev] = block
+        if next == kInvalidBlock:
+            self._tail[node] = block
+        else:
+            self._block_prev[next] = block
+        self._list_size[node] -= len(blocks) - 1
+
+        for old_block in blocks.tolist():
+            self._deallocate_block(old_block)
+        return block
+
+    def snapshot(self) -> "_GraphSnapshot":
+        """
+        Take a snapshot of the graph. See `_GraphSnapshot`.
+
+        While snapshots are alive, the blocks are only appended to: the
+        operations that rewrite or free blocks (e.g., `delete_edges` and
+        `compact`) raise RuntimeError, the retention policy is deferred
+        until the last snapshot is released, and the pool chunks of the
+        reallocated blocks are not reused.
+        """
+        if self._cold_store is not None:
+            raise RuntimeError(
+                "Snapshots are not supported with the cold storage")
+        self._num_snapshots += 1
+        return _GraphSnapshot(self)
+
+    def num_snapshots(self) -> int:
+        return self._num_snapshots
+
+    def _release_snapshot(self):
+        self._num_snapshots -= 1
+        if self._num_snapshots == 0:
+            for offset, capacity in self._deferred_chunks:
+                self._pool_free_chunks.setdefault(capacity, []).append(offset)
+            self._deferred_chunks = []
+            self.apply_retention_policy()
+
+    def _check_no_snapshots(self, operation: str):
+        if self._num_snapshots > 0:
+            raise RuntimeError(
+                "{} is not allowed while snapshots are alive".format(
+                    operation))
+
+    def enable_cold_storage(self, directory: str, cache_size: int):
+        self._cold_store = _ColdBlockStore(directory)
+        self._cold_cache_size = int(cache_size)
+
+    def spill_old_blocks(self, timestamp: float) -> int:
+        if self._cold_store is None:
+            raise RuntimeError("Cold storage is not enabled")
+        self._check_no_snapshots("Spilling blocks")
+
+        self._release_cold_blocks()
+        num_blocks = 0
+        for node in np.flatnonzero(self._head != kInvalidBlock).tolist():
+            head = int(self._head[node])  # the oldest block for the node
+            while head != kInvalidBlock and \
+                    self._block_end_timestamp[head] < timestamp:
+                s = self._block_slice(head)
+                live = self._live_mask(s)
+                if np.any(live):
+                    self._cold_blocks.setdefault(node, []).append(
+                        self._cold_store.append(*[
+                            array[live] for array in self._read_payload(s)]))
+                self._remove_block(node, head)
+                self._deallocate_block(head)
+                num_blocks += 1
+                head = int(self._head[node])
+        return num_blocks
+
+    def _trim_cold_cache(self):
+        """
+        Release the faulted blocks in LRU order until the cache fits. It is
+        only called before an access so that the blocks faulted back during
+        the access stay resident until it ends.
+        """
+        while len(self._faulted) > self._cold_cache_size:
+            node, position = next(iter(self._faulted.values()))
+            self._unload_cold_blocks(node, position)
+
+    def _fault_in(self, nodes: np.ndarray, start_timestamps: np.ndarray):
+        """
+        Fault the newest non-resident cold block of each node back if it
+        may have edges newer than the start timestamp. The block is linked
+        before the head of the list.
+        """
+        nodes, inverse = np.unique(nodes, return_inverse=True)
+        min_start_timestamps = np.full(len(nodes), np.inf)
+        np.minimum.at(min_start_timestamps, inverse, start_timestamps)
+        for node, start_timestamp in zip(nodes.tolist(),
+                                         min_start_timestamps.tolist()):
+            cold_blocks = self._cold_blocks.get(node)
+            if not cold_blocks:
+                continue
+            position = len(cold_blocks) - self._num_faulted.get(node, 0) - 1
+            if position < 0 or self._cold_store.end_timestamp(
+                    cold_blocks[position]) < start_timestamp:
+                continue
+            self._load_cold_block(node, position)
+
+    def _fault_in_all(self, nodes: np.ndarray):
+        for node in np.unique(nodes).tolist():
+            cold_blocks = self._cold_blocks.get(node)
+            if not cold_blocks:
+                continue
+            self._touch_faulted_blocks(node)
+            for position in range(len(cold_blocks) -
+                                  self._num_faulted.get(node, 0) - 1, -1, -1):
+                self._load_cold_block(node, position)
+
+    def _load_cold_block(self, node: int, position: int):
+        dst_nodes, timestamps, eids = self._cold_store.read(
+            self._cold_blocks[node][position])
+        block = int(self._allocate_blocks(np.array([len(dst_nodes)]))[0])
+        self._copy_edge_segments(np.array([block]), np.array([0]),
+                                 np.array([len(dst_nodes)]), dst_nodes,
+                                 timestamps, eids)
+
+        # link the block before the head
+        head = int(self._head[node])
+        self._block_node[block] = node
+        self._block_next[block] = head
+        if head == kInvalidBlock:
+            self._tail[node] = block
+        else:
+            self._block_prev[head] = block
+        self._head[node] = block
+        self._list_size[node] += 1
+        if self._temporal_index:
+            self._index_prepend(node, block)
+
+        self._num_faulted[node] = self._num_faulted.get(node, 0) + 1
+        self._faulted[block] = (node, position)
+        self._cold_cache_misses += 1
+
+    def _unload_cold_blocks(self, node: int, position: int):
+        """
+        Release the faulted cold block at the position and all the older
+        faulted cold blocks of the node.
+        """
+        for _ in range(position - (len(self._cold_blocks[node]) -
+                                   self._num_faulted[node]) + 1):
+            head = int(self._head[node])
+            del self._faulted[head]
+            self._remove_block(node, head)
+            self._deallocate_block(head)
+        self._num_faulted[node] = len(self._cold_blocks[node]) - position - 1
+
+    def _release_cold_blocks(self, node: int = None):
+        nodes = list(self._num_faulted.keys()) if node is None else [node]
+        for node in nodes:
+            if self._num_faulted.get(node, 0) > 0:
+                self._unload_cold_blocks(node,
+                                         len(self._cold_blocks[node]) - 1)
+
+    def _touch_cold_blocks(self, blocks: np.ndarray):
+        if not self._faulted:
+            return
+        for block in set(blocks.tolist()).intersection(self._faulted):
+            self._faulted.move_to_end(block)
+            self._cold_cache_hits += 1
+
+    def _touch_faulted_blocks(self, node: int):
+        blocks = []
+        block = int(self._head[node])
+        for _ in range(self._num_faulted.get(node, 0)):
+            blocks.append(block)
+            block = int(self._block_next[block])
+        # the oldest block is released first, so it is touched last
+        for block in reversed(blocks):
+            self._faulted.move_to_end(block)
+            self._cold_cache_hits += 1
+
+    def enable_temporal_index(self):
+        self._temporal_index = True
+        self._rebuild_temporal_index()
+
+    def _find_blocks(self, nodes: np.ndarray,
+                     timestamps: np.ndarray) -> np.ndarray:
+        """
+        For each node, binary-search the temporal index for the newest block
+        whose start timestamp is not greater than the timestamp, i.e., the
+        newest block that may have edges before the timestamp. Newer blocks
+        can be skipped by the sampler. Return the head if there is no such
+        block.
+        """
+        lo = self._index_offset[nodes]
+        positions = lower_bound(self._index_start_timestamps, lo,
+                                lo + self._index_length[nodes], timestamps,
+                                side="right") - 1
+        blocks = self._head[nodes]
+        found = positions >= lo
+        blocks[found] = self._index_blocks[positions[found]]
+        return blocks
+
+    def _rebuild_temporal_index(self):
+        num_nodes = len(self._head)
+        lengths = self._list_size[:num_nodes].copy()
+        capacities = np.where(lengths > 0, _next_power_of_two(lengths), 0)
+        begins = np.cumsum(capacities) - capacities
+        self._index_used = int(capacities.sum())
+        self._index_garbage = 0
+        self._index_blocks = np.full(self._index_used, kInvalidBlock,
+                                     dtype=np.int64)
+        self._index_start_timestamps = np.zeros(self._index_used,
+                                                dtype=np.float32)
+
+        # walk the linked lists of all nodes from head to tail at the same
+        # time
+        curr = self._head.copy()
+        active = np.flatnonzero(curr != kInvalidBlock)
+        step = 0
+        while len(active) > 0:
+            block = curr[active]
+            self._index_blocks[begins[active] + step] = block
+            self._index_start_timestamps[begins[active] + step] = \
+                self._block_start_timestamp[block]
+            curr[active] = self._block_next[block]
+            active = active[curr[active] != kInvalidBlock]
+            step += 1
+
+        self._index_begin = begins
+        self._index_offset = begins.copy()
+        self._index_length = lengths
+        self._index_capacity = capacities
+
+    def _relocate_index(self, nodes: np.ndarray, capacities: np.ndarray,
+                        front: np.ndarray):
+        """
+        Move the entries of the nodes to new regions at the end of the pool
+        with `front` free entries before them.
+        """
+        begins = self._index_used + np.cumsum(capacities) - capacities
+        self._index_used += int(capacities.sum())
+        self._index_garbage += int(self._index_capacity[nodes].sum())
+        self._index_blocks = grow(self._index_blocks, self._index_used,
+                                  kInvalidBlock)
+        self._index_start_timestamps = grow(self._index_start_timestamps,
+                                            self._index_used)
+
+        lengths = self._index_length[nodes]
+        src = ragged_arange(self._index_offset[nodes], lengths)
+        dst = ragged_arange(begins + front, lengths)
+        self._index_blocks[dst] = self._index_blocks[src]
+        self._index_start_timestamps[dst] = self._index_start_timestamps[src]
+
+        self._index_begin[nodes] = begins
+        self._index_offset[nodes] = begins + front
+        self._index_capacity[nodes] = capacities
+
+    def _index_append(self, nodes: np.ndarray, blocks: np.ndarray):
+        ends = self._index_offset[nodes] + self._index_length[nodes]
+        full = ends == self._index_begin[nodes] + self._index_capacity[nodes]
+        if np.any(full):
+            capacities = np.maximum(2 * self._index_capacity[nodes[full]], 1)
+            self._relocate_index(nodes[full], capacities,
+                                 np.zeros(len(capacities), dtype=np.int64))
+
+        positions = self._index_offset[nodes] + self._index_length[nodes]
+        self._index_blocks[positions] = blocks
+        self._index_start_timestamps[positions] = \
+            self._block_start_timestamp[blocks]
+        self._index_length[nodes] += 1
+        self._maybe_compact_index()
+
+    def _index_prepend(self, node: int, block: int):
+        if self._index_offset[node] == self._index_begin[node]:
+            capacity = max(2 * int(self._index_capacity[node]), 2)
+            # leave half of the free entries before the old entries
+            front = (capacity - int(self._index_length[node]) + 1) // 2
+            self._relocate_index(np.array([node]), np.array([capacity]),
+                                 np.array([front]))
+
+        self._index_offset[node] -= 1
+        position = self._index_offset[node]
+        self._index_blocks[position] = block
+        self._index_start_timestamps[position] = \
+            self._block_start_timestamp[block]
+        self._index_length[node] += 1
+        self._maybe_compact_index()
+
+    def _index_remove(self, node: int, block: int):
+        offset = int(self._index_offset[node])
+        end = offset + int(self._index_length[node])
+        if self._index_blocks[offset] == block:
+            # the oldest block is removed in most cases
+            self._index_offset[node] += 1
+        else:
+            position = offset + int(np.flatnonzero(
+                self._index_blocks[offset:end] == block)[0])
+            for array in [self._index_blocks, self._index_start_timestamps]:
+                array[position:end - 1] = array[position + 1:end]
+        self._index_length[node] -= 1
+
+    def _maybe_compact_index(self):
+        if self._index_garbage > self._index_used // 2:
+            self._rebuild_temporal_index()
+
+    def cold_storage_stats(self) -> dict:
+        if self._cold_store is None:
+            return {}
+        return {
+            "num_cold_blocks": self._cold_store.num_blocks(),
+            "num_cold_bytes": self._cold_store.num_bytes(),
+            "num_faulted_blocks": len(self._faulted),
+            "cache_hits": self._cold_cache_hits,
+            "cache_misses": self._cold_cache_misses,
+        }
+
+    def num_evicted_blocks(self) -> int:
+        return self._num_evicted_blocks
+
+    def num_evicted_bytes(self) -> int:
+        return self._num_evicted_bytes
+
+    def num_vertices(self) -> int:
+        return self._num_nodes
+
+    def num_source_vertices(self) -> int:
+        return self._num_src_nodes
+
+    def num_edges(self) -> int:
+        return self._num_edges
+
+    def max_vertex_id(self) -> int:
+        return self._max_node_id
+
+    def out_degree(self, nodes) -> np.ndarray:
+        nodes = np.asarray(nodes, dtype=np.int64)
+        return self._list_num_edges[nodes].astype(np.uint64)
+
+    def newest_timestamps(self, nodes) -> np.ndarray:
+        """
+        Return the end timestamp of the newest block of each node, i.e., an
+        upper bound of the timestamps of its edges, or -inf if the node has
+        no edges.
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        timestamps = np.full(len(nodes), -np.inf, dtype=np.float32)
+        rows = np.flatnonzero((nodes >= 0) & (nodes < len(self._head)))
+        tail = self._tail[nodes[rows]]
+        has_edges = tail != kInvalidBlock
+        timestamps[rows[has_edges]] = \
+            self._block_end_timestamp[tail[has_edges]]
+        return timestamps
+
+    def out_degree_before(self, nodes, timestamps) -> np.ndarray:
+        """
+        Return the number of edges of each node with timestamps smaller than
+        the query timestamp of the node. The blocks that end before it are
+        counted as a whole and only the block that contains it is
+        binary-searched.
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        timestamps = np.asarray(timestamps, dtype=np.float32)
+        degrees = np.zeros(len(nodes), dtype=np.int64)
+        in_table = (nodes >= 0) & (nodes < len(self._head))
+        if self._cold_store is not None:
+            self._trim_cold_cache()
+            self._fault_in_all(nodes[in_table])
+
+        # walk the linked lists of all nodes from the oldest block to the
+        # newest block at the same time
+        curr = np.full(len(nodes), kInvalidBlock, dtype=np.int64)
+        curr[in_table] = self._head[nodes[in_table]]
+        active = np.flatnonzero(curr != kInvalidBlock)
+        while len(active) > 0:
+            block = curr[active]
+            whole = self._block_end_timestamp[block] < timestamps[active]
+            degrees[active[whole]] += self._block_size[block[whole]] - \
+                self._block_num_deleted[block[whole]]
+
+            boundary = ~whole & \
+                (self._block_start_timestamp[block] < timestamps[active])
+            rows = active[boundary]
+            start = self._block_offset[block[boundary]]
+            end = lower_bound(self._pool_timestamps, start,
+                              start + self._block_size[block[boundary]],
+                              timestamps[rows])
+            if self._num_deleted > 0:
+                positions = ragged_arange(start, end - start)
+                live = self._live_mask(positions)
+                degrees[rows] += np.bincount(
+                    np.repeat(np.arange(len(rows)), end - start)[live],
+                    minlength=len(rows))
+            else:
+                degrees[rows] += end - start
+
+            # the newer blocks are out of the time range
+            active = active[whole]
+            curr[active] = self._block_next[block[whole]]
+            active = active[curr[active] != kInvalidBlock]
+        return degrees.astype(np.uint64)
+
+    def nodes(self) -> np.ndarray:
+        return np.flatnonzero(self._node_mask).astype(np.int64)
+
+    def src_nodes(self) -> np.ndarray:
+        return np.flatnonzero(self._src_node_mask).astype(np.int64)
+
+    def edges(self) -> np.ndarray:
+        return np.flatnonzero(self._edge_mask).astype(np.int64)
+
+    def get_temporal_neighbors(self, node: int):
+        dst_nodes, timestamps, eids = [], [], []
+        if self._cold_store is not None and node < len(self._head):
+            self._trim_cold_cache()
+            self._fault_in_all(np.array([node]))
+        block = int(self._tail[node]) if node < len(self._tail) \
+            else kInvalidBlock
+        while block != kInvalidBlock:
+            s = self._block_slice(block)
+            live = self._live_mask(s)[::-1]
+            block_dst_nodes, block_timestamps, block_eids = \
+                self._read_payload(s)
+            dst_nodes.append(block_dst_nodes[::-1][live])
+            timestamps.append(block_timestamps[::-1][live])
+            eids.append(block_eids[::-1][live])
+            block = int(self._block_prev[block])
+
+        if not dst_nodes:
+            return (np.zeros(0, dtype=np.int64),
+                    np.zeros(0, dtype=np.float32),
+                    np.zeros(0, dtype=np.int64))
+        return (np.concatenate(dst_nodes), np.concatenate(timestamps),
+                np.concatenate(eids))
+
+    def to_csr(self, nodes: np.ndarray, time_upper_bound: float):
+        nodes = np.asarray(nodes, dtype=np.int64)
+        return self.neighbors_in_range(
+            nodes, np.full(len(nodes), -np.inf, dtype=np.float32),
+            np.full(len(nodes), time_upper_bound, dtype=np.float32))
+
+    def neighbors_in_range(self, nodes: np.ndarray,
+                           start_timestamps: np.ndarray,
+                           end_timestamps: np.ndarray):
+        """
+        Return the out edges of each node whose timestamps are in
+        [start_timestamps[i], end_timestamps[i]) in CSR format, sorted by
+        timestamps. Only the blocks on the boundaries of the time ranges are
+        binary-searched; the blocks outside of them are skipped as a whole.
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        start_timestamps = np.asarray(start_timestamps, dtype=np.float32)
+        end_timestamps = np.asarray(end_timestamps, dtype=np.float32)
+        num_rows = len(nodes)
+
+        if self._cold_store is not None:
+            self._trim_cold_cache()
+            self._fault_in_all(nodes[(nodes >= 0) & (nodes < len(self._head))])
+
+        # walk the linked lists of all nodes from the oldest block to the
+        # newest block at the same time
+        curr = np.full(num_rows, kInvalidBlock, dtype=np.int64)
+        in_table = (nodes >= 0) & (nodes < len(self._head))
+        curr[in_table] = self._head[nodes[in_table]]
+        all_rows, all_starts, all_lengths = [], [], []
+        active = np.flatnonzero(curr != kInvalidBlock)
+        while len(active) > 0:
+            block = curr[active]
+            # the newer blocks are out of the time range
+            in_range = (self._block_start_timestamp[block] <
+                        end_timestamps[active])
+            active = active[in_range]
+            block = block[in_range]
+
+            # the older blocks are skipped as a whole
+            overlap = (self._block_end_timestamp[block] >=
+                       start_timestamps[active])
+            rows = active[overlap]
+            start = self._block_offset[block[overlap]]
+            end = start + self._block_size[block[overlap]]
+            left = (self._block_start_timestamp[block[overlap]] <
+                    start_timestamps[rows])
+            start[left] = lower_bound(
+                self._pool_timestamps, start[left], end[left],
+                start_timestamps[rows[left]])
+            right = (self._block_end_timestamp[block[overlap]] >=
+                     end_timestamps[rows])
+            end[right] = lower_bound(
+                self._pool_timestamps, start[right], end[right],
+                end_timestamps[rows[right]])
+            all_rows.append(rows)
+            all_starts.append(start)
+            # NB: empty when start_timestamps[i] >= end_timestamps[i]
+            all_lengths.append(np.maximum(end - start, 0))
+
+            curr[active] = self._block_next[block]
+            active = active[curr[active] != kInvalidBlock]
+
+        if not all_rows:
+            return (np.zeros(num_rows + 1, dtype=np.int64),
+                    np.zeros(0, dtype=np.int64),
+                    np.zeros(0, dtype=np.float32),
+                    np.zeros(0, dtype=np.int64))
+
+        # segments sorted by row, oldest block first
+        rows = np.concatenate(all_rows)
+        lengths = np.concatenate(all_lengths)
+        order = np.argsort(rows, kind="stable")
+        rows = rows[order]
+        lengths = lengths[order]
+        positions = ragged_arange(np.concatenate(all_starts)[order], lengths)
+        if self._num_deleted > 0:
+            live = self._live_mask(positions)
+            positions = positions[live]
+            rows = np.repeat(rows, lengths)[live]
+            lengths = np.ones(len(rows), dtype=np.int64)
+
+        indptr = np.zeros(num_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, weights=lengths,
+                              minlength=num_rows).astype(np.int64),
+                  out=indptr[1:])
+        return (indptr, *self._read_payload(positions))
+
+    def avg_linked_list_length(self) -> float:
+        if self._num_nodes == 0:
+            return float("nan")
+        return float(self._list_size[self._node_mask].sum() / self._num_nodes)
+
+    def get_graph_memory_usage(self) -> int:
+        return self._allocated
+
+    def block_stats(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray,
+                                   np.ndarray]:
+        """
+        Return the (out degrees, linked list lengths) of the nodes and the
+        (sizes, capacities) of the blocks. The deleted edges are not counted
+        in the sizes.
+        """
+        nodes = np.flatnonzero(self._node_mask)
+        blocks = np.flatnonzero(self._block_capacity[:self._num_blocks] > 0)
+        return (self._list_num_edges[nodes], self._list_size[nodes],
+                self._block_size[blocks] - self._block_num_deleted[blocks],
+                self._block_capacity[blocks])
+
+    def get_metadata_memory_usage(self) -> int:
+        block_table = sum(a.nbytes for a in [
+            self._block_offset, self._block_size, self._block_capacity,
+            self._block_start_timestamp, self._block_end_timestamp,
+            self._block_prev, self._block_next, self._block_node,
+            self._block_num_deleted, self._block_min_eid,
+            self._block_max_eid])
+        node_table = sum(a.nbytes for a in [
+            self._head, self._tail, self._list_num_edges,
+            self._list_num_insertions, self._list_size])
+        bookkeeping = self._node_mask.nbytes + self._src_node_mask.nbytes + \
+            self._edge_mask.nbytes
+        if self._edge_refcount is not None:
+            bookkeeping += self._edge_refcount.nbytes
+        if self._pool_deleted is not None:
+            bookkeeping += self._pool_deleted.nbytes
+        temporal_index = sum(a.nbytes for a in [
+            self._index_blocks, self._index_start_timestamps,
+            self._index_begin, self._index_offset, self._index_length,
+            self._index_capacity])
+        return block_table + node_table + bookkeeping + temporal_index
+
+
+class _PinnedArray:
+    """
+    A read-only view of an array of the block table in which the values of
+    some blocks are pinned.
+    """
+
+    def __init__(self, graph: _DynamicGraph, name: str, blocks: np.ndarray,
+                 values: np.ndarray):
+        order = np.argsort(blocks)
+        self._graph = graph
+        self._name = name
+        self._blocks = blocks[order]
+        self._values = values[order]
+
+    def __getitem__(self, blocks):
+        values = getattr(self._graph, self._name)[blocks]
+        if len(self._blocks) == 0:
+            return values
+        i = np.minimum(np.searchsorted(self._blocks, blocks),
+                       len(self._blocks) - 1)
+        return np.where(self._blocks[i] == blocks, self._values[i], values)
+
+
+class _GraphSnapshot:
+    """
+    A read-only view of a `_DynamicGraph` at the time it is taken.
+
+    It pins the head and the tail block of every node together with the
+    size, the end timestamp and the next link of the tail, as well as the
+    node and edge masks, the linked list sizes and the counters. Since new edges are only appended
+    to the tails and new blocks are linked after them while the snapshot is
+    alive, the walks from the tails to the heads and the walks from the
+    heads that stop at the pinned tails are not affected by later
+    insertions. The other attributes are read from the graph, and the
+    methods of the graph run against the view, so a `_TemporalSampler` can
+    sample it like the graph itself.
+    """
+
+    def __init__(self, graph: _DynamicGraph):
+        tails = graph._tail.copy()
+        blocks = tails[tails != kInvalidBlock]
+        self.__dict__.update(
+            _graph=graph,
+            _released=False,
+            _head=graph._head.copy(),
+            _tail=tails,
+            _list_num_edges=graph._list_num_edges.copy(),
+            _list_size=graph._list_size.copy(),
+            _node_mask=graph._node_mask.copy(),
+            _src_node_mask=graph._src_node_mask.copy(),
+            _edge_mask=graph._edge_mask.copy(),
+            _num_nodes=graph._num_nodes,
+            _num_src_nodes=graph._num_src_nodes,
+            _num_edges=graph._num_edges,
+            _max_node_id=graph._max_node_id,
+            _block_size=_PinnedArray(graph, "_block_size", blocks,
+                                     graph._block_size[blocks]),
+            _block_end_timestamp=_PinnedArray(
+                graph, "_block_end_timestamp", blocks,
+                graph._block_end_timestamp[blocks]),
+            # NB: the walks from the heads stop at the pinned tails
+            _block_next=_PinnedArray(
+                graph, "_block_next", blocks,
+                np.full(len(blocks), kInvalidBlock, dtype=np.int64)),
+            # NB: the temporal index may point to the blocks linked after
+            # the snapshot
+            _temporal_index=False)
+
+    def __getattr__(self, name: str):
+        attr = getattr(_DynamicGraph, name, None)
+        if callable(attr):
+            return types.MethodType(attr, self)
+        return getattr(self._graph, name)
+
+    def __setattr__(self, name: str, value):
+        raise AttributeError("A graph snapshot is read-only")
+
+    def release(self):
+        if not self._released:
+            self.__dict__["_released"] = True
+            self._graph._release_snapshot()
@@ -0,0 +1,549 @@
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .dynamic_graph import _DynamicGraph, kInvalidBlock
+from .utils import grow, lower_bound, ragged_arange
+
+
+class SamplingResult:
+    """
+    The sampling result of one layer and one snapshot. It has the same
+    interface as `libgnnflow.SamplingResult`.
+
+    The accessors return the arrays without copying them. The results built
+    by the sampler keep all of their integer fields in one contiguous int64
+    arena and their timestamps in one float32 arena (see `arenas`).
+    """
+
+    def __init__(self, row: np.ndarray, col: np.ndarray,
+                 all_nodes: np.ndarray, all_timestamps: np.ndarray,
+                 delta_timestamps: np.ndarray, eids: np.ndarray,
+                 num_src_nodes: int, num_dst_nodes: int):
+        self._row = row
+        self._col = col
+        self._all_nodes = all_nodes
+        self._all_timestamps = all_timestamps
+        self._delta_timestamps = delta_timestamps
+        self._eids = eids
+        self._num_src_nodes = num_src_nodes
+        self._num_dst_nodes = num_dst_nodes
+
+    def row(self) -> np.ndarray:
+        return self._row
+
+    def col(self) -> np.ndarray:
+        return self._col
+
+    def all_nodes(self) -> np.ndarray:
+        return self._all_nodes
+
+    def all_timestamps(self) -> np.ndarray:
+        return self._all_timestamps
+
+    def delta_timestamps(self) -> np.ndarray:
+        return self._delta_timestamps
+
+    def eids(self) -> np.ndarray:
+        return self._eids
+
+    def num_src_nodes(self) -> int:
+        return self._num_src_nodes
+
+    def num_dst_nodes(self) -> int:
+        return self._num_dst_nodes
+
+    @classmethod
+    def _allocate(cls, num_dst_nodes: int, num_sampled_nodes: int) \
+            -> "SamplingResult":
+        num_src_nodes = num_dst_nodes + num_sampled_nodes
+        # [row | col | all_nodes | eids]
+        ids = np.empty(3 * num_sampled_nodes + num_src_nodes, dtype=np.int64)
+        # [all_timestamps | delta_timestamps]
+        timestamps = np.empty(num_src_nodes + num_sampled_nodes,
+                              dtype=np.float32)
+        ends = np.cumsum([num_sampled_nodes, num_sampled_nodes,
+                          num_src_nodes])
+        row, col, all_nodes, eids = np.split(ids, ends)
+        all_timestamps, delta_timestamps = np.split(timestamps,
+                                                    [num_src_nodes])
+        result = cls(row, col, all_nodes, all_timestamps, delta_timestamps,
+                     eids, num_src_nodes, num_dst_nodes)
+        result._arenas = (ids, timestamps)
+        return result
+
+    def arenas(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the (int64, float32) arenas that hold the fields, or copies of
+        the fields packed the same way if the result was not allocated by the
+        sampler.
+        """
+        arenas = getattr(self, "_arenas", None)
+        if arenas is None:
+            arenas = (np.concatenate([self._row, self._col, self._all_nodes,
+                                      self._eids]).astype(np.int64),
+                      np.concatenate([self._all_timestamps,
+                                      self._delta_timestamps]
+                                     ).astype(np.float32))
+        return arenas
+
+
+class _TemporalSampler:
+    """
+    A pure-CPU temporal sampler with the same interface as
+    `libgnnflow._TemporalSampler`.
+
+    All root nodes of a batch are processed together. Every step of the
+    sampling loop moves each root one block towards the head of its linked
+    list and locates the time range in the block with a vectorized binary
+    search.
+    """
+
+    def __init__(self, graph: _DynamicGraph, fanouts: List[int],
+                 sampling_policy: str, num_snapshots: int = 1,
+                 snapshot_time_window: float = 0.0, prop_time: bool = False,
+                 seed: int = 1234, decay_rate: float = 0.0,
+                 edge_weights: Optional[np.ndarray] = None):
+        if sampling_policy not in ["recent", "uniform", "time_decay",
+                                   "weighted"]:
+            raise ValueError("strategy must be 'recent', 'uniform', "
+                             "'time_decay' or 'weighted'")
+        if decay_rate < 0:
+            raise ValueError("decay_rate must be non-negative")
+        if sampling_policy == "weighted":
+            if edge_weights is None:
+                raise ValueError("The 'weighted' strategy needs edge_weights")
+            edge_weights = np.asarray(edge_weights, dtype=np.float64)
+            if edge_weights.ndim != 1 or np.any(edge_weights < 0) or \
+                    not np.all(np.isfinite(edge_weights)):
+                raise ValueError("edge_weights must be a 1-D array of "
+                                 "non-negative finite weights")
+        if num_snapshots == 1 and abs(snapshot_time_window) > 0.0:
+            logging.warning("Snapshot time window must be 0 when "
+                            "num_snapshots = 1. Ignore the snapshot time "
+                            "window.")
+
+        self._graph = graph
+        self._fanouts = list(fanouts)
+        self._sampling_policy = sampling_policy
+        self._num_snapshots = num_snapshots
+        self._snapshot_time_window = np.float32(snapshot_time_window)
+        self._prop_time = prop_time
+        self._num_layers = len(fanouts)
+        self._rng = np.random.default_rng(seed)
+
+        # the log of the weight of an edge is decay_rate * timestamp for
+        # 'time_decay' (the factor exp(-decay_rate * root timestamp) is the
+        # same for all edges of a root) and log(edge_weights[eid]) for
+        # 'weighted'
+        self._decay_rate = float(decay_rate)
+        self._log_edge_weights = None
+        if sampling_policy == "weighted":
+            with np.errstate(divide="ignore"):
+                self._log_edge_weights = np.log(edge_weights)
+        # exclusive prefix sums of the weights of the edges in every block,
+        # in log space and aligned with the pool. The first
+        # `_prefix_size[block]` entries of a block are up to date.
+        self._log_prefix = np.zeros(0, dtype=np.float64)
+        self._prefix_size = np.zeros(0, dtype=np.int64)
+        self._layout_version = None
+
+    def sample(self, dst_nodes: np.ndarray, dst_timestamps: np.ndarray) \
+            -> List[List[SamplingResult]]:
+        dst_nodes = np.asarray(dst_nodes, dtype=np.int64)
+        dst_timestamps = np.asarray(dst_timestamps, dtype=np.float32)
+        if len(dst_nodes) != len(dst_timestamps):
+            raise ValueError("The number of nodes and timestamps must be the "
+                             "same.")
+
+        results = []
+        for layer in range(self._num_layers):
+            layer_results = []
+            for snapshot in range(self._num_snapshots):
+                if layer == 0:
+                    nodes, timestamps = dst_nodes, dst_timestamps
+                else:
+                    prev_result = results[-1][snapshot]
+                    nodes = prev_result.all_nodes()
+                    timestamps = prev_result.all_timestamps()
+                layer_results.append(self.sample_layer(
+                    nodes, timestamps, layer, snapshot))
+            results.append(layer_results)
+        return results
+
+    def sample_layer(self, dst_nodes: np.ndarray, dst_timestamps: np.ndarray,
+                     layer: int, snapshot: int) -> SamplingResult:
+        dst_nodes = np.asarray(dst_nodes, dtype=np.int64)
+        dst_timestamps = np.asarray(dst_timestamps, dtype=np.float32)
+        num_root_nodes = len(dst_nodes)
+        fanout = self._fanouts[layer]
+
+        if self._num_snapshots == 1:
+            start_timestamps = np.zeros(num_root_nodes, dtype=np.float32)
+            end_timestamps = dst_timestamps
+        else:
+            end_timestamps = dst_timestamps - np.float32(
+                self._num_snapshots - snapshot - 1) * \
+                self._snapshot_time_window
+            start_timestamps = end_timestamps - self._snapshot_time_window
+
+        if self._sampling_policy == "recent":
+            roots, positions = self._sample_recent(
+                dst_nodes, start_timestamps, end_timestamps, fanout)
+        elif self._sampling_policy == "uniform":
+            roots, positions = self._sample_uniform(
+                dst_nodes, start_timestamps, end_timestamps, fanout)
+        else:
+            roots, positions = self._sample_weighted(
+                dst_nodes, start_timestamps, end_timestamps, fanout)
+
+        return self._make_result(dst_nodes, dst_timestamps, roots, positions)
+
+    def _eligible_ranges(self, dst_nodes: np.ndarray,
+                         start_timestamps: np.ndarray,
+                         end_timestamps: np.ndarray, fanout: int = None):
+        """
+        Walk the linked lists of all root nodes from the tail (newest block)
+        to the head and yield, for every step, the roots that have a block in
+        the time range together with [start, end) positions in the pool and
+        the blocks.
+
+        If `fanout` is given, a root stops walking once `fanout` edges have
+        been found. If the graph has a temporal index, the walk starts from
+        the newest block that may be in the time range instead of the tail.
+        """
+        graph = self._graph
+        cold = graph._cold_store is not None
+        num_table_nodes = len(graph._tail)
+        curr = np.full(len(dst_nodes), kInvalidBlock, dtype=np.int64)
+        in_table = (dst_nodes >= 0) & (dst_nodes < num_table_nodes)
+        if cold:
+            graph._trim_cold_cache()
+            # all blocks of the node may have been spilled
+            empty = np.flatnonzero(in_table)
+            empty = empty[graph._tail[dst_nodes[empty]] == kInvalidBlock]
+            graph._fault_in(dst_nodes[empty], start_timestamps[empty])
+        if graph._temporal_index:
+            # jump over the blocks newer than the time range
+            curr[in_table] = graph._find_blocks(dst_nodes[in_table],
+                                                end_timestamps[in_table])
+        else:
+            curr[in_table] = graph._tail[dst_nodes[in_table]]
+        found = np.zeros(len(dst_nodes), dtype=np.int64)
+
+        active = np.flatnonzero(curr != kInvalidBlock)
+        while len(active) > 0:
+            block = curr[active]
+            if cold:
+                graph._touch_cold_blocks(block)
+            valid = graph._block_capacity[block] > 0
+            # search in the previous block
+            skip = valid & \
+                (end_timestamps[active] < graph._block_start_timestamp[block])
+            # no need to search in the previous block
+            stop = ~valid | (~skip & (start_timestamps[active] >
+                                      graph._block_end_timestamp[block]))
+            search = ~skip & ~stop
+
+            roots = active[search]
+            block = block[search]
+            lo = graph._block_offset[block]
+            hi = lo + graph._block_size[block]
+            start = lower_bound(graph._pool_timestamps, lo, hi,
+                                start_timestamps[roots])
+            end = lower_bound(graph._pool_timestamps, lo, hi,
+                              end_timestamps[roots])
+            if graph._num_deleted > 0:
+                ranges = self._live_ranges(roots, block, start, end)
+            else:
+                ranges = [(roots, start, end, block)]
+            for range_roots, range_start, range_end, range_blocks in ranges:
+                found[range_roots] += range_end - range_start
+                yield range_roots, range_start, range_end, range_blocks
+
+            prev = graph._block_prev[curr[active]]
+            if cold:
+                # fault the cold blocks back when reaching the head
+                at_head = ~stop & (prev == kInvalidBlock)
+                if fanout is not None:
+                    at_head &= found[active] < fanout
+                graph._fault_in(dst_nodes[active[at_head]],
+                                start_timestamps[active[at_head]])
+                prev = graph._block_prev[curr[active]]
+            curr[active] = prev
+            curr[active[stop]] = kInvalidBlock
+            if fanout is not None:
+                curr[roots[found[roots] >= fanout]] = kInvalidBlock
+            active = active[curr[active] != kInvalidBlock]
+
+    def _live_ranges(self, roots: np.ndarray, blocks: np.ndarray,
+                     start: np.ndarray, end: np.ndarray):
+        """
+        Split the ranges [start, end) in the blocks with deleted edges into
+        the runs of live edges. The i-th newest runs of all roots are
+        yielded at the i-th step so that a root appears at most once per
+        step, like `_eligible_ranges`.
+        """
+        graph = self._graph
+        dirty = graph._block_num_deleted[blocks] > 0
+        lengths = end[dirty] - start[dirty]
+        positions = ragged_arange(start[dirty], lengths)
+        owners = np.repeat(np.flatnonzero(dirty), lengths)
+        live = ~graph._pool_deleted[positions]
+        positions = positions[live]
+        owners = owners[live]
+
+        # a run starts where the positions are not contiguous
+        first = np.ones(len(positions), dtype=bool)
+        first[1:] = (positions[1:] != positions[:-1] + 1) | \
+            (owners[1:] != owners[:-1])
+        first = np.flatnonzero(first)
+        # NB: no runs if all edges in the dirty blocks are deleted
+        last = np.append(first[1:], len(positions))[:len(first)] - 1
+
+        run_owners = np.concatenate([np.flatnonzero(~dirty), owners[first]])
+        run_starts = np.concatenate([start[~dirty], positions[first]])
+        run_ends = np.concatenate([end[~dirty], positions[last] + 1])
+        if len(run_owners) == 0:
+            return
+
+        # rank the runs of each root from the newest one
+        order = np.lexsort((-run_starts, run_owners))
+        run_owners = run_owners[order]
+        run_starts = run_starts[order]
+        run_ends = run_ends[order]
+        ranks = np.arange(len(run_owners)) - \
+            np.searchsorted(run_owners, run_owners)
+        for rank in range(int(ranks.max()) + 1):
+            selected = ranks == rank
+            yield (roots[run_owners[selected]], run_starts[selected],
+                   run_ends[selected], blocks[run_owners[selected]])
+
+    def _sample_recent(self, dst_nodes: np.ndarray,
+                       start_timestamps: np.ndarray,
+                       end_timestamps: np.ndarray, fanout: int):
+        sampled = np.zeros(len(dst_nodes), dtype=np.int64)
+        all_roots, all_positions = [], []
+        for roots, start, end, _ in self._eligible_ranges(
+                dst_nodes, start_timestamps, end_timestamps, fanout):
+            # copy the newest edges first
+            num_to_sample = np.minimum(end - start, fanout - sampled[roots])
+            num_to_sample = np.maximum(num_to_sample, 0)
+            positions = ragged_arange(-(end - 1), num_to_sample)
+            all_roots.append(np.repeat(roots, num_to_sample))
+            all_positions.append(-positions)
+            sampled[roots] += num_to_sample
+
+        return self._sort_by_root(all_roots, all_positions)
+
+    def _sample_uniform(self, dst_nodes: np.ndarray,
+                        start_timestamps: np.ndarray,
+                        end_timestamps: np.ndarray, fanout: int):
+        all_roots, all_starts, all_ends = [], [], []
+        for roots, start, end, _ in self._eligible_ranges(
+                dst_nodes, start_timestamps, end_timestamps):
+            all_roots.append(roots)
+            all_starts.append(start)
+            all_ends.append(end)
+
+        if not all_roots:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        # ranges sorted by root, newest block first
+        range_roots = np.concatenate(all_roots)
+        order = np.argsort(range_roots, kind="stable")
+        range_roots = range_roots[order]
+        range_starts = np.concatenate(all_starts)[order]
+        range_ends = np.concatenate(all_ends)[order]
+        range_lengths = range_ends - range_starts
+        range_offsets = np.cumsum(range_lengths) - range_lengths
+
+        num_candidates = np.bincount(range_roots, weights=range_lengths,
+                                     minlength=len(dst_nodes)).astype(np.int64)
+        num_to_sample = np.minimum(num_candidates, fanout)
+        roots = np.repeat(np.arange(len(dst_nodes)), num_to_sample)
+        # draw with replacement, then visit from newer to older edges
+        indices = np.floor(self._rng.random(len(roots)) *
+                           num_candidates[roots]).astype(np.int64)
+        order = np.lexsort((indices, roots))
+        roots = roots[order]
+        indices = indices[order]
+
+        first_range = np.searchsorted(range_roots, roots)
+        global_indices = range_offsets[first_range] + indices
+        ranges = np.searchsorted(range_offsets, global_indices,
+                                 side="right") - 1
+        positions = range_ends[ranges] - 1 - \
+            (global_indices - range_offsets[ranges])
+        return roots, positions
+
+    def _sample_weighted(self, dst_nodes: np.ndarray,
+                         start_timestamps: np.ndarray,
+                         end_timestamps: np.ndarray, fanout: int):
+        """
+        Draw `fanout` edges of every root with replacement, with probability
+        proportional to the weights of the edges. A draw picks a range with
+        the weights of the ranges of the root and then an edge in the range
+        with a binary search in the prefix sums of its block.
+        """
+        all_roots, all_starts, all_ends, all_blocks = [], [], [], []
+        for roots, start, end, blocks in self._eligible_ranges(
+                dst_nodes, start_timestamps, end_timestamps):
+            all_roots.append(roots)
+            all_starts.append(start)
+            all_ends.append(end)
+            all_blocks.append(blocks)
+
+        if not all_roots:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        # ranges sorted by root, newest block first
+        range_roots = np.concatenate(all_roots)
+        order = np.argsort(range_roots, kind="stable")
+        range_roots = range_roots[order]
+        range_starts = np.concatenate(all_starts)[order]
+        range_ends = np.concatenate(all_ends)[order]
+        nonempty = range_ends > range_starts
+        range_roots = range_roots[nonempty]
+        range_starts = range_starts[nonempty]
+        range_ends = range_ends[nonempty]
+        self._update_log_prefix(np.concatenate(all_blocks)[order][nonempty])
+        log_prefix = self._log_prefix
+
+        # log weights of the ranges: log(exp(inclusive) - exp(exclusive))
+        last = range_ends - 1
+        inclusive = np.logaddexp(log_prefix[last], self._edge_scores(last))
+        exclusive = log_prefix[range_starts]
+        log_weights = np.full(len(range_roots), -np.inf)
+        positive = inclusive > exclusive
+        log_weights[positive] = inclusive[positive] + np.log1p(
+            -np.exp(exclusive[positive] - inclusive[positive]))
+
+        # scale the weights of the ranges of every root to at most 1
+        max_log_weights = np.full(len(dst_nodes), -np.inf)
+        np.maximum.at(max_log_weights, range_roots, log_weights)
+        weights = np.zeros(len(range_roots))
+        weights[positive] = np.exp(log_weights[positive] -
+                                   max_log_weights[range_roots[positive]])
+        positive = weights > 0
+        cum_weights = np.cumsum(weights)
+        range_offsets = cum_weights - weights
+
+        # NB: the edges of zero weight are candidates but never drawn
+        range_lengths = np.where(positive, range_ends - range_starts, 0)
+        num_candidates = np.bincount(range_roots, weights=range_lengths,
+                                     minlength=len(dst_nodes)).astype(np.int64)
+        num_to_sample = np.minimum(num_candidates, fanout)
+        roots = np.repeat(np.arange(len(dst_nodes)), num_to_sample)
+        root_weights = np.bincount(range_roots, weights=weights,
+                                   minlength=len(dst_nodes))
+
+        # pick the ranges
+        first_range = np.searchsorted(range_roots, roots)
+        last_range = np.searchsorted(range_roots, roots, side="right") - 1
+        targets = range_offsets[first_range] + \
+            self._rng.random(len(roots)) * root_weights[roots]
+        ranges = np.searchsorted(cum_weights, targets, side="right")
+        # NB: rounding may pick the range after the last one of the root,
+        # which is replaced by the last range of positive weight before it
+        previous = np.maximum.accumulate(
+            np.where(weights > 0, np.arange(len(weights)), -1))
+        ranges = previous[np.minimum(ranges, last_range)]
+
+        # pick the edges in the ranges: the last position whose exclusive
+        # prefix sum is below the target
+        fractions = np.clip((targets - range_offsets[ranges]) /
+                            weights[ranges], 0.0, 1.0)
+        with np.errstate(divide="ignore"):
+            log_targets = np.logaddexp(exclusive[ranges],
+                                       np.log(fractions) + log_weights[ranges])
+        positions = lower_bound(log_prefix, range_starts[ranges] + 1,
+                                range_ends[ranges], log_targets) - 1
+
+        # visit from newer to older edges
+        order = np.lexsort((-positions, ranges))
+        return roots[order], positions[order]
+
+    def _edge_scores(self, positions: np.ndarray) -> np.ndarray:
+        """
+        Return the log weights of the edges at the positions of the pool.
+        """
+        graph = self._graph
+        if self._log_edge_weights is None:
+            return self._decay_rate * \
+                graph._pool_timestamps[positions].astype(np.float64)
+        eids = graph._read_eids(positions)
+        if len(eids) > 0 and eids.max() >= len(self._log_edge_weights):
+            raise ValueError("edge_weights has no weight for edge {}".format(
+                int(eids.max())))
+        return self._log_edge_weights[eids]
+
+    def _update_log_prefix(self, blocks: np.ndarray):
+        """
+        Extend the prefix sums of the blocks to their current sizes. The
+        prefix sums are rebuilt lazily if the edges have been moved.
+        """
+        graph = self._graph
+        if graph._layout_version != self._layout_version:
+            self._prefix_size[:] = 0
+            self._layout_version = graph._layout_version
+        pool_size = len(graph._pool_timestamps)
+        if len(self._log_prefix) < pool_size:
+            self._log_prefix = grow(self._log_prefix, pool_size)
+        num_blocks = len(graph._block_offset)
+        if len(self._prefix_size) < num_blocks:
+            self._prefix_size = grow(self._prefix_size, num_blocks)
+
+        blocks = np.unique(blocks)
+        computed = self._prefix_size[blocks]
+        sizes = np.asarray(graph._block_size[blocks])
+        stale = computed < sizes
+        for block, begin, end in zip(blocks[stale].tolist(),
+                                     computed[stale].tolist(),
+                                     sizes[stale].tolist()):
+            offset = int(graph._block_offset[block])
+            positions = np.arange(offset + begin, offset + end)
+            if begin == 0:
+                first = -np.inf
+            else:
+                first = np.logaddexp(self._log_prefix[positions[0] - 1],
+                                     self._edge_scores(positions[:1] - 1)[0])
+            scores = np.concatenate([[first],
+                                     self._edge_scores(positions[:-1])])
+            self._log_prefix[positions] = np.logaddexp.accumulate(scores)
+            self._prefix_size[block] = end
+
+    def _sort_by_root(self, all_roots: List[np.ndarray],
+                      all_positions: List[np.ndarray]):
+        if not all_roots:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        roots = np.concatenate(all_roots)
+        positions = np.concatenate(all_positions)
+        order = np.argsort(roots, kind="stable")
+        return roots[order], positions[order]
+
+    def _make_result(self, dst_nodes: np.ndarray, dst_timestamps: np.ndarray,
+                     roots: np.ndarray, positions: np.ndarray) \
+            -> SamplingResult:
+        graph = self._graph
+        num_root_nodes = len(dst_nodes)
+        num_sampled_nodes = len(roots)
+
+        src_nodes, edge_timestamps, eids = graph._read_payload(positions)
+        root_timestamps = dst_timestamps[roots]
+
+        # NB: write the fields into the arenas of the result directly
+        result = SamplingResult._allocate(num_root_nodes, num_sampled_nodes)
+        result.row()[:] = roots
+        result.col()[:] = np.arange(num_root_nodes,
+                                    num_root_nodes + num_sampled_nodes)
+        result.all_nodes()[:num_root_nodes] = dst_nodes
+        result.all_nodes()[num_root_nodes:] = src_nodes
+        result.all_timestamps()[:num_root_nodes] = dst_timestamps
+        result.all_timestamps()[num_root_nodes:] = \
+            root_timestamps if self._prop_time else edge_timestamps
+        np.subtract(root_timestamps, edge_timestamps,
+                    out=result.delta_timestamps())
+        result.eids()[:] = eids
+        return result
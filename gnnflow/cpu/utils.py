@@ -0,0 +1,45 @@
+import numpy as np
+
+
+def grow(array: np.ndarray, size: int, fill=0) -> np.ndarray:
+    """
+    Grow a 1D array to at least `size` elements (amortized doubling).
+    """
+    if size <= len(array):
+        return array
+    new_array = np.full(max(size, 2 * len(array)), fill, dtype=array.dtype)
+    new_array[:len(array)] = array
+    return new_array
+
+
+def lower_bound(values: np.ndarray, lo: np.ndarray, hi: np.ndarray,
+                targets: np.ndarray, side: str = "left") -> np.ndarray:
+    """
+    Vectorized binary search. For each i, find the first index in the sorted
+    segment values[lo[i]:hi[i]] whose value is not less than targets[i]
+    (or greater than targets[i] if `side` is "right"), like
+    `np.searchsorted`.
+    """
+    lo = lo.copy()
+    hi = hi.copy()
+    less = np.less if side == "left" else np.less_equal
+    active = np.flatnonzero(lo < hi)
+    while len(active) > 0:
+        mid = (lo[active] + hi[active]) // 2
+        go_right = less(values[mid], targets[active])
+        lo[active] = np.where(go_right, mid + 1, lo[active])
+        hi[active] = np.where(go_right, hi[active], mid)
+        active = active[lo[active] < hi[active]]
+    return lo
+
+
+def ragged_arange(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    Concatenate [starts[i], starts[i] + lengths[i]) for every i.
+    """
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.cumsum(lengths) - lengths
+    return np.arange(total, dtype=np.int64) - \
+        np.repeat(offsets - starts, lengths)
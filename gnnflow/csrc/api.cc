@@ -23,6 +23,13 @@ inline py::array vec2npy(const std::vector<T> &vec) {
   return py::array(v->size(), v->data(), capsule);
 }
 
+template <typename T>
+inline py::array vec2npy_view(const std::vector<T> &vec, py::handle base) {
+  // NB: the array does not own the memory. It is a view of `vec` and keeps
+  // `base`, the Python object that owns `vec`, alive.
+  return py::array(vec.size(), vec.data(), base);
+}
+
 PYBIND11_MODULE(libgnnflow, m) {
   py::enum_<InsertionPolicy>(m, "InsertionPolicy")
       .value("INSERT", InsertionPolicy::kInsertionPolicyInsert)
@@ -49,6 +56,15 @@ PYBIND11_MODULE(libgnnflow, m) {
            py::arg("target_vertices"), py::arg("timestamps"), py::arg("eids"))
       .def("offload_old_blocks", &DynamicGraph::OffloadOldBlocks,
            py::arg("timestamp"), py::arg("to_file") = false)
+      .def("set_retention_policy", &DynamicGraph::SetRetentionPolicy,
+           py::arg("retention_window"), py::arg("max_edges"))
+      .def("apply_retention_policy", &DynamicGraph::ApplyRetentionPolicy)
+      .def("compact", &DynamicGraph::Compact, py::arg("min_fill"))
+      .def("set_num_threads", &DynamicGraph::SetNumThreads,
+           py::arg("num_threads"))
+      .def("num_threads", &DynamicGraph::num_threads)
+      .def("num_evicted_blocks", &DynamicGraph::num_evicted_blocks)
+      .def("num_evicted_bytes", &DynamicGraph::num_evicted_bytes)
       .def("num_vertices", &DynamicGraph::num_nodes)
       .def("num_source_vertices", &DynamicGraph::num_src_nodes)
       .def("num_edges", &DynamicGraph::num_edges)
@@ -56,6 +72,17 @@ PYBIND11_MODULE(libgnnflow, m) {
            [](const DynamicGraph &dgraph, std::vector<NIDType> nodes) {
              return vec2npy(dgraph.out_degree(nodes));
            })
+      .def("out_degree_before",
+           [](const DynamicGraph &dgraph, std::vector<NIDType> nodes,
+              std::vector<TimestampType> timestamps) {
+             return vec2npy(dgraph.out_degree_before(nodes, timestamps));
+           },
+           py::arg("nodes"), py::arg("timestamps"))
+      .def("newest_timestamps",
+           [](const DynamicGraph &dgraph, std::vector<NIDType> nodes) {
+             return vec2npy(dgraph.newest_timestamps(nodes));
+           },
+           py::arg("nodes"))
       .def("nodes",
            [](const DynamicGraph &dgraph) { return vec2npy(dgraph.nodes()); })
       .def("src_nodes",
@@ -73,35 +100,76 @@ PYBIND11_MODULE(libgnnflow, m) {
                                    vec2npy(std::get<1>(neighbors)),
                                    vec2npy(std::get<2>(neighbors)));
            })
+      .def("to_csr",
+           [](const DynamicGraph &dgraph, std::vector<NIDType> nodes,
+              TimestampType time_upper_bound) {
+             auto csr = dgraph.ToCSR(nodes, time_upper_bound);
+             return py::make_tuple(
+                 vec2npy(std::get<0>(csr)), vec2npy(std::get<1>(csr)),
+                 vec2npy(std::get<2>(csr)), vec2npy(std::get<3>(csr)));
+           },
+           py::arg("nodes"), py::arg("time_upper_bound"))
+      .def("neighbors_in_range",
+           [](const DynamicGraph &dgraph, std::vector<NIDType> nodes,
+              std::vector<TimestampType> start_timestamps,
+              std::vector<TimestampType> end_timestamps) {
+             auto csr = dgraph.NeighborsInRange(nodes, start_timestamps,
+                                                end_timestamps);
+             return py::make_tuple(
+                 vec2npy(std::get<0>(csr)), vec2npy(std::get<1>(csr)),
+                 vec2npy(std::get<2>(csr)), vec2npy(std::get<3>(csr)));
+           },
+           py::arg("nodes"), py::arg("start_timestamps"),
+           py::arg("end_timestamps"))
       .def("avg_linked_list_length",
            [](const DynamicGraph &dgraph) {
              return dgraph.avg_linked_list_length();
            })
       .def("get_graph_memory_usage",
            [](const DynamicGraph &dgraph) { return dgraph.graph_mem_usage(); })
-      .def("get_metadata_memory_usage", [](DynamicGraph &dgraph) {
-        return dgraph.graph_metadata_mem_usage();
+      .def("get_metadata_memory_usage",
+           [](const DynamicGraph &dgraph) {
+             return dgraph.graph_metadata_mem_usage();
+           })
+      .def("block_stats", [](const DynamicGraph &dgraph) {
+        auto stats = dgraph.block_stats();
+        return py::make_tuple(
+            vec2npy(std::get<0>(stats)), vec2npy(std::get<1>(stats)),
+            vec2npy(std::get<2>(stats)), vec2npy(std::get<3>(stats)));
       });
 
+  // NB: the fields are returned as views without copying them out of C++
   py::class_<SamplingResult>(m, "SamplingResult")
       .def("row",
-           [](const SamplingResult &result) { return vec2npy(result.row); })
+           [](py::object self) {
+             return vec2npy_view(self.cast<const SamplingResult &>().row,
+                                 self);
+           })
       .def("col",
-           [](const SamplingResult &result) { return vec2npy(result.col); })
+           [](py::object self) {
+             return vec2npy_view(self.cast<const SamplingResult &>().col,
+                                 self);
+           })
       .def("all_nodes",
-           [](const SamplingResult &result) {
-             return vec2npy(result.all_nodes);
+           [](py::object self) {
+             return vec2npy_view(
+                 self.cast<const SamplingResult &>().all_nodes, self);
            })
       .def("all_timestamps",
-           [](const SamplingResult &result) {
-             return vec2npy(result.all_timestamps);
+           [](py::object self) {
+             return vec2npy_view(
+                 self.cast<const SamplingResult &>().all_timestamps, self);
            })
       .def("delta_timestamps",
-           [](const SamplingResult &result) {
-             return vec2npy(result.delta_timestamps);
+           [](py::object self) {
+             return vec2npy_view(
+                 self.cast<const SamplingResult &>().delta_timestamps, self);
            })
       .def("eids",
-           [](const SamplingResult &result) { return vec2npy(result.eids); })
+           [](py::object self) {
+             return vec2npy_view(self.cast<const SamplingResult &>().eids,
+                                 self);
+           })
       .def("num_src_nodes",
            [](const SamplingResult &result) { return result.num_src_nodes; })
       .def("num_dst_nodes",
@@ -113,8 +181,12 @@ PYBIND11_MODULE(libgnnflow, m) {
            py::arg("dgraph"), py::arg("fanouts"), py::arg("sampling_policy"),
            py::arg("num_snapshots"), py::arg("snapshot_time_window"),
            py::arg("prop_time"), py::arg("seed"))
-      .def("sample", &TemporalSampler::Sample)
-      .def("sample_layer", &TemporalSampler::SampleLayer);
+      // NB: release the GIL so that Python threads (e.g., the training loop)
+      // can run while sampling
+      .def("sample", &TemporalSampler::Sample,
+           py::call_guard<py::gil_scoped_release>())
+      .def("sample_layer", &TemporalSampler::SampleLayer,
+           py::call_guard<py::gil_scoped_release>());
 
   py::class_<KVStore>(m, "KVStore")
       .def(py::init<>())
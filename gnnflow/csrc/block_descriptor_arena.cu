@@ -0,0 +1,57 @@
+#include <algorithm>
+#include <rmm/detail/error.hpp>
+
+#include "block_descriptor_arena.h"
+#include "logging.h"
+
+namespace gnnflow {
+
+BlockDescriptorArena::BlockDescriptorArena(std::size_t chunk_size)
+    : chunk_size_(std::max(chunk_size, static_cast<std::size_t>(1))),
+      next_id_(0) {}
+
+BlockDescriptorArena::~BlockDescriptorArena() {
+  for (auto chunk : chunks_) {
+    mr_.deallocate(chunk, chunk_size_ * sizeof(TemporalBlock));
+  }
+}
+
+BlockIdType BlockDescriptorArena::Allocate() {
+  std::lock_guard<std::mutex> lock(mutex_);
+  if (!free_ids_.empty()) {
+    auto id = free_ids_.back();
+    free_ids_.pop_back();
+    return id;
+  }
+
+  if (next_id_ == capacity()) {
+    AllocateChunk();
+  }
+  return next_id_++;
+}
+
+void BlockDescriptorArena::Reserve(std::size_t num_descriptors) {
+  std::lock_guard<std::mutex> lock(mutex_);
+  std::size_t num_new_ids = num_descriptors > free_ids_.size()
+                                ? num_descriptors - free_ids_.size()
+                                : 0;
+  while (next_id_ + num_new_ids > capacity()) {
+    AllocateChunk();
+  }
+}
+
+void BlockDescriptorArena::AllocateChunk() {
+  try {
+    chunks_.push_back(static_cast<TemporalBlock*>(
+        mr_.allocate(chunk_size_ * sizeof(TemporalBlock))));
+  } catch (rmm::bad_alloc&) {
+    LOG(FATAL) << "Failed to allocate memory for temporal block descriptors";
+  }
+}
+
+void BlockDescriptorArena::Deallocate(BlockIdType id) {
+  std::lock_guard<std::mutex> lock(mutex_);
+  free_ids_.push_back(id);
+}
+
+}  // namespace gnnflow
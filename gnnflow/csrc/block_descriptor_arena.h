@@ -0,0 +1,80 @@
+#ifndef GNNFLOW_BLOCK_DESCRIPTOR_ARENA_H_
+#define GNNFLOW_BLOCK_DESCRIPTOR_ARENA_H_
+
+#include <mutex>
+#include <rmm/mr/device/cuda_memory_resource.hpp>
+#include <vector>
+
+#include "common.h"
+
+namespace gnnflow {
+/**
+ * @brief A growable slab of the descriptors of temporal blocks on the device.
+ *
+ * The descriptors are allocated in chunks so that their device addresses
+ * (i.e., the prev/next pointers in the device linked lists) never change
+ * when the slab grows. A descriptor is identified by an integer id, and the
+ * ids of the released descriptors are reused.
+ */
+class BlockDescriptorArena {
+ public:
+  /**
+   * @brief Constructor.
+   *
+   * @param chunk_size The number of descriptors in a chunk.
+   */
+  explicit BlockDescriptorArena(std::size_t chunk_size);
+  ~BlockDescriptorArena();
+
+  /**
+   * @brief Allocate a descriptor.
+   *
+   * @return The id of the descriptor.
+   */
+  BlockIdType Allocate();
+
+  /**
+   * @brief Make sure that the next `num_descriptors` allocations do not grow
+   * the slab.
+   *
+   * NB: `Get` is not synchronized with the growth of the slab, so it must be
+   * called before the ingest workers start.
+   */
+  void Reserve(std::size_t num_descriptors);
+
+  /**
+   * @brief Release a descriptor. The id can be reused by `Allocate`.
+   *
+   * @param id The id of the descriptor.
+   */
+  void Deallocate(BlockIdType id);
+
+  /**
+   * @brief Get the device address of a descriptor.
+   */
+  TemporalBlock* Get(BlockIdType id) const {
+    return chunks_[id / chunk_size_] + id % chunk_size_;
+  }
+
+  std::size_t num_descriptors() const { return next_id_ - free_ids_.size(); }
+
+  std::size_t capacity() const { return chunks_.size() * chunk_size_; }
+
+ private:
+  void AllocateChunk();
+
+  std::size_t chunk_size_;
+  std::vector<TemporalBlock*> chunks_;
+  std::vector<BlockIdType> free_ids_;
+  BlockIdType next_id_;
+
+  rmm::mr::cuda_memory_resource mr_;
+
+  // NB: descriptors can be allocated by several ingest workers at the same
+  // time
+  std::mutex mutex_;
+};
+
+}  // namespace gnnflow
+
+#endif  // GNNFLOW_BLOCK_DESCRIPTOR_ARENA_H_
@@ -13,6 +13,8 @@ namespace gnnflow {
 using NIDType = int64_t;
 using TimestampType = float;
 using EIDType = int64_t;
+// BlockIdType is the type of the id of a block descriptor on the device.
+using BlockIdType = uint32_t;
 
 constexpr int kMaxFanout = 32;
 
@@ -20,6 +22,9 @@ constexpr NIDType kInvalidNID = -1;
 
 constexpr int kNumStreams = 1;
 
+// NB: the maximum grid size of the kernels with grid-stride loops
+constexpr std::size_t kMaxGridSize = 65535;
+
 static constexpr std::size_t kBlockSpaceSize =
     (sizeof(NIDType) + sizeof(EIDType) + sizeof(TimestampType));
 
@@ -45,6 +50,10 @@ struct TemporalBlock {
 
   TemporalBlock* prev;
   TemporalBlock* next;
+
+  // NB: the id of the descriptor of the block on the device. Only used on
+  // the host.
+  BlockIdType id;
 };
 
 /** @brief This struct is used to store the sampling result. */
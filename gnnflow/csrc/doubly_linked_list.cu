@@ -85,6 +85,16 @@ __global__ void InsertBlockToDoublyLinkedListKernel(
   InsertBlockToDoublyLinkedList(node_table, node_id, block);
 }
 
+__global__ void InsertBlocksToDoublyLinkedListKernel(
+    DoublyLinkedList* node_table, const NIDType* node_ids,
+    TemporalBlock* const* blocks, std::size_t num_blocks) {
+  std::size_t tid = threadIdx.x + blockIdx.x * blockDim.x;
+  if (tid >= num_blocks) {
+    return;
+  }
+  InsertBlockToDoublyLinkedList(node_table, node_ids[tid], blocks[tid]);
+}
+
 __global__ void RemoveBlockFromDoublyLinkedListKernel(
     DoublyLinkedList* node_table, NIDType node_id, TemporalBlock* next_block) {
   RemoveBlockFromDoublyLinkedList(node_table, node_id, next_block);
@@ -50,6 +50,15 @@ void RemoveBlockFromDoublyLinkedList(HostDoublyLinkedList* node_table,
 __global__ void InsertBlockToDoublyLinkedListKernel(
     DoublyLinkedList* node_table, NIDType node_id, TemporalBlock* block);
 
+/**
+ * @brief Insert blocks[i] to the linked list of node_ids[i] for all i.
+ *
+ * NB: the nodes must be unique.
+ */
+__global__ void InsertBlocksToDoublyLinkedListKernel(
+    DoublyLinkedList* node_table, const NIDType* node_ids,
+    TemporalBlock* const* blocks, std::size_t num_blocks);
+
 __global__ void RemoveBlockFromDoublyLinkedListKernel(
     DoublyLinkedList* node_table, NIDType node_id, TemporalBlock* next_block);
 
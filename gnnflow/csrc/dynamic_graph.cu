@@ -6,16 +6,18 @@
 #include <algorithm>
 #include <cstddef>
 #include <cstdint>
+#include <limits>
+#include <numeric>
 #include <rmm/detail/error.hpp>
 #include <rmm/mr/device/cuda_memory_resource.hpp>
-#include <rmm/mr/device/fixed_size_memory_resource.hpp>
 #include <rmm/mr/device/logging_resource_adaptor.hpp>
-#include <rmm/mr/device/per_device_resource.hpp>
+#include <thread>
 #include <type_traits>
 #include <vector>
 
 #include "common.h"
 #include "dynamic_graph.h"
+#include "graph_kernels.h"
 #include "logging.h"
 #include "utils.h"
 
@@ -30,24 +32,20 @@ DynamicGraph::DynamicGraph(std::size_t initial_pool_size,
                            bool adaptive_block_size)
     : allocator_(initial_pool_size, maximum_pool_size, minium_block_size,
                  mem_resource_type, device),
+      descriptors_(blocks_to_preallocate),
       insertion_policy_(insertion_policy),
       max_node_id_(0),
+      num_nodes_(0),
+      num_src_nodes_(0),
+      num_edges_(0),
+      retention_window_(0),
+      max_edges_(0),
+      clock_(0),
+      num_evicted_blocks_(0),
+      num_evicted_bytes_(0),
       device_(device),
       adaptive_block_size_(adaptive_block_size) {
-  for (int i = 0; i < kNumStreams; i++) {
-    cudaStream_t stream;
-    cudaStreamCreateWithFlags(&stream, cudaStreamNonBlocking);
-    streams_.push_back(stream);
-  }
-
-  auto mem_res = new rmm::mr::cuda_memory_resource();
-  mem_resources_for_metadata_.push(mem_res);
-  auto pool_res =
-      new rmm::mr::fixed_size_memory_resource<rmm::mr::cuda_memory_resource>(
-          mem_res, sizeof(TemporalBlock), blocks_to_preallocate);
-  mem_resources_for_metadata_.push(pool_res);
-
-  rmm::mr::set_current_device_resource(mem_resources_for_metadata_.top());
+  SetNumThreads(kNumStreams);
 }
 
 DynamicGraph::~DynamicGraph() {
@@ -58,20 +56,6 @@ DynamicGraph::~DynamicGraph() {
   // release the memory of node table
   d_node_table_.clear();
   d_node_table_.shrink_to_fit();
-
-  // release the memory of blocks
-  auto mr = rmm::mr::get_current_device_resource();
-  for (auto iter = std::begin(h2d_mapping_); iter != std::end(h2d_mapping_);
-       ++iter) {
-    auto& block = iter->second;
-    mr->deallocate(block, sizeof(TemporalBlock));
-  }
-
-  // release the memory pool
-  while (!mem_resources_for_metadata_.empty()) {
-    delete mem_resources_for_metadata_.top();
-    mem_resources_for_metadata_.pop();
-  }
 }
 
 void DynamicGraph::AddEdges(const std::vector<NIDType>& src_nodes,
@@ -86,54 +70,174 @@ void DynamicGraph::AddEdges(const std::vector<NIDType>& src_nodes,
   // NB: it seems to be necessary to set the device again.
   CUDA_CALL(cudaSetDevice(device_));
 
-  src_nodes_.insert(src_nodes.begin(), src_nodes.end());
-  nodes_.insert(src_nodes.begin(), src_nodes.end());
-  nodes_.insert(dst_nodes.begin(), dst_nodes.end());
-
-  for (auto eid : eids) {
-    edges_[eid]++;
-  }
-
-  nodes_.insert(src_nodes.begin(), src_nodes.end());
-
   // add nodes
   NIDType max_node =
       std::max(*std::max_element(src_nodes.begin(), src_nodes.end()),
                *std::max_element(dst_nodes.begin(), dst_nodes.end()));
   AddNodes(max_node);
 
-  std::unordered_map<NIDType, std::vector<NIDType>> src_to_dst_map;
-  std::unordered_map<NIDType, std::vector<TimestampType>> src_to_ts_map;
-  std::unordered_map<NIDType, std::vector<EIDType>> src_to_eid_map;
+  // group the edges by source node and sort them by timestamp in one pass
+  auto idx = stable_sort_indices(src_nodes, timestamps);
+  auto sorted_src_nodes = sort_vector(src_nodes, idx);
+  auto sorted_dst_nodes = sort_vector(dst_nodes, idx);
+  auto sorted_timestamps = sort_vector(timestamps, idx);
+  auto sorted_eids = sort_vector(eids, idx);
+
+  for (auto node : dst_nodes) {
+    if (!nodes_[node]) {
+      nodes_[node] = true;
+      num_nodes_++;
+    }
+  }
+
+  AddEdgeIds(eids);
+
+  // NB: the bitsets are not thread-safe, so they are updated before the
+  // edges are dispatched to the workers
+  std::vector<std::size_t> segment_starts;
+  std::size_t num_edges = sorted_src_nodes.size();
+  for (std::size_t segment_start = 0; segment_start < num_edges;
+       segment_start++) {
+    NIDType src_node = sorted_src_nodes[segment_start];
+    if (segment_start > 0 && sorted_src_nodes[segment_start - 1] == src_node) {
+      continue;
+    }
+    segment_starts.push_back(segment_start);
 
-  for (std::size_t i = 0; i < src_nodes.size(); ++i) {
-    src_to_dst_map[src_nodes[i]].push_back(dst_nodes[i]);
-    src_to_ts_map[src_nodes[i]].push_back(timestamps[i]);
-    src_to_eid_map[src_nodes[i]].push_back(eids[i]);
+    if (!src_nodes_[src_node]) {
+      src_nodes_[src_node] = true;
+      num_src_nodes_++;
+    }
+    if (!nodes_[src_node]) {
+      nodes_[src_node] = true;
+      num_nodes_++;
+    }
+  }
+  std::size_t num_segments = segment_starts.size();
+  segment_starts.push_back(num_edges);
+
+  // each worker owns a contiguous range of the source nodes
+  int num_workers = static_cast<int>(
+      std::min<std::size_t>(num_threads_, num_segments));
+  std::vector<IngestBatch> batches(num_workers);
+  // NB: each source node gets at most one new block
+  descriptors_.Reserve(num_segments);
+  auto worker = [&](int worker_id) {
+    CUDA_CALL(cudaSetDevice(device_));
+    std::size_t begin = num_segments * worker_id / num_workers;
+    std::size_t end = num_segments * (worker_id + 1) / num_workers;
+    for (std::size_t i = begin; i < end; i++) {
+      AddEdgesForOneNode(sorted_src_nodes[segment_starts[i]],
+                         sorted_timestamps, segment_starts[i],
+                         segment_starts[i + 1], streams_[worker_id],
+                         &batches[worker_id]);
+    }
+  };
+  std::vector<std::thread> threads;
+  for (int worker_id = 1; worker_id < num_workers; worker_id++) {
+    threads.emplace_back(worker, worker_id);
+  }
+  worker(0);
+  for (auto& thread : threads) {
+    thread.join();
   }
 
-  int i = 0;
-  for (auto iter = std::begin(src_to_dst_map); iter != std::end(src_to_dst_map);
-       iter++) {
-    NIDType src_node = iter->first;
-    auto& dst_nodes = iter->second;
-    auto& timestamps = src_to_ts_map[src_node];
-    auto& eids = src_to_eid_map[src_node];
+  // NB: the reallocated blocks are copied on the worker streams
+  for (auto& stream : streams_) {
+    CUDA_CALL(cudaStreamSynchronize(stream));
+  }
 
-    // sort the edges by timestamp
-    auto idx = stable_sort_indices(timestamps);
+  ApplyIngestBatches(batches, sorted_dst_nodes, sorted_timestamps,
+                     sorted_eids);
+
+  // register the new blocks in the order of the source nodes so that the
+  // result is the same as the single-threaded build
+  for (auto& batch : batches) {
+    for (auto& new_block : batch.new_blocks) {
+      RegisterBlock(new_block.first, new_block.second);
+    }
+  }
 
-    dst_nodes = sort_vector(dst_nodes, idx);
-    timestamps = sort_vector(timestamps, idx);
-    eids = sort_vector(eids, idx);
+  clock_ = std::max(clock_,
+                    *std::max_element(timestamps.begin(), timestamps.end()));
+  ApplyRetentionPolicy();
+}
 
-    AddEdgesForOneNode(src_node, dst_nodes, timestamps, eids,
-                       streams_[i % kNumStreams]);
-    i++;
+void DynamicGraph::ApplyIngestBatches(
+    const std::vector<IngestBatch>& batches,
+    const std::vector<NIDType>& dst_nodes,
+    const std::vector<TimestampType>& timestamps,
+    const std::vector<EIDType>& eids) {
+  std::vector<BlockSegment> segments;
+  std::vector<NIDType> new_block_nodes;
+  std::vector<TemporalBlock*> new_d_blocks;
+  std::vector<TemporalBlock*> dirty_d_blocks;
+  std::vector<TemporalBlock> dirty_blocks;
+  for (auto& batch : batches) {
+    segments.insert(segments.end(), batch.edge_segments.begin(),
+                    batch.edge_segments.end());
+    for (auto& new_block : batch.new_blocks) {
+      new_block_nodes.push_back(new_block.first);
+      new_d_blocks.push_back(descriptors_.Get(new_block.second->id));
+    }
+    for (auto block : batch.dirty_blocks) {
+      dirty_d_blocks.push_back(descriptors_.Get(block->id));
+      dirty_blocks.push_back(*block);
+    }
   }
 
-  for (auto& stream : streams_) {
-    CUDA_CALL(cudaStreamSynchronize(stream));
+  // copy the edges to the blocks
+  if (!segments.empty() && device_ == 0) {
+    // NB: the input is staged in the device memory with one transfer per
+    // array
+    thrust::device_vector<BlockSegment> d_segments(segments.begin(),
+                                                   segments.end());
+    thrust::device_vector<NIDType> d_dst_nodes(dst_nodes.begin(),
+                                               dst_nodes.end());
+    thrust::device_vector<TimestampType> d_timestamps(timestamps.begin(),
+                                                      timestamps.end());
+    thrust::device_vector<EIDType> d_eids(eids.begin(), eids.end());
+
+    uint32_t num_threads_per_block = 128;
+    uint32_t num_blocks =
+        std::min<std::size_t>(segments.size(), kMaxGridSize);
+    ScatterBlockSegmentsKernel<<<num_blocks, num_threads_per_block>>>(
+        thrust::raw_pointer_cast(d_segments.data()), segments.size(),
+        thrust::raw_pointer_cast(d_dst_nodes.data()),
+        thrust::raw_pointer_cast(d_timestamps.data()),
+        thrust::raw_pointer_cast(d_eids.data()));
+    CUDA_CALL(cudaStreamSynchronize(nullptr));
+  }
+
+  uint32_t num_threads_per_block = 256;
+  // link the new blocks
+  if (!new_block_nodes.empty()) {
+    thrust::device_vector<NIDType> d_nodes(new_block_nodes.begin(),
+                                           new_block_nodes.end());
+    thrust::device_vector<TemporalBlock*> d_blocks(new_d_blocks.begin(),
+                                                   new_d_blocks.end());
+    uint32_t num_blocks = (new_block_nodes.size() + num_threads_per_block - 1) /
+                          num_threads_per_block;
+    InsertBlocksToDoublyLinkedListKernel<<<num_blocks,
+                                           num_threads_per_block>>>(
+        thrust::raw_pointer_cast(d_node_table_.data()),
+        thrust::raw_pointer_cast(d_nodes.data()),
+        thrust::raw_pointer_cast(d_blocks.data()), new_block_nodes.size());
+    CUDA_CALL(cudaStreamSynchronize(nullptr));
+  }
+
+  // sync the descriptors
+  if (!dirty_blocks.empty()) {
+    thrust::device_vector<TemporalBlock*> d_blocks(dirty_d_blocks.begin(),
+                                                   dirty_d_blocks.end());
+    thrust::device_vector<TemporalBlock> d_updates(dirty_blocks.begin(),
+                                                   dirty_blocks.end());
+    uint32_t num_blocks = (dirty_blocks.size() + num_threads_per_block - 1) /
+                          num_threads_per_block;
+    SyncBlockDescriptorsKernel<<<num_blocks, num_threads_per_block>>>(
+        thrust::raw_pointer_cast(d_blocks.data()),
+        thrust::raw_pointer_cast(d_updates.data()), dirty_blocks.size());
+    CUDA_CALL(cudaStreamSynchronize(nullptr));
   }
 }
 
@@ -144,33 +248,90 @@ void DynamicGraph::AddNodes(NIDType max_node) {
   max_node_id_ = max_node;
   d_node_table_.resize(max_node_id_ + 1);
   h_copy_of_d_node_table_.resize(max_node_id_ + 1);
+  nodes_.resize(max_node_id_ + 1, false);
+  src_nodes_.resize(max_node_id_ + 1, false);
+}
+
+void DynamicGraph::AddEdgeIds(const std::vector<EIDType>& eids) {
+  EIDType max_eid = *std::max_element(eids.begin(), eids.end());
+  if (static_cast<std::size_t>(max_eid) >= edges_.size()) {
+    edges_.resize(max_eid + 1, false);
+    if (!edge_refcount_.empty()) {
+      edge_refcount_.resize(max_eid + 1, 0);
+    }
+  }
+
+  for (auto eid : eids) {
+    if (!edges_[eid]) {
+      edges_[eid] = true;
+      num_edges_++;
+      if (!edge_refcount_.empty()) {
+        edge_refcount_[eid] = 1;
+      }
+      continue;
+    }
+
+    // the edge id is duplicated
+    if (edge_refcount_.empty()) {
+      edge_refcount_.assign(edges_.begin(), edges_.end());
+    }
+    edge_refcount_[eid]++;
+  }
+}
+
+void DynamicGraph::RemoveEdgeId(EIDType eid) {
+  if (!edge_refcount_.empty() && --edge_refcount_[eid] > 0) {
+    return;
+  }
+  edges_[eid] = false;
+  num_edges_--;
 }
 
-std::size_t DynamicGraph::num_nodes() const { return nodes_.size(); }
-std::size_t DynamicGraph::num_src_nodes() const { return src_nodes_.size(); }
-std::size_t DynamicGraph::num_edges() const { return edges_.size(); }
+std::size_t DynamicGraph::num_nodes() const { return num_nodes_; }
+std::size_t DynamicGraph::num_src_nodes() const { return num_src_nodes_; }
+std::size_t DynamicGraph::num_edges() const { return num_edges_; }
+
+void DynamicGraph::SetNumThreads(int num_threads) {
+  CHECK_GT(num_threads, 0);
+  CUDA_CALL(cudaSetDevice(device_));
+  // one stream per worker
+  while (streams_.size() < static_cast<std::size_t>(num_threads)) {
+    cudaStream_t stream;
+    cudaStreamCreateWithFlags(&stream, cudaStreamNonBlocking);
+    streams_.push_back(stream);
+  }
+  num_threads_ = num_threads;
+}
 
 void DynamicGraph::InsertBlock(NIDType node_id, TemporalBlock* block,
                                cudaStream_t stream) {
-  CHECK_NOTNULL(block);
-  // host
-  InsertBlockToDoublyLinkedList(h_copy_of_d_node_table_.data(), node_id, block);
+  LinkBlock(node_id, block, stream);
+  RegisterBlock(node_id, block);
+}
 
-  // allocate a block on the device
-  TemporalBlock* d_block = nullptr;
-  try {
-    auto mr = rmm::mr::get_current_device_resource();
-    d_block = static_cast<TemporalBlock*>(mr->allocate(sizeof(TemporalBlock)));
-  } catch (rmm::bad_alloc&) {
-    LOG(FATAL) << "Failed to allocate memory for temporal block";
-  }
+void DynamicGraph::LinkBlock(NIDType node_id, TemporalBlock* block,
+                             cudaStream_t stream) {
+  LinkBlockOnHost(node_id, block);
 
   // insert the block into the linked list
   InsertBlockToDoublyLinkedListKernel<<<1, 1, 0, stream>>>(
-      thrust::raw_pointer_cast(d_node_table_.data()), node_id, d_block);
+      thrust::raw_pointer_cast(d_node_table_.data()), node_id,
+      descriptors_.Get(block->id));
+}
+
+void DynamicGraph::LinkBlockOnHost(NIDType node_id, TemporalBlock* block) {
+  CHECK_NOTNULL(block);
+  InsertBlockToDoublyLinkedList(h_copy_of_d_node_table_.data(), node_id, block);
 
-  // update the mapping
-  h2d_mapping_[block] = d_block;
+  // allocate a block descriptor on the device
+  block->id = descriptors_.Allocate();
+}
+
+void DynamicGraph::RegisterBlock(NIDType node_id, TemporalBlock* block) {
+  if ((retention_window_ > 0 || max_edges_ > 0) &&
+      h_copy_of_d_node_table_[node_id].head == block) {
+    oldest_blocks_.emplace(block->end_timestamp, node_id);
+  }
 }
 
 void DynamicGraph::RemoveBlock(NIDType node_id, TemporalBlock* block,
@@ -181,21 +342,20 @@ void DynamicGraph::RemoveBlock(NIDType node_id, TemporalBlock* block,
                                   block);
 
   // device
-  auto d_block = h2d_mapping_[block];
   RemoveBlockFromDoublyLinkedListKernel<<<1, 1, 0, stream>>>(
-      thrust::raw_pointer_cast(d_node_table_.data()), node_id, d_block);
-
-  // release the memory
-  auto mr = rmm::mr::get_current_device_resource();
-  mr->deallocate(d_block, sizeof(TemporalBlock));
-
-  // update the mapping
-  h2d_mapping_.erase(block);
+      thrust::raw_pointer_cast(d_node_table_.data()), node_id,
+      descriptors_.Get(block->id));
+  // the kernel reads the descriptor; wait for it before the id can be
+  // handed out again by the arena
+  CUDA_CALL(cudaStreamSynchronize(stream));
+
+  // release the descriptor
+  descriptors_.Deallocate(block->id);
 }
 
 void DynamicGraph::SyncBlock(TemporalBlock* block, cudaStream_t stream) {
   // copy the metadata from the host to the device
-  CUDA_CALL(cudaMemcpyAsync(h2d_mapping_[block], block, 48,
+  CUDA_CALL(cudaMemcpyAsync(descriptors_.Get(block->id), block, 48,
                             cudaMemcpyHostToDevice, stream));
 }
 
@@ -204,10 +364,10 @@ inline std::size_t get_next_power_of_two(std::size_t n) {
 }
 
 void DynamicGraph::AddEdgesForOneNode(
-    NIDType src_node, const std::vector<NIDType>& dst_nodes,
-    const std::vector<TimestampType>& timestamps,
-    const std::vector<EIDType>& eids, cudaStream_t stream) {
-  std::size_t num_edges = dst_nodes.size();
+    NIDType src_node, const std::vector<TimestampType>& timestamps,
+    std::size_t segment_start, std::size_t segment_end, cudaStream_t stream,
+    IngestBatch* batch) {
+  std::size_t num_edges = segment_end - segment_start;
 
   // NB: reference is necessary here since the value is updated in
   // `InsertBlock`
@@ -216,7 +376,7 @@ void DynamicGraph::AddEdgesForOneNode(
   TemporalBlock* h_block = nullptr;
   bool is_new_block = false;
 
-  std::size_t start_idx = 0;
+  std::size_t start_idx = segment_start;
   if (h_tail_block == nullptr) {
     // case 1: empty list
     h_block = allocator_.Allocate(num_edges);
@@ -228,13 +388,12 @@ void DynamicGraph::AddEdgesForOneNode(
       std::size_t num_edges_to_current_block =
           h_tail_block->capacity - h_tail_block->size;
       if (num_edges_to_current_block > 0) {
-        CopyEdgesToBlock(h_tail_block, dst_nodes, timestamps, eids, 0,
-                         num_edges_to_current_block, device_, stream);
-        // NB: sync is necessary here since the value is updated in
-        // `InsertBlock` right after the copy
-        SyncBlock(h_tail_block, stream);
+        batch->edge_segments.push_back(StageEdgesToBlock(
+            h_tail_block, timestamps, segment_start,
+            num_edges_to_current_block));
+        batch->dirty_blocks.push_back(h_tail_block);
 
-        start_idx = num_edges_to_current_block;
+        start_idx = segment_start + num_edges_to_current_block;
         num_edges -= num_edges_to_current_block;
       }
 
@@ -273,29 +432,99 @@ void DynamicGraph::AddEdgesForOneNode(
   }
 
   // copy data to block
-  CopyEdgesToBlock(h_block, dst_nodes, timestamps, eids, start_idx, num_edges,
-                   device_, stream);
+  batch->edge_segments.push_back(
+      StageEdgesToBlock(h_block, timestamps, start_idx, num_edges));
 
   if (is_new_block) {
-    InsertBlock(src_node, h_block, stream);
+    LinkBlockOnHost(src_node, h_block);
+    batch->new_blocks.emplace_back(src_node, h_block);
   }
-  SyncBlock(h_block, stream);
+  batch->dirty_blocks.push_back(h_block);
 
   // update the number of edges
-  h_list.num_edges += dst_nodes.size();
+  h_list.num_edges += segment_end - segment_start;
   h_list.num_insertions++;
 }
 
 std::vector<std::size_t> DynamicGraph::out_degree(
     const std::vector<NIDType>& nodes) const {
   std::vector<size_t> out_degrees;
+  out_degrees.reserve(nodes.size());
   for (auto& node : nodes) {
-    auto h_list = h_copy_of_d_node_table_[node];
+    // NB: reference is necessary
+    auto& h_list = h_copy_of_d_node_table_[node];
     out_degrees.push_back(h_list.num_edges);
   }
   return out_degrees;
 }
 
+std::vector<TimestampType> DynamicGraph::newest_timestamps(
+    const std::vector<NIDType>& nodes) const {
+  std::vector<TimestampType> timestamps(
+      nodes.size(), std::numeric_limits<TimestampType>::lowest());
+  for (std::size_t i = 0; i < nodes.size(); i++) {
+    auto node = nodes[i];
+    if (node < 0 ||
+        static_cast<std::size_t>(node) >= h_copy_of_d_node_table_.size()) {
+      continue;
+    }
+    auto tail = h_copy_of_d_node_table_[node].tail;
+    if (tail != nullptr) {
+      timestamps[i] = tail->end_timestamp;
+    }
+  }
+  return timestamps;
+}
+
+std::vector<std::size_t> DynamicGraph::out_degree_before(
+    const std::vector<NIDType>& nodes,
+    const std::vector<TimestampType>& timestamps) const {
+  CHECK_EQ(nodes.size(), timestamps.size());
+  // NB: it seems to be necessary to set the device again.
+  CUDA_CALL(cudaSetDevice(device_));
+
+  std::vector<std::size_t> out_degrees(nodes.size(), 0);
+  // the blocks that contain the query timestamps
+  std::vector<BlockSegment> h_boundary;
+  std::vector<std::size_t> boundary_rows;
+  for (std::size_t i = 0; i < nodes.size(); i++) {
+    auto node = nodes[i];
+    if (node < 0 ||
+        static_cast<std::size_t>(node) >= h_copy_of_d_node_table_.size()) {
+      continue;
+    }
+    // NB: from the oldest block to the newest block
+    auto block = h_copy_of_d_node_table_[node].head;
+    while (block != nullptr && block->end_timestamp < timestamps[i]) {
+      out_degrees[i] += block->size;
+      block = block->next;
+    }
+    if (block != nullptr && block->start_timestamp < timestamps[i]) {
+      h_boundary.push_back({block->dst_nodes, block->timestamps, block->eids,
+                            0, block->size, 0,
+                            std::numeric_limits<TimestampType>::lowest(),
+                            timestamps[i]});
+      boundary_rows.push_back(i);
+    }
+  }
+
+  if (!h_boundary.empty()) {
+    thrust::device_vector<BlockSegment> d_boundary(h_boundary.begin(),
+                                                   h_boundary.end());
+    uint32_t num_threads_per_block = 256;
+    uint32_t num_blocks = (h_boundary.size() + num_threads_per_block - 1) /
+                          num_threads_per_block;
+    ClipBlockSegmentsKernel<<<num_blocks, num_threads_per_block>>>(
+        thrust::raw_pointer_cast(d_boundary.data()), h_boundary.size());
+    thrust::copy(d_boundary.begin(), d_boundary.end(), h_boundary.begin());
+    for (std::size_t i = 0; i < h_boundary.size(); i++) {
+      out_degrees[boundary_rows[i]] +=
+          h_boundary[i].end_idx - h_boundary[i].start_idx;
+    }
+  }
+  return out_degrees;
+}
+
 DynamicGraph::NodeNeighborTuple DynamicGraph::get_temporal_neighbors(
     NIDType node) const {
   NodeNeighborTuple result;
@@ -336,73 +565,217 @@ DynamicGraph::NodeNeighborTuple DynamicGraph::get_temporal_neighbors(
   return result;
 }
 
+DynamicGraph::CSRTuple DynamicGraph::ToCSR(
+    const std::vector<NIDType>& nodes, TimestampType time_upper_bound) const {
+  return NeighborsInRange(
+      nodes,
+      std::vector<TimestampType>(nodes.size(),
+                                 std::numeric_limits<TimestampType>::lowest()),
+      std::vector<TimestampType>(nodes.size(), time_upper_bound));
+}
+
+DynamicGraph::CSRTuple DynamicGraph::NeighborsInRange(
+    const std::vector<NIDType>& nodes,
+    const std::vector<TimestampType>& start_timestamps,
+    const std::vector<TimestampType>& end_timestamps) const {
+  CHECK_EQ(nodes.size(), start_timestamps.size());
+  CHECK_EQ(nodes.size(), end_timestamps.size());
+  // NB: it seems to be necessary to set the device again.
+  CUDA_CALL(cudaSetDevice(device_));
+
+  std::vector<int64_t> indptr(nodes.size() + 1, 0);
+  std::vector<BlockSegment> segments;
+  std::vector<std::size_t> segment_rows;
+  // the segments that are partially in the time range
+  std::vector<std::size_t> boundary_segments;
+  for (std::size_t i = 0; i < nodes.size(); i++) {
+    auto node = nodes[i];
+    if (node < 0 ||
+        static_cast<std::size_t>(node) >= h_copy_of_d_node_table_.size()) {
+      continue;
+    }
+    // NB: from the oldest block to the newest block
+    auto block = h_copy_of_d_node_table_[node].head;
+    while (block != nullptr) {
+      if (block->start_timestamp >= end_timestamps[i]) {
+        // the newer blocks are out of the time range
+        break;
+      }
+      if (block->end_timestamp < start_timestamps[i]) {
+        // the block is older than the time range
+        block = block->next;
+        continue;
+      }
+      if (block->start_timestamp < start_timestamps[i] ||
+          block->end_timestamp >= end_timestamps[i]) {
+        boundary_segments.push_back(segments.size());
+      }
+      segments.push_back({block->dst_nodes, block->timestamps, block->eids, 0,
+                          block->size, 0, start_timestamps[i],
+                          end_timestamps[i]});
+      segment_rows.push_back(i);
+      block = block->next;
+    }
+  }
+
+  if (!boundary_segments.empty()) {
+    std::vector<BlockSegment> h_boundary;
+    h_boundary.reserve(boundary_segments.size());
+    for (auto idx : boundary_segments) {
+      h_boundary.push_back(segments[idx]);
+    }
+    thrust::device_vector<BlockSegment> d_boundary(h_boundary.begin(),
+                                                   h_boundary.end());
+    uint32_t num_threads_per_block = 256;
+    uint32_t num_blocks = (h_boundary.size() + num_threads_per_block - 1) /
+                          num_threads_per_block;
+    ClipBlockSegmentsKernel<<<num_blocks, num_threads_per_block>>>(
+        thrust::raw_pointer_cast(d_boundary.data()), h_boundary.size());
+    thrust::copy(d_boundary.begin(), d_boundary.end(), h_boundary.begin());
+    for (std::size_t i = 0; i < boundary_segments.size(); i++) {
+      segments[boundary_segments[i]] = h_boundary[i];
+    }
+  }
+
+  std::size_t num_edges = 0;
+  for (std::size_t i = 0; i < segments.size(); i++) {
+    auto& segment = segments[i];
+    std::size_t num_segment_edges = segment.end_idx - segment.start_idx;
+    segment.offset = num_edges;
+    num_edges += num_segment_edges;
+    indptr[segment_rows[i] + 1] += num_segment_edges;
+  }
+  std::partial_sum(indptr.begin(), indptr.end(), indptr.begin());
+
+  CSRTuple result;
+  std::get<0>(result) = std::move(indptr);
+  std::get<1>(result).resize(num_edges);
+  std::get<2>(result).resize(num_edges);
+  std::get<3>(result).resize(num_edges);
+  if (num_edges == 0) {
+    return result;
+  }
+
+  // NB: the output is staged in the device memory
+  thrust::device_vector<BlockSegment> d_segments(segments.begin(),
+                                                 segments.end());
+  thrust::device_vector<NIDType> d_dst_nodes(num_edges);
+  thrust::device_vector<TimestampType> d_timestamps(num_edges);
+  thrust::device_vector<EIDType> d_eids(num_edges);
+
+  uint32_t num_threads_per_block = 128;
+  uint32_t num_blocks =
+      std::min<std::size_t>(segments.size(), kMaxGridSize);
+  GatherBlockSegmentsKernel<<<num_blocks, num_threads_per_block>>>(
+      thrust::raw_pointer_cast(d_segments.data()), segments.size(),
+      thrust::raw_pointer_cast(d_dst_nodes.data()),
+      thrust::raw_pointer_cast(d_timestamps.data()),
+      thrust::raw_pointer_cast(d_eids.data()));
+
+  thrust::copy(d_dst_nodes.begin(), d_dst_nodes.end(),
+               std::get<1>(result).begin());
+  thrust::copy(d_timestamps.begin(), d_timestamps.end(),
+               std::get<2>(result).begin());
+  thrust::copy(d_eids.begin(), d_eids.end(), std::get<3>(result).begin());
+  return result;
+}
+
 const DoublyLinkedList* DynamicGraph::get_device_node_table() const {
   return thrust::raw_pointer_cast(d_node_table_.data());
 }
 
 std::vector<NIDType> DynamicGraph::nodes() const {
-  return {nodes_.begin(), nodes_.end()};
+  std::vector<NIDType> nodes;
+  nodes.reserve(num_nodes_);
+  for (std::size_t node = 0; node < nodes_.size(); node++) {
+    if (nodes_[node]) {
+      nodes.push_back(node);
+    }
+  }
+  return nodes;
 }
 std::vector<NIDType> DynamicGraph::src_nodes() const {
-  return {src_nodes_.begin(), src_nodes_.end()};
+  std::vector<NIDType> src_nodes;
+  src_nodes.reserve(num_src_nodes_);
+  for (std::size_t node = 0; node < src_nodes_.size(); node++) {
+    if (src_nodes_[node]) {
+      src_nodes.push_back(node);
+    }
+  }
+  return src_nodes;
 }
 std::vector<EIDType> DynamicGraph::edges() const {
-  std::vector<EIDType> keys;
-  for (auto kv : edges_) {
-    keys.push_back(kv.first);
+  std::vector<EIDType> edges;
+  edges.reserve(num_edges_);
+  for (std::size_t eid = 0; eid < edges_.size(); eid++) {
+    if (edges_[eid]) {
+      edges.push_back(eid);
+    }
   }
-  return keys;
+  return edges;
 }
 
 NIDType DynamicGraph::max_node_id() const { return max_node_id_; }
 
 float DynamicGraph::avg_linked_list_length() const {
   float sum = 0;
-  for (auto& node : nodes_) {
-    auto& list = h_copy_of_d_node_table_[node];
-    sum += list.size;
+  for (std::size_t node = 0; node < nodes_.size(); node++) {
+    if (nodes_[node]) {
+      sum += h_copy_of_d_node_table_[node].size;
+    }
   }
-  return sum / nodes_.size();
+  return sum / num_nodes_;
 }
 
 float DynamicGraph::graph_mem_usage() const {
   return allocator_.get_total_memory_usage();
 }
 
-float DynamicGraph::graph_metadata_mem_usage() {
+float DynamicGraph::graph_metadata_mem_usage() const {
   float sum = 0;
   // num blocks
-  sum += sizeof(TemporalBlock) * h2d_mapping_.size();
+  sum += sizeof(TemporalBlock) * descriptors_.capacity();
   // node table
-  d_node_table_.shrink_to_fit();
   sum += sizeof(DoublyLinkedList) * d_node_table_.capacity();
+  // bitsets and refcounts of nodes and edges (on the host)
+  sum += (nodes_.capacity() + src_nodes_.capacity() + edges_.capacity()) / 8;
+  sum += sizeof(uint32_t) * edge_refcount_.capacity();
   return sum;
 }
 
+DynamicGraph::BlockStatsTuple DynamicGraph::block_stats() const {
+  BlockStatsTuple result;
+  for (std::size_t node = 0; node < nodes_.size(); node++) {
+    if (!nodes_[node]) {
+      continue;
+    }
+    auto& list = h_copy_of_d_node_table_[node];
+    std::get<0>(result).push_back(list.num_edges);
+    std::get<1>(result).push_back(list.size);
+
+    auto block = list.head;
+    while (block != nullptr) {
+      std::get<2>(result).push_back(block->size);
+      std::get<3>(result).push_back(block->capacity);
+      block = block->next;
+    }
+  }
+  return result;
+}
+
 std::size_t DynamicGraph::OffloadOldBlocks(TimestampType timestamp,
                                            bool to_file) {
   std::size_t num_blocks = 0;
-  for (auto& node : nodes_) {
+  for (std::size_t node = 0; node < nodes_.size(); node++) {
+    if (!nodes_[node]) {
+      continue;
+    }
     auto& list = h_copy_of_d_node_table_[node];
     auto cur = list.head;  // the oldest block for the node
     while (cur != nullptr) {
       auto next = cur->next;
       if (cur->end_timestamp < timestamp) {
-        // remove from `edges_`
-        for (auto i = 0; i < cur->size; i++) {
-          auto eid = cur->eids[i];
-          edges_[eid]--;
-          if (edges_[eid] == 0) {
-            edges_.erase(eid);
-          }
-        }
-
-        RemoveBlock(node, cur);
-        if (to_file) {
-          allocator_.SaveToFile(cur, node);
-        } else {
-          allocator_.Deallocate(cur);  // `delete block`
-        }
+        EvictBlock(node, cur, to_file);
         num_blocks++;
       }
       cur = next;
@@ -410,4 +783,167 @@ std::size_t DynamicGraph::OffloadOldBlocks(TimestampType timestamp,
   }
   return num_blocks;
 }
+
+void DynamicGraph::EvictBlock(NIDType node_id, TemporalBlock* block,
+                              bool to_file) {
+  // remove from `edges_`
+  for (auto i = 0; i < block->size; i++) {
+    RemoveEdgeId(block->eids[i]);
+  }
+
+  RemoveBlock(node_id, block);
+  num_evicted_blocks_++;
+  num_evicted_bytes_ += block->capacity * kBlockSpaceSize;
+  if (to_file) {
+    allocator_.SaveToFile(block, node_id);
+  } else {
+    allocator_.Deallocate(block);  // `delete block`
+  }
+}
+
+std::tuple<std::size_t, std::size_t> DynamicGraph::Compact(float min_fill) {
+  CHECK_GT(min_fill, 0);
+  CHECK_LE(min_fill, 1);
+  CUDA_CALL(cudaSetDevice(device_));
+
+  std::size_t num_bytes = 0;
+  std::size_t num_blocks = 0;
+  auto stream = streams_[0];
+  for (std::size_t node = 0; node < h_copy_of_d_node_table_.size(); node++) {
+    auto& list = h_copy_of_d_node_table_[node];
+    if (list.size < 2) {
+      continue;
+    }
+
+    std::size_t target = 0;
+    for (auto cur = list.head; cur != nullptr; cur = cur->next) {
+      target = std::max(target, cur->capacity);
+    }
+    auto is_sparse = [&](TemporalBlock* block) {
+      // NB: the tail is still being filled
+      return block != list.tail && block->size < min_fill * target;
+    };
+
+    auto cur = list.head;
+    while (cur != list.tail) {
+      if (!is_sparse(cur)) {
+        cur = cur->next;
+        continue;
+      }
+      std::vector<TemporalBlock*> run = {cur};
+      std::size_t total = cur->size;
+      std::size_t capacity = cur->capacity;
+      auto next = cur->next;
+      while (is_sparse(next) && total + next->size <= target) {
+        run.push_back(next);
+        total += next->size;
+        capacity += next->capacity;
+        next = next->next;
+      }
+      if (total > 0 &&
+          (run.size() > 1 || cur->size < min_fill * cur->capacity)) {
+        MergeBlocks(node, run, stream);
+        num_blocks += run.size() - 1;
+        num_bytes += (capacity - cur->capacity) * kBlockSpaceSize;
+      }
+      cur = next;
+    }
+  }
+  CUDA_CALL(cudaStreamSynchronize(stream));
+  return {num_bytes, num_blocks};
+}
+
+void DynamicGraph::MergeBlocks(NIDType node_id,
+                               const std::vector<TemporalBlock*>& blocks,
+                               cudaStream_t stream) {
+  std::size_t total = 0;
+  for (auto block : blocks) {
+    total += block->size;
+  }
+
+  auto merged = allocator_.Allocate(total);
+  for (auto block : blocks) {
+    AppendTemporalBlock(block, merged, device_, stream);
+  }
+  // NB: the old buffers must not be released before the copies are done
+  CUDA_CALL(cudaStreamSynchronize(stream));
+
+  // move the merged buffers to the first block so that it keeps its
+  // position in the linked lists
+  auto first = blocks.front();
+  std::swap(first->dst_nodes, merged->dst_nodes);
+  std::swap(first->timestamps, merged->timestamps);
+  std::swap(first->eids, merged->eids);
+  std::swap(first->size, merged->size);
+  std::swap(first->capacity, merged->capacity);
+  std::swap(first->start_timestamp, merged->start_timestamp);
+  std::swap(first->end_timestamp, merged->end_timestamp);
+  allocator_.Deallocate(merged);  // the old buffers of the first block
+  SyncBlock(first, stream);
+
+  for (std::size_t i = 1; i < blocks.size(); i++) {
+    RemoveBlock(node_id, blocks[i], stream);
+    allocator_.Deallocate(blocks[i]);
+  }
+}
+
+void DynamicGraph::SetRetentionPolicy(TimestampType retention_window,
+                                      std::size_t max_edges) {
+  retention_window_ = retention_window;
+  max_edges_ = max_edges;
+
+  // rebuild the index of the oldest blocks
+  oldest_blocks_ = decltype(oldest_blocks_)();
+  if (retention_window_ > 0 || max_edges_ > 0) {
+    for (std::size_t node = 0; node < h_copy_of_d_node_table_.size();
+         node++) {
+      auto head = h_copy_of_d_node_table_[node].head;
+      if (head != nullptr) {
+        oldest_blocks_.emplace(head->end_timestamp, node);
+      }
+    }
+  }
+}
+
+std::size_t DynamicGraph::ApplyRetentionPolicy() {
+  std::size_t num_blocks = 0;
+  if (retention_window_ > 0) {
+    TimestampType cutoff = clock_ - retention_window_;
+    while (!oldest_blocks_.empty() && oldest_blocks_.top().first < cutoff) {
+      NIDType node = oldest_blocks_.top().second;
+      oldest_blocks_.pop();
+
+      auto& list = h_copy_of_d_node_table_[node];
+      while (list.head != nullptr && list.head->end_timestamp < cutoff) {
+        EvictBlock(node, list.head, false);
+        num_blocks++;
+      }
+      if (list.head != nullptr) {
+        oldest_blocks_.emplace(list.head->end_timestamp, node);
+      }
+    }
+  }
+
+  if (max_edges_ > 0) {
+    // evict the oldest blocks in the graph first
+    while (num_edges_ > max_edges_ && !oldest_blocks_.empty()) {
+      auto entry = oldest_blocks_.top();
+      oldest_blocks_.pop();
+
+      NIDType node = entry.second;
+      auto& list = h_copy_of_d_node_table_[node];
+      if (list.head == nullptr) {
+        continue;
+      }
+      if (list.head->end_timestamp == entry.first) {
+        EvictBlock(node, list.head, false);
+        num_blocks++;
+      }
+      if (list.head != nullptr) {
+        oldest_blocks_.emplace(list.head->end_timestamp, node);
+      }
+    }
+  }
+  return num_blocks;
+}
 }  // namespace gnnflow
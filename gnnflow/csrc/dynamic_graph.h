@@ -4,15 +4,17 @@
 #include <thrust/device_ptr.h>
 #include <thrust/device_vector.h>
 
+#include <functional>
 #include <memory>
-#include <set>
+#include <queue>
 #include <tuple>
-#include <unordered_map>
 #include <utility>
 #include <vector>
 
+#include "block_descriptor_arena.h"
 #include "common.h"
 #include "doubly_linked_list.h"
+#include "graph_kernels.h"
 #include "temporal_block_allocator.h"
 
 namespace gnnflow {
@@ -85,6 +87,58 @@ class DynamicGraph {
    */
   std::size_t OffloadOldBlocks(TimestampType timestamp, bool to_file = false);
 
+  /**
+   * @brief Set the retention policy of the graph.
+   *
+   * The policy is applied after each `AddEdges`. It evicts the blocks whose
+   * end timestamps are older than the latest timestamp in the graph minus
+   * `retention_window`, and then evicts the oldest blocks until the graph has
+   * at most `max_edges` edges.
+   *
+   * @param retention_window The retention window. 0 means no window.
+   * @param max_edges The maximum number of edges. 0 means no limit.
+   */
+  void SetRetentionPolicy(TimestampType retention_window,
+                          std::size_t max_edges);
+
+  /**
+   * @brief Apply the retention policy.
+   *
+   * It only visits the nodes whose oldest blocks are expired.
+   *
+   * @return The number of blocks evicted.
+   */
+  std::size_t ApplyRetentionPolicy();
+
+  /**
+   * @brief Merge the runs of adjacent sparse blocks into right-sized blocks.
+   *
+   * A block is sparse if it holds fewer edges than `min_fill` times the
+   * largest block of the node. A run is cut before it outgrows the largest
+   * block. A single sparse block is only rewritten if it is less than
+   * `min_fill` full. The tail is skipped since it is still being filled.
+   *
+   * @param min_fill The fill ratio threshold in (0, 1].
+   *
+   * @return A tuple of (reclaimed bytes, reclaimed blocks).
+   */
+  std::tuple<std::size_t, std::size_t> Compact(float min_fill);
+
+  /**
+   * @brief Set the number of worker threads of `AddEdges`.
+   *
+   * The source nodes of a batch are partitioned into contiguous ranges and
+   * each worker inserts the edges of its own nodes on its own stream.
+   *
+   * @param num_threads The number of worker threads.
+   */
+  void SetNumThreads(int num_threads);
+
+  int num_threads() const { return num_threads_; }
+
+  std::size_t num_evicted_blocks() const { return num_evicted_blocks_; }
+  std::size_t num_evicted_bytes() const { return num_evicted_bytes_; }
+
   std::size_t num_nodes() const;
   std::size_t num_edges() const;
   std::size_t num_src_nodes() const;
@@ -97,6 +151,31 @@ class DynamicGraph {
 
   std::vector<std::size_t> out_degree(const std::vector<NIDType>& nodes) const;
 
+  /**
+   * @brief Get the number of edges of each node with timestamps smaller than
+   * the query timestamp of the node.
+   *
+   * The blocks that end before the query timestamp are counted as a whole.
+   * Only the block that contains the query timestamp is binary-searched (on
+   * the device, for all the nodes at once).
+   *
+   * @param nodes The nodes.
+   * @param timestamps The query timestamps of the nodes.
+   */
+  std::vector<std::size_t> out_degree_before(
+      const std::vector<NIDType>& nodes,
+      const std::vector<TimestampType>& timestamps) const;
+
+  /**
+   * @brief Get the end timestamp of the newest block of each node, i.e., an
+   * upper bound of the timestamps of its edges. It is the lowest timestamp
+   * if the node has no edges.
+   *
+   * @param nodes The nodes.
+   */
+  std::vector<TimestampType> newest_timestamps(
+      const std::vector<NIDType>& nodes) const;
+
   // NB: it is inefficient to call this function every time for each node. Debug
   // only.
   typedef std::tuple<std::vector<NIDType>, std::vector<TimestampType>,
@@ -104,6 +183,44 @@ class DynamicGraph {
       NodeNeighborTuple;
   NodeNeighborTuple get_temporal_neighbors(NIDType node) const;
 
+  typedef std::tuple<std::vector<int64_t>, std::vector<NIDType>,
+                     std::vector<TimestampType>, std::vector<EIDType>>
+      CSRTuple;
+  /**
+   * @brief Export the edges of the given nodes in CSR format.
+   *
+   * The i-th row contains the out edges of `nodes[i]` whose timestamps are
+   * smaller than `time_upper_bound`, sorted by timestamps in ascending order.
+   * All the blocks are read in bulk by one kernel launch.
+   *
+   * @param nodes The nodes to export (i.e., the rows).
+   * @param time_upper_bound The (exclusive) upper bound of the timestamps.
+   *
+   * @return A tuple of (indptr, indices, timestamps, eids).
+   */
+  CSRTuple ToCSR(const std::vector<NIDType>& nodes,
+                 TimestampType time_upper_bound) const;
+
+  /**
+   * @brief Get the out edges of each node in its own time range in CSR
+   * format.
+   *
+   * The i-th row contains the out edges of `nodes[i]` whose timestamps are in
+   * [start_timestamps[i], end_timestamps[i]), sorted by timestamps in
+   * ascending order. The blocks outside of the time range are skipped as a
+   * whole, and only the blocks on its boundaries are binary-searched.
+   *
+   * @param nodes The nodes (i.e., the rows).
+   * @param start_timestamps The start of the time range of each node.
+   * @param end_timestamps The end of the time range of each node.
+   *
+   * @return A tuple of (indptr, indices, timestamps, eids).
+   */
+  CSRTuple NeighborsInRange(
+      const std::vector<NIDType>& nodes,
+      const std::vector<TimestampType>& start_timestamps,
+      const std::vector<TimestampType>& end_timestamps) const;
+
   const DoublyLinkedList* get_device_node_table() const;
 
   int device() const { return device_; }
@@ -113,23 +230,102 @@ class DynamicGraph {
   // NB: does not include metadata. only the edge data.
   float graph_mem_usage() const;
 
-  float graph_metadata_mem_usage();
+  float graph_metadata_mem_usage() const;
+
+  typedef std::tuple<std::vector<std::size_t>, std::vector<std::size_t>,
+                     std::vector<std::size_t>, std::vector<std::size_t>>
+      BlockStatsTuple;
+  /**
+   * @brief Get the shape of the graph without changing it.
+   *
+   * @return A tuple of (out degrees, linked list lengths) of the nodes and
+   * (sizes, capacities) of the blocks.
+   */
+  BlockStatsTuple block_stats() const;
 
  private:
+  // (node, block)
+  typedef std::pair<NIDType, TemporalBlock*> NewBlock;
+
+  /**
+   * @brief The device updates of an ingest worker, which are applied in bulk
+   * by `ApplyIngestBatches` after all workers finish.
+   */
+  struct IngestBatch {
+    // the new blocks to link on the device and to register
+    std::vector<NewBlock> new_blocks;
+    // the blocks whose device descriptors are outdated
+    std::vector<TemporalBlock*> dirty_blocks;
+    // the edges to copy to the blocks. `offset` is the index of the first
+    // edge in the sorted input.
+    std::vector<BlockSegment> edge_segments;
+  };
+
+  /**
+   * @brief Add the edges in [segment_start, segment_end) to the linked list
+   * of a source node.
+   *
+   * The edges of the segment must be sorted by timestamps. It is called by
+   * the ingest workers concurrently for different source nodes, so only the
+   * host side is updated and the device updates are appended to `batch`.
+   */
   void AddEdgesForOneNode(NIDType src_node,
+                          const std::vector<TimestampType>& timestamps,
+                          std::size_t segment_start, std::size_t segment_end,
+                          cudaStream_t stream, IngestBatch* batch);
+
+  /**
+   * @brief Apply the device updates of the ingest workers with one bulk
+   * transfer of the edges and one kernel launch per kind of update.
+   */
+  void ApplyIngestBatches(const std::vector<IngestBatch>& batches,
                           const std::vector<NIDType>& dst_nodes,
                           const std::vector<TimestampType>& timestamps,
-                          const std::vector<EIDType>& eids,
-                          cudaStream_t stream = nullptr);
+                          const std::vector<EIDType>& eids);
+
+  void AddEdgeIds(const std::vector<EIDType>& eids);
+
+  void EvictBlock(NIDType node_id, TemporalBlock* block, bool to_file);
+
+  void RemoveEdgeId(EIDType eid);
 
   void InsertBlock(NIDType node_id, TemporalBlock* block,
                    cudaStream_t stream = nullptr);
 
+  /**
+   * @brief Link a block to the tail of the host and device linked lists.
+   *
+   * It is thread-safe for different nodes.
+   */
+  void LinkBlock(NIDType node_id, TemporalBlock* block,
+                 cudaStream_t stream = nullptr);
+
+  /**
+   * @brief Link a block to the tail of the host linked list and allocate its
+   * device descriptor, without touching the device.
+   */
+  void LinkBlockOnHost(NIDType node_id, TemporalBlock* block);
+
+  /**
+   * @brief Update the bookkeeping of a new block (i.e., the retention
+   * policy), which is not thread-safe.
+   */
+  void RegisterBlock(NIDType node_id, TemporalBlock* block);
+
   void RemoveBlock(NIDType node_id, TemporalBlock* block,
                    cudaStream_t stream = nullptr);
 
   void SyncBlock(TemporalBlock* block, cudaStream_t stream = nullptr);
 
+  /**
+   * @brief Merge adjacent blocks of a node into the first one of them.
+   *
+   * The first block keeps its position in the linked lists and gets a
+   * right-sized buffer. The other blocks are removed.
+   */
+  void MergeBlocks(NIDType node_id, const std::vector<TemporalBlock*>& blocks,
+                   cudaStream_t stream = nullptr);
+
  private:
   TemporalBlockAllocator allocator_;
 
@@ -139,20 +335,41 @@ class DynamicGraph {
   // The copy of the device node table in the host.
   HostNodeTable h_copy_of_d_node_table_;
 
-  // the host pointer to the block -> the device pointer to the block
-  std::unordered_map<TemporalBlock*, TemporalBlock*> h2d_mapping_;
+  // the descriptors of the blocks on the device, indexed by `block->id`
+  BlockDescriptorArena descriptors_;
 
   InsertionPolicy insertion_policy_;
 
   std::vector<cudaStream_t> streams_;
+  int num_threads_;
 
   std::size_t max_node_id_;
 
-  std::set<NIDType> nodes_;
-  std::set<NIDType> src_nodes_;
-  std::unordered_map<EIDType, std::size_t> edges_;
-
-  std::stack<rmm::mr::device_memory_resource*> mem_resources_for_metadata_;
+  // NB: dense bitsets indexed by node/edge ids
+  std::vector<bool> nodes_;
+  std::vector<bool> src_nodes_;
+  std::vector<bool> edges_;
+  std::size_t num_nodes_;
+  std::size_t num_src_nodes_;
+  std::size_t num_edges_;
+
+  // The number of copies of each edge in the graph. It is only allocated once
+  // an edge id is added more than once (e.g., `add_reverse`).
+  std::vector<uint32_t> edge_refcount_;
+
+  // retention policy
+  TimestampType retention_window_;
+  std::size_t max_edges_;
+  // the latest timestamp in the graph
+  TimestampType clock_;
+  // a min-heap of (the end timestamp of the oldest block, node)
+  // NB: the end timestamp can be stale since the oldest block can still grow.
+  typedef std::pair<TimestampType, NIDType> OldestBlockEntry;
+  std::priority_queue<OldestBlockEntry, std::vector<OldestBlockEntry>,
+                      std::greater<OldestBlockEntry>>
+      oldest_blocks_;
+  std::size_t num_evicted_blocks_;
+  std::size_t num_evicted_bytes_;
 
   const int device_;
   bool adaptive_block_size_;
@@ -0,0 +1,78 @@
+#include "graph_kernels.h"
+#include "utils.h"
+
+namespace gnnflow {
+
+__global__ void ClipBlockSegmentsKernel(BlockSegment* segments,
+                                        std::size_t num_segments) {
+  std::size_t tid = threadIdx.x + blockIdx.x * blockDim.x;
+  if (tid >= num_segments) {
+    return;
+  }
+
+  auto& segment = segments[tid];
+  int num_edges = segment.end_idx;
+  int start_idx, end_idx;
+  LowerBound(segment.timestamps, num_edges, segment.start_timestamp,
+             &start_idx);
+  LowerBound(segment.timestamps, num_edges, segment.end_timestamp, &end_idx);
+  segment.start_idx = start_idx;
+  segment.end_idx = end_idx;
+}
+
+__global__ void GatherBlockSegmentsKernel(const BlockSegment* segments,
+                                          std::size_t num_segments,
+                                          NIDType* dst_nodes,
+                                          TimestampType* timestamps,
+                                          EIDType* eids) {
+  for (std::size_t i = blockIdx.x; i < num_segments; i += gridDim.x) {
+    const auto& segment = segments[i];
+    std::size_t num_edges = segment.end_idx - segment.start_idx;
+    for (std::size_t j = threadIdx.x; j < num_edges; j += blockDim.x) {
+      std::size_t src = segment.start_idx + j;
+      std::size_t dst = segment.offset + j;
+      dst_nodes[dst] = segment.dst_nodes[src];
+      timestamps[dst] = segment.timestamps[src];
+      eids[dst] = segment.eids[src];
+    }
+  }
+}
+
+__global__ void ScatterBlockSegmentsKernel(const BlockSegment* segments,
+                                           std::size_t num_segments,
+                                           const NIDType* dst_nodes,
+                                           const TimestampType* timestamps,
+                                           const EIDType* eids) {
+  for (std::size_t i = blockIdx.x; i < num_segments; i += gridDim.x) {
+    const auto& segment = segments[i];
+    std::size_t num_edges = segment.end_idx - segment.start_idx;
+    for (std::size_t j = threadIdx.x; j < num_edges; j += blockDim.x) {
+      std::size_t src = segment.offset + j;
+      std::size_t dst = segment.start_idx + j;
+      segment.dst_nodes[dst] = dst_nodes[src];
+      segment.timestamps[dst] = timestamps[src];
+      segment.eids[dst] = eids[src];
+    }
+  }
+}
+
+__global__ void SyncBlockDescriptorsKernel(TemporalBlock* const* d_blocks,
+                                           const TemporalBlock* blocks,
+                                           std::size_t num_blocks) {
+  std::size_t tid = threadIdx.x + blockIdx.x * blockDim.x;
+  if (tid >= num_blocks) {
+    return;
+  }
+
+  auto d_block = d_blocks[tid];
+  const auto& block = blocks[tid];
+  d_block->dst_nodes = block.dst_nodes;
+  d_block->timestamps = block.timestamps;
+  d_block->eids = block.eids;
+  d_block->size = block.size;
+  d_block->capacity = block.capacity;
+  d_block->start_timestamp = block.start_timestamp;
+  d_block->end_timestamp = block.end_timestamp;
+}
+
+}  // namespace gnnflow
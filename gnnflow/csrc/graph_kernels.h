@@ -0,0 +1,75 @@
+#ifndef GNNFLOW_GRAPH_KERNELS_H_
+#define GNNFLOW_GRAPH_KERNELS_H_
+
+#include <cstddef>
+
+#include "common.h"
+
+namespace gnnflow {
+
+/**
+ * @brief A contiguous range of edges in a temporal block.
+ *
+ * It is used to read many (partial) blocks in bulk. The edges in
+ * [start_idx, end_idx) of the block are copied to the output buffers starting
+ * at `offset`.
+ */
+struct BlockSegment {
+  NIDType* dst_nodes;
+  TimestampType* timestamps;
+  EIDType* eids;
+
+  std::size_t start_idx;
+  std::size_t end_idx;
+  std::size_t offset;
+
+  // the time range [start_timestamp, end_timestamp) of the segment. Only used
+  // by `ClipBlockSegmentsKernel`.
+  TimestampType start_timestamp;
+  TimestampType end_timestamp;
+};
+
+/**
+ * @brief Shrink [start_idx, end_idx) of each segment to the edges in
+ * [start_timestamp, end_timestamp) with binary search.
+ *
+ * NB: `end_idx` must be initialized to the size of the block.
+ */
+__global__ void ClipBlockSegmentsKernel(BlockSegment* segments,
+                                        std::size_t num_segments);
+
+/**
+ * @brief Copy the edges of each segment to the output buffers.
+ *
+ * Each CUDA block copies one segment at a time.
+ */
+__global__ void GatherBlockSegmentsKernel(const BlockSegment* segments,
+                                          std::size_t num_segments,
+                                          NIDType* dst_nodes,
+                                          TimestampType* timestamps,
+                                          EIDType* eids);
+
+/**
+ * @brief Copy the edges in the input buffers to each segment, i.e., the
+ * reverse of `GatherBlockSegmentsKernel`.
+ *
+ * Each CUDA block copies one segment at a time.
+ */
+__global__ void ScatterBlockSegmentsKernel(const BlockSegment* segments,
+                                           std::size_t num_segments,
+                                           const NIDType* dst_nodes,
+                                           const TimestampType* timestamps,
+                                           const EIDType* eids);
+
+/**
+ * @brief Copy the host copies of the blocks to their device descriptors.
+ *
+ * The device linked list pointers (i.e., prev and next) are not copied.
+ */
+__global__ void SyncBlockDescriptorsKernel(TemporalBlock* const* d_blocks,
+                                           const TemporalBlock* blocks,
+                                           std::size_t num_blocks);
+
+}  // namespace gnnflow
+
+#endif  // GNNFLOW_GRAPH_KERNELS_H_
@@ -128,6 +128,8 @@ void TemporalBlockAllocator::Reallocate(TemporalBlock *block, std::size_t size,
   CopyTemporalBlock(block, &tmp, device_, stream);
   DeallocateInternal(block);
 
+  // NB: the block keeps its device descriptor
+  tmp.id = block->id;
   *block = tmp;
 }
 
@@ -1,6 +1,7 @@
 #ifndef GNNFLOW_TEMPORAL_BLOCK_ALLOCATOR_H_
 #define GNNFLOW_TEMPORAL_BLOCK_ALLOCATOR_H_
 
+#include <atomic>
 #include <mutex>
 #include <rmm/mr/device/device_memory_resource.hpp>
 #include <stack>
@@ -100,7 +101,8 @@ class TemporalBlockAllocator {
 
   const int device_;
 
-  std::size_t allocated_;
+  // NB: blocks can be allocated by several ingest workers at the same time
+  std::atomic<std::size_t> allocated_;
 };
 
 }  // namespace gnnflow
@@ -35,31 +35,75 @@ void CopyEdgesToBlock(TemporalBlock* block,
                       const std::vector<TimestampType>& timestamps,
                       const std::vector<EIDType>& eids, std::size_t start_idx,
                       std::size_t num_edges, int device, cudaStream_t stream) {
-  CHECK_NOTNULL(block);
   CHECK_EQ(dst_nodes.size(), timestamps.size());
   CHECK_EQ(eids.size(), timestamps.size());
-  CHECK_LE(block->size + num_edges, block->capacity);
-  // NB: we assume that the incoming edges are newer than the existing ones.
-  CHECK_LE(block->end_timestamp, timestamps[start_idx + num_edges - 1]);
+  auto segment = StageEdgesToBlock(block, timestamps, start_idx, num_edges);
 
   if (device == 0) {
     CUDA_CALL(cudaMemcpyAsync(
-        block->dst_nodes + block->size, &dst_nodes[start_idx],
+        segment.dst_nodes + segment.start_idx, &dst_nodes[start_idx],
         sizeof(NIDType) * num_edges, cudaMemcpyDefault, stream));
 
     CUDA_CALL(cudaMemcpyAsync(
-        block->timestamps + block->size, &timestamps[start_idx],
+        segment.timestamps + segment.start_idx, &timestamps[start_idx],
         sizeof(TimestampType) * num_edges, cudaMemcpyDefault, stream));
 
-    CUDA_CALL(cudaMemcpyAsync(block->eids + block->size, &eids[start_idx],
-                              sizeof(EIDType) * num_edges, cudaMemcpyDefault,
-                              stream));
+    CUDA_CALL(cudaMemcpyAsync(segment.eids + segment.start_idx,
+                              &eids[start_idx], sizeof(EIDType) * num_edges,
+                              cudaMemcpyDefault, stream));
   }
+}
+
+BlockSegment StageEdgesToBlock(TemporalBlock* block,
+                               const std::vector<TimestampType>& timestamps,
+                               std::size_t start_idx, std::size_t num_edges) {
+  CHECK_NOTNULL(block);
+  CHECK_LE(block->size + num_edges, block->capacity);
+  // NB: we assume that the incoming edges are newer than the existing ones.
+  CHECK_LE(block->end_timestamp, timestamps[start_idx + num_edges - 1]);
+
+  BlockSegment segment = {block->dst_nodes,
+                          block->timestamps,
+                          block->eids,
+                          block->size,
+                          block->size + num_edges,
+                          start_idx,
+                          timestamps[start_idx],
+                          timestamps[start_idx + num_edges - 1]};
   block->size += num_edges;
 
   block->start_timestamp =
       std::min(block->start_timestamp, timestamps[start_idx]);
   block->end_timestamp = timestamps[start_idx + num_edges - 1];
+  return segment;
+}
+
+void AppendTemporalBlock(TemporalBlock* src, TemporalBlock* dst, int device,
+                         cudaStream_t stream) {
+  CHECK_NOTNULL(src);
+  CHECK_NOTNULL(dst);
+  CHECK_LE(dst->size + src->size, dst->capacity);
+  if (src->size == 0) {
+    return;
+  }
+  CHECK_LE(dst->end_timestamp, src->start_timestamp);
+
+  if (device == 0) {
+    CUDA_CALL(cudaMemcpyAsync(dst->dst_nodes + dst->size, src->dst_nodes,
+                              src->size * sizeof(NIDType), cudaMemcpyDefault,
+                              stream));
+
+    CUDA_CALL(cudaMemcpyAsync(dst->timestamps + dst->size, src->timestamps,
+                              src->size * sizeof(TimestampType),
+                              cudaMemcpyDefault, stream));
+
+    CUDA_CALL(cudaMemcpyAsync(dst->eids + dst->size, src->eids,
+                              src->size * sizeof(EIDType), cudaMemcpyDefault,
+                              stream));
+  }
+  dst->size += src->size;
+  dst->start_timestamp = std::min(dst->start_timestamp, src->start_timestamp);
+  dst->end_timestamp = src->end_timestamp;
 }
 
 std::size_t GetSharedMemoryMaxSize() {
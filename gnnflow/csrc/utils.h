@@ -9,6 +9,7 @@
 #include <vector>
 
 #include "common.h"
+#include "graph_kernels.h"
 
 namespace gnnflow {
 
@@ -26,6 +27,26 @@ std::vector<std::size_t> stable_sort_indices(const std::vector<T>& v) {
   return idx;
 }
 
+/**
+ * @brief Stable sort the indices by (keys, values) in lexicographical order.
+ */
+template <typename K, typename V>
+std::vector<std::size_t> stable_sort_indices(const std::vector<K>& keys,
+                                             const std::vector<V>& values) {
+  std::vector<std::size_t> idx(keys.size());
+  std::iota(idx.begin(), idx.end(), 0);
+
+  std::stable_sort(idx.begin(), idx.end(),
+                   [&keys, &values](std::size_t i1, std::size_t i2) {
+                     if (keys[i1] != keys[i2]) {
+                       return keys[i1] < keys[i2];
+                     }
+                     return values[i1] < values[i2];
+                   });
+
+  return idx;
+}
+
 template <typename T>
 std::vector<T> sort_vector(const std::vector<T>& v,
                            const std::vector<std::size_t>& idx) {
@@ -74,6 +95,40 @@ void CopyEdgesToBlock(TemporalBlock* block,
                       std::size_t num_edges, int device,
                       cudaStream_t stream = nullptr);
 
+/**
+ * @brief Reserve the space of incoming edges in the block without copying
+ * them.
+ *
+ * The metadata of the block (e.g., size and timestamps) is updated as if the
+ * edges were copied.
+ *
+ * @param block The destination temporal block.
+ * @param timestamps The timestamps of the incoming edges.
+ * @param start_idx The start index of the incoming edges.
+ * @param num_edges The number of incoming edges.
+ *
+ * @return The segment of the block to copy the edges in
+ * [start_idx, start_idx + num_edges) to.
+ */
+BlockSegment StageEdgesToBlock(TemporalBlock* block,
+                               const std::vector<TimestampType>& timestamps,
+                               std::size_t start_idx, std::size_t num_edges);
+
+/**
+ * @brief Append the edges of a temporal block to another block.
+ *
+ * The destination block should have enough space for the edges of the
+ * source block, and the edges of the source block should be newer than the
+ * existing ones in the destination block.
+ *
+ * @param src The source temporal block.
+ * @param dst The destination temporal block.
+ * @param device The device id.
+ * @param stream The CUDA stream.
+ */
+void AppendTemporalBlock(TemporalBlock* src, TemporalBlock* dst, int device,
+                         cudaStream_t stream = nullptr);
+
 std::size_t GetSharedMemoryMaxSize();
 
 void Copy(void* dst, const void* src, std::size_t size);
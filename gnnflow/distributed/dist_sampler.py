@@ -13,6 +13,7 @@ from dgl.heterograph import DGLBlock
 
 import gnnflow.distributed.graph_services as graph_services
 from gnnflow import TemporalSampler
+from gnnflow.temporal_sampler import _expand_frontier, _unique_frontier
 from gnnflow.distributed.common import SamplingResultTorch
 from gnnflow.distributed.utils import HandleManager
 from gnnflow.distributed.dist_graph import DistributedDynamicGraph
@@ -25,7 +26,8 @@ class DistributedTemporalSampler:
     Distributed Temporal Sampler API
     """
 
-    def __init__(self, sampler: TemporalSampler, dgraph: DistributedDynamicGraph,
+    def __init__(self, sampler: TemporalSampler,
+                 dgraph: DistributedDynamicGraph,
                  dynamic_scheduling: bool = False):
         """
         Initialize the distributed temporal sampler.
@@ -44,6 +46,7 @@ class DistributedTemporalSampler:
         self._local_world_size = local_world_size()
         self._num_layers = self._sampler._num_layers
         self._num_snapshots = self._sampler._num_snapshots
+        self._dedup_frontier = self._sampler._dedup_frontier
         self._partition_table = self._dgraph.get_partition_table()
         self._num_partitions = self._dgraph.num_partitions()
         self._partition_id = self._rank // self._local_world_size
@@ -85,7 +88,8 @@ class DistributedTemporalSampler:
                 self._handle_manager.mark_done(handle)
             time.sleep(0.001)
 
-    def _transform_output(self, input: SamplingResult, output: SamplingResultTorch):
+    def _transform_output(self, input: SamplingResult,
+                          output: SamplingResultTorch):
         output.row = torch.from_numpy(input.row())
         output.col = torch.from_numpy(input.col())
         output.num_src_nodes = input.num_src_nodes()
@@ -170,6 +174,21 @@ class DistributedTemporalSampler:
         Returns:
             message flow graph for the specific layer and snapshot.
         """
+        if self._dedup_frontier:
+            # only sample the unique (vertex, timestamp) pairs
+            unique_vertices, unique_timestamps, inverse = _unique_frontier(
+                target_vertices, timestamps)
+            if len(unique_vertices) < len(target_vertices):
+                mfg = self._sample_layer_global(
+                    unique_vertices, unique_timestamps, layer, snapshot)
+                return self._expand_mfg(mfg, target_vertices, timestamps,
+                                        inverse)
+        return self._sample_layer_global(target_vertices, timestamps,
+                                         layer, snapshot)
+
+    def _sample_layer_global(self, target_vertices: np.ndarray,
+                             timestamps: np.ndarray, layer: int,
+                             snapshot: int) -> DGLBlock:
         # dispatch target vertices and timestamps to different partitions
         partition_table = self._partition_table
         partition_ids = partition_table[target_vertices]
@@ -241,6 +260,46 @@ class DistributedTemporalSampler:
             target_vertices), 'Layer {}\tError: Number of destination nodes does not match'.format(layer)
         return mfg
 
+    def _expand_mfg(self, mfg: DGLBlock, target_vertices: np.ndarray,
+                    timestamps: np.ndarray, inverse: np.ndarray) -> DGLBlock:
+        """
+        Scatter the neighbors in the message flow graph of the unique
+        (vertex, timestamp) pairs back to all target vertices.
+
+        Args:
+            mfg: message flow graph of the unique pairs.
+            target_vertices: all target vertices.
+            timestamps: timestamps of all target vertices.
+            inverse: the unique pair of each target vertex.
+
+        Returns:
+            message flow graph of all target vertices.
+        """
+        src, dst = mfg.edges()
+        src = src.numpy()
+        row, (src_nodes, src_timestamps, delta_timestamps, eids) = \
+            _expand_frontier(inverse, mfg.num_dst_nodes(), dst.numpy(),
+                             mfg.srcdata['ID'].numpy()[src],
+                             mfg.srcdata['ts'].numpy()[src],
+                             mfg.edata['dt'].numpy(),
+                             mfg.edata['ID'].numpy())
+
+        num_dst_nodes = len(target_vertices)
+        num_src_nodes = num_dst_nodes + len(row)
+        col = np.arange(num_dst_nodes, num_src_nodes, dtype=np.int64)
+        expanded_mfg = dgl.create_block(
+            (col, row), num_src_nodes=num_src_nodes,
+            num_dst_nodes=num_dst_nodes)
+
+        all_nodes = np.concatenate([target_vertices, src_nodes])
+        all_timestamps = np.concatenate(
+            [timestamps, src_timestamps]).astype(np.float32)
+        expanded_mfg.srcdata['ID'] = torch.from_numpy(all_nodes)
+        expanded_mfg.srcdata['ts'] = torch.from_numpy(all_timestamps)
+        expanded_mfg.edata['dt'] = torch.from_numpy(delta_timestamps)
+        expanded_mfg.edata['ID'] = torch.from_numpy(eids)
+        return expanded_mfg
+
     def _merge_sampling_results(self, sampling_results: List[SamplingResultTorch], masks: List[torch.Tensor]) -> DGLBlock:
         """
         Merge sampling results from different partitions.
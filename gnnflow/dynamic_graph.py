@@ -1,8 +1,30 @@
-from typing import Optional, Tuple
+import json
+import struct
+import weakref
+from typing import Optional, Tuple, Union
 
 import numpy as np
 
-from libgnnflow import InsertionPolicy, MemoryResourceType, _DynamicGraph
+from .cpu import _DynamicGraph as _CPUDynamicGraph
+from .cpu.dynamic_graph import kBlockSpaceSize
+
+try:
+    from libgnnflow import InsertionPolicy, MemoryResourceType, _DynamicGraph
+except ImportError:
+    # NB: the CUDA extension is not built on CPU-only hosts
+    _DynamicGraph = None
+
+# NB: the checkpoint starts with the magic number, the format version, and
+# the length of a JSON header. The header holds the graph config and the
+# (dtype, length, offset) of every array. The arrays follow the header and
+# are aligned to `_kCheckpointAlignment` bytes so that they can be
+# memory-mapped directly.
+_kCheckpointMagic = b"GNNFLOW\x00"
+_kCheckpointVersion = 1
+_kCheckpointPrefix = struct.Struct("<8sII")
+_kCheckpointAlignment = 64
+_kCheckpointArrays = [("indptr", np.int64), ("indices", np.int64),
+                      ("timestamps", np.float32), ("eids", np.int64)]
 
 
 class DynamicGraph:
@@ -27,7 +49,17 @@ class DynamicGraph:
             eids: Optional[np.ndarray] = None,
             add_reverse: bool = False,
             device: int = 0,
-            adaptive_block_size: bool = True):
+            adaptive_block_size: bool = True,
+            backend: str = "cuda",
+            retention_window: Optional[float] = None,
+            max_edges: Optional[int] = None,
+            cold_storage_path: Optional[str] = None,
+            cold_cache_size: int = 1024,
+            temporal_index: bool = False,
+            compact_threshold: Optional[float] = None,
+            num_ingest_threads: int = 1,
+            reorder_window: Optional[float] = None,
+            compact_payload: bool = False):
         """
         The graph is initially empty and can be optionaly initialized with
         a list of edges.
@@ -48,7 +80,146 @@ class DynamicGraph:
             add_reverse: optional, bool, whether to add reverse edges.
             device: optional, int, the device to use.
             adaptive_block_size: optional, bool, whether to use adaptive block size.
+            backend: optional, str, the backend to store the graph.
+                valid options: ("cuda" or "cpu") (case insensitive). The "cpu"
+                backend keeps the blocks in host memory and ignores
+                `mem_resource_type` and `device`.
+            retention_window: optional, float, only keep the blocks whose
+                end timestamps are within `retention_window` of the latest
+                timestamp in the graph. Older blocks are evicted after each
+                `add_edges`.
+            max_edges: optional, int, the maximum number of edges to keep.
+                The oldest blocks are evicted after each `add_edges` until
+                the graph fits in the budget.
+            cold_storage_path: optional, str, the directory to spill the old
+                blocks to with `spill_old_blocks`. The spilled blocks are
+                faulted back on demand by sampling and `to_csr`. Only
+                supported by the "cpu" backend: the device blocks of the
+                cuda backend cannot be faulted back during sampling, and a
+                cuda graph raises ValueError.
+            cold_cache_size: optional, int, the maximum number of spilled
+                blocks kept in memory after being faulted back.
+            temporal_index: optional, bool, whether to keep the start
+                timestamps of the blocks of each vertex in a sorted array so
+                that sampling can binary-search the first block to visit
+                instead of walking the linked list from the tail. Only
+                supported by the "cpu" backend: the CUDA sampler walks the
+                device linked lists without an index, and a cuda graph
+                raises ValueError.
+            compact_threshold: optional, float, run `compact` after
+                `add_edges` once `avg_linked_list_length` exceeds it.
+            num_ingest_threads: optional, int, the number of worker threads
+                of `add_edges`. Each worker inserts the edges of a disjoint
+                range of source vertices. The "cpu" backend ingests a batch
+                with vectorized operations and ignores it.
+            reorder_window: optional, float, buffer the incoming edges until
+                the latest timestamp seen by `add_edges` is `reorder_window`
+                ahead of them, so that edges arriving out of order within
+                the window are inserted in sorted position. The buffered
+                edges are not visible until they are flushed (see `flush`).
+                Edges older than the flushed ones are merged into the
+                linked lists of their source vertices, which is much
+                slower. The merge is only supported by the "cpu" backend;
+                the cuda backend can only append and `add_edges` raises
+                ValueError for such edges.
+            compact_payload: optional, bool, store the target vertices as
+                int32 and the edge ids as int32 deltas from a graph-wide
+                base edge id in host memory, which takes 12 bytes per edge
+                instead of 20. The storage is widened to int64 if they
+                overflow. The timestamps are stored as is. Only supported by
+                the "cpu" backend: it does not shrink the device blocks of
+                the cuda backend, which rejects the option.
         """
+        backend = backend.lower()
+        self._config = {
+            "initial_pool_size": initial_pool_size,
+            "maximum_pool_size": maximum_pool_size,
+            "mem_resource_type": mem_resource_type,
+            "minimum_block_size": minimum_block_size,
+            "blocks_to_preallocate": blocks_to_preallocate,
+            "insertion_policy": insertion_policy,
+            "device": device,
+            "adaptive_block_size": adaptive_block_size,
+            "backend": backend,
+            "retention_window": retention_window,
+            "max_edges": max_edges,
+            "cold_storage_path": cold_storage_path,
+            "cold_cache_size": cold_cache_size,
+            "temporal_index": temporal_index,
+            "compact_threshold": compact_threshold,
+            "num_ingest_threads": num_ingest_threads,
+            "reorder_window": reorder_window,
+            "compact_payload": compact_payload,
+        }
+        if backend == "cpu":
+            insertion_policy = insertion_policy.lower()
+            self._dgraph = _CPUDynamicGraph(
+                initial_pool_size, maximum_pool_size, minimum_block_size,
+                blocks_to_preallocate, insertion_policy, adaptive_block_size,
+                compact_payload)
+        elif backend == "cuda":
+            if compact_payload:
+                raise ValueError(
+                    "Compact payload is only supported by the cpu backend; "
+                    "the device blocks store full-width edges")
+            self._dgraph = self._create_cuda_graph(
+                initial_pool_size, maximum_pool_size, mem_resource_type,
+                minimum_block_size, blocks_to_preallocate, insertion_policy,
+                device, adaptive_block_size)
+            self._dgraph.set_num_threads(num_ingest_threads)
+        else:
+            raise ValueError("Invalid backend: {}".format(backend))
+        self._backend = backend
+        self._next_eid = 0
+        self._compact_threshold = compact_threshold
+
+        # reorder buffer
+        self._reorder_window = reorder_window
+        # buffered (source_vertices, target_vertices, timestamps, eids)
+        self._reorder_buffer = []
+        self._max_timestamp = float("-inf")
+        # the edges older than it are already flushed
+        self._watermark = float("-inf")
+
+        # the sampling caches of the samplers bound to the graph (see
+        # `TemporalSampler`), invalidated when the edges change
+        self._sampling_caches = weakref.WeakSet()
+
+        if cold_storage_path is not None:
+            if backend != "cpu":
+                raise ValueError(
+                    "Cold storage is only supported by the cpu backend; "
+                    "use offload_old_blocks to evict device blocks")
+            self._dgraph.enable_cold_storage(cold_storage_path,
+                                             cold_cache_size)
+
+        if temporal_index:
+            if backend != "cpu":
+                raise ValueError(
+                    "Temporal index is only supported by the cpu backend; "
+                    "the cuda sampler walks the device linked lists")
+            self._dgraph.enable_temporal_index()
+
+        if retention_window is not None or max_edges is not None:
+            self._dgraph.set_retention_policy(
+                retention_window or 0.0, max_edges or 0)
+
+        # initialize the graph with edges
+        if source_vertices is not None and target_vertices is not None \
+                and timestamps is not None:
+            self.add_edges(source_vertices, target_vertices,
+                           timestamps, eids, add_reverse)
+
+    @staticmethod
+    def _create_cuda_graph(
+            initial_pool_size: int, maximum_pool_size: int,
+            mem_resource_type: str, minimum_block_size: int,
+            blocks_to_preallocate: int, insertion_policy: str, device: int,
+            adaptive_block_size: bool):
+        if _DynamicGraph is None:
+            raise RuntimeError(
+                "libgnnflow is not available. Use backend='cpu' instead.")
+
         mem_resource_type = mem_resource_type.lower()
         if mem_resource_type == "cuda":
             mem_resource_type = MemoryResourceType.CUDA
@@ -71,17 +242,11 @@ class DynamicGraph:
             raise ValueError("Invalid insertion policy: {}".format(
                 insertion_policy))
 
-        self._dgraph = _DynamicGraph(
+        return _DynamicGraph(
             initial_pool_size, maximum_pool_size, mem_resource_type,
             minimum_block_size, blocks_to_preallocate, insertion_policy,
             device, adaptive_block_size)
 
-        # initialize the graph with edges
-        if source_vertices is not None and target_vertices is not None \
-                and timestamps is not None:
-            self.add_edges(source_vertices, target_vertices,
-                           timestamps, eids, add_reverse)
-
     def add_edges(
             self, source_vertices: np.ndarray, target_vertices: np.ndarray,
             timestamps: np.ndarray, eids: Optional[np.ndarray] = None, add_reverse: bool = False):
@@ -99,7 +264,8 @@ class DynamicGraph:
 
         Raises:
             ValueError: if the timestamps are older than the existing edges in
-                        the graph.
+                        the graph and they cannot be merged (see
+                        `reorder_window`).
         """
         assert len(source_vertices.shape) == 1 and len(
             target_vertices.shape) == 1 and len(timestamps.shape) == 1, "Edges must be 1D tensors"
@@ -109,8 +275,11 @@ class DynamicGraph:
             "and edge ids must be the same."
 
         if eids is None:
-            num_edges = self.num_edges()
-            eids = np.arange(num_edges, num_edges + len(source_vertices))
+            # NB: evicted edges do not give their ids back
+            eids = np.arange(self._next_eid,
+                             self._next_eid + len(source_vertices))
+        if len(eids) > 0:
+            self._next_eid = max(self._next_eid, int(np.max(eids)) + 1)
 
         if add_reverse:
             source_vertices_ext = np.concatenate(
@@ -122,8 +291,138 @@ class DynamicGraph:
             timestamps = np.concatenate([timestamps, timestamps])
             eids = np.concatenate([eids, eids])
 
+        if self._reorder_window is None:
+            self._insert_edges(source_vertices, target_vertices, timestamps,
+                               eids)
+            return
+
+        timestamps = np.asarray(timestamps)
+        eids = np.asarray(eids)
+        late = timestamps < self._watermark
+        if np.any(late):
+            if self._backend != "cpu":
+                raise ValueError(
+                    "The timestamps are older than the reorder window; "
+                    "late edges can only be merged by the cpu backend")
+            self._dgraph.merge_edges(
+                source_vertices[late], target_vertices[late],
+                timestamps[late], eids[late])
+            self._invalidate_sampling_caches(source_vertices[late])
+            self._maybe_compact()
+
+        on_time = ~late
+        if np.any(on_time):
+            self._reorder_buffer.append((
+                source_vertices[on_time], target_vertices[on_time],
+                timestamps[on_time], eids[on_time]))
+            self._max_timestamp = max(self._max_timestamp,
+                                      float(timestamps[on_time].max()))
+            self._flush(self._max_timestamp - self._reorder_window)
+
+    def flush(self):
+        """
+        Insert all edges in the reorder buffer into the graph. The edges
+        added later must not be older than them unless they can be merged
+        (see `reorder_window`).
+        """
+        self._flush(self._max_timestamp)
+
+    def _flush(self, watermark: float):
+        """
+        Insert the buffered edges whose timestamps are not greater than the
+        watermark.
+        """
+        self._watermark = max(self._watermark, watermark)
+        if not self._reorder_buffer:
+            return
+        source_vertices, target_vertices, timestamps, eids = [
+            np.concatenate(arrays) for arrays in zip(*self._reorder_buffer)]
+        ready = timestamps <= self._watermark
+        if not np.any(ready):
+            return
+
+        pending = ~ready
+        self._reorder_buffer = []
+        if np.any(pending):
+            self._reorder_buffer.append((
+                source_vertices[pending], target_vertices[pending],
+                timestamps[pending], eids[pending]))
+        self._insert_edges(source_vertices[ready], target_vertices[ready],
+                           timestamps[ready], eids[ready])
+
+    def num_buffered_edges(self) -> int:
+        """
+        Return the number of edges in the reorder buffer.
+        """
+        return sum(len(edges[0]) for edges in self._reorder_buffer)
+
+    def _insert_edges(
+            self, source_vertices: np.ndarray, target_vertices: np.ndarray,
+            timestamps: np.ndarray, eids: np.ndarray):
         self._dgraph.add_edges(
             source_vertices, target_vertices, timestamps, eids)
+        self._invalidate_sampling_caches(source_vertices)
+        self._maybe_compact()
+
+    def _invalidate_sampling_caches(
+            self, vertices: Optional[np.ndarray] = None):
+        """
+        Drop the cached samples of the vertices whose edges changed, or of
+        all vertices if None.
+        """
+        for cache in list(self._sampling_caches):
+            cache.invalidate(vertices)
+
+    def _maybe_compact(self):
+        if self._backend == "cpu" and self._dgraph.num_snapshots() > 0:
+            # NB: the blocks cannot be rewritten while snapshots are alive
+            return
+        if self._compact_threshold is not None and \
+                self.avg_linked_list_length() > self._compact_threshold:
+            self.compact()
+            # NB: full blocks are not merged, so do not compact again until
+            # the lists have grown substantially
+            self._compact_threshold = max(
+                self._config["compact_threshold"],
+                2 * self.avg_linked_list_length())
+
+    @property
+    def backend(self) -> str:
+        """
+        Return the backend of the graph ("cuda" or "cpu").
+        """
+        return self._backend
+
+    def snapshot(self) -> "GraphSnapshot":
+        """
+        Take a snapshot of the graph. A `TemporalSampler` bound to the
+        snapshot only sees the edges in the graph when it is taken, so that
+        new edges can be added to the graph while the snapshot is sampled
+        (e.g., ingest the next increment while training on the current one).
+
+        The snapshot only pins the newest block of each vertex and its size,
+        since edges are only appended after them. While snapshots are alive,
+        the operations that rewrite or free blocks (`delete_edges`,
+        `update_edges`, `compact`, `offload_old_blocks`, `spill_old_blocks`,
+        and inserting edges older than the existing ones of a vertex) raise
+        RuntimeError, and the retention policy and the auto compaction are
+        deferred. Release the snapshot (or use it as a context manager) when
+        it is no longer needed. The edges in the reorder buffer are not in
+        the snapshot.
+
+        Only supported by the "cpu" backend. The cuda backend updates the
+        device linked lists in place and cannot pin them, so a cuda graph
+        cannot be sampled while edges are added to it.
+
+        Returns: the snapshot.
+
+        Raises:
+            ValueError: if the graph is on the cuda backend.
+        """
+        if self._backend != "cpu":
+            raise ValueError(
+                "Snapshots are only supported by the cpu backend")
+        return GraphSnapshot(self._dgraph.snapshot())
 
     def offload_old_blocks(self, timestamp: float, to_file: bool = False):
         """
@@ -136,7 +435,115 @@ class DynamicGraph:
         Return:
             the number of blocks offloaded.
         """
-        return self._dgraph.offload_old_blocks(timestamp, to_file)
+        num_blocks = self._dgraph.offload_old_blocks(timestamp, to_file)
+        self._invalidate_sampling_caches()
+        return num_blocks
+
+    def compact(self, min_fill: float = 0.5) -> Tuple[int, int]:
+        """
+        Merge the runs of adjacent sparse blocks of each vertex into
+        right-sized blocks to reclaim memory and shorten the linked lists.
+
+        A block is sparse if it holds fewer edges than `min_fill` times the
+        largest block of the vertex. The newest block of each vertex is never
+        merged since it is still being filled.
+
+        Args:
+            min_fill: the fill ratio threshold in (0, 1].
+
+        Returns: A tuple of (reclaimed bytes, reclaimed blocks).
+        """
+        if not 0 < min_fill <= 1:
+            raise ValueError("min_fill must be in (0, 1]")
+        return tuple(self._dgraph.compact(min_fill))
+
+    def delete_edges(self, eids: np.ndarray) -> int:
+        """
+        Delete edges from the graph. All copies of an edge (e.g., the reverse
+        edge added by `add_reverse`) are deleted.
+
+        The edges are tombstoned inside their blocks and skipped by sampling
+        and `to_csr`. The tombstones are dropped by `compact`. Only
+        supported by the "cpu" backend: the device blocks of the cuda
+        backend have no tombstones.
+
+        Args:
+            eids: 1D tensor, the ids of the edges to delete. The ids that are
+                not in the graph are ignored.
+
+        Return:
+            the number of edges deleted.
+
+        Raises:
+            ValueError: if the graph is on the cuda backend.
+        """
+        if self._backend != "cpu":
+            raise ValueError(
+                "Deleting edges is only supported by the cpu backend")
+        num_deleted = self._dgraph.delete_edges(np.asarray(eids))
+        self._invalidate_sampling_caches()
+        return num_deleted
+
+    def update_edges(self, eids: np.ndarray, timestamps: np.ndarray):
+        """
+        Change the timestamps of edges in the graph. All copies of an edge
+        are updated. Only supported by the "cpu" backend, since the edges
+        are moved with the merge path of `reorder_window`, which the device
+        blocks of the cuda backend do not have.
+
+        Args:
+            eids: 1D tensor, the unique ids of the edges to update.
+            timestamps: 1D tensor, the new timestamps of the edges.
+
+        Raises:
+            ValueError: if some edges are not in the graph, or if the graph
+                is on the cuda backend.
+        """
+        if self._backend != "cpu":
+            raise ValueError(
+                "Updating edges is only supported by the cpu backend")
+        self._dgraph.update_edges(np.asarray(eids), np.asarray(timestamps))
+        self._invalidate_sampling_caches()
+
+    def spill_old_blocks(self, timestamp: float) -> int:
+        """
+        Move the blocks whose end timestamps are older than the timestamp to
+        the cold storage. Unlike `offload_old_blocks`, the spilled edges are
+        still part of the graph and are read back when needed.
+
+        Args:
+            timestamp: the timestamp to spill the blocks before.
+
+        Return:
+            the number of blocks spilled.
+        """
+        if self._config["cold_storage_path"] is None:
+            raise RuntimeError("Cold storage is not enabled")
+        return self._dgraph.spill_old_blocks(timestamp)
+
+    def cold_storage_stats(self) -> dict:
+        """
+        Return the number of spilled blocks and bytes, the number of blocks
+        faulted back and resident in memory, and the hits and misses of
+        the faulted block cache.
+        """
+        if self._config["cold_storage_path"] is None:
+            return {}
+        return self._dgraph.cold_storage_stats()
+
+    def num_evicted_blocks(self) -> int:
+        """
+        Return the number of blocks evicted by the retention policy or
+        `offload_old_blocks`.
+        """
+        return self._dgraph.num_evicted_blocks()
+
+    def num_evicted_bytes(self) -> int:
+        """
+        Return the size of the blocks evicted by the retention policy or
+        `offload_old_blocks` in bytes.
+        """
+        return self._dgraph.num_evicted_bytes()
 
     def num_vertices(self) -> int:
         return self._dgraph.num_vertices()
@@ -150,8 +557,25 @@ class DynamicGraph:
     def num_edges(self) -> int:
         return self._dgraph.num_edges()
 
-    def out_degree(self, vertexs: np.ndarray) -> np.ndarray:
-        return self._dgraph.out_degree(vertexs)
+    def out_degree(self, vertexs: np.ndarray,
+                   before: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Return the out degrees of the vertices.
+
+        Args:
+            vertexs: 1D tensor, the vertices.
+            before: optional, 1D tensor or float, the query timestamps of
+                the vertices. If given, return the number of edges of each
+                vertex in the graph with timestamps smaller than its query
+                timestamp, i.e., its degree as of that time. Unlike the
+                lifetime degree, the evicted edges are not counted.
+        """
+        if before is None:
+            return self._dgraph.out_degree(vertexs)
+        vertexs = np.asarray(vertexs, dtype=np.int64)
+        before = np.broadcast_to(np.asarray(before, dtype=np.float32),
+                                 vertexs.shape)
+        return self._dgraph.out_degree_before(vertexs, before)
 
     def nodes(self) -> np.ndarray:
         """
@@ -185,6 +609,183 @@ class DynamicGraph:
         """
         return self._dgraph.get_temporal_neighbors(vertex)
 
+    def to_csr(self, time_upper_bound: Optional[float] = None,
+               vertices: Optional[np.ndarray] = None) \
+            -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Export the graph (or the out edges of a vertex subset) in CSR format
+        in one pass. The edges in each row are sorted by timestamps in
+        ascending order.
+
+        Args:
+            time_upper_bound: optional, only export the edges whose timestamps
+                are smaller than it. Export all edges if None.
+            vertices: optional, the vertices (i.e., rows) to export. Export all
+                vertices in [0, max_vertex_id()] if None.
+
+        Returns: A tuple of (indptr, indices, timestamps, edge_ids). The out
+            edges of the i-th row are indices[indptr[i]:indptr[i+1]].
+        """
+        if time_upper_bound is None:
+            time_upper_bound = float("inf")
+
+        if vertices is None:
+            num_rows = self.max_vertex_id() + 1 if self.num_vertices() > 0 \
+                else 0
+            vertices = np.arange(num_rows, dtype=np.int64)
+
+        return self._dgraph.to_csr(vertices, time_upper_bound)
+
+    def neighbors_in_range(self, vertices: np.ndarray,
+                           t_start: Union[float, np.ndarray],
+                           t_end: Union[float, np.ndarray]) \
+            -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return the out edges of a batch of vertices in a time window in one
+        call. The temporal blocks outside of the window are skipped as a whole
+        using their timestamp bounds, so the cost depends on the number of
+        edges in the window rather than the degrees of the vertices.
+
+        Args:
+            vertices: 1D tensor, the vertices.
+            t_start: 1D tensor or float, the (inclusive) start of the time
+                window of each vertex.
+            t_end: 1D tensor or float, the (exclusive) end of the time window
+                of each vertex.
+
+        Returns: A ragged tuple of (offsets, target_vertices, timestamps,
+            edge_ids). The edges of vertices[i] are in
+            [offsets[i], offsets[i+1]), sorted by timestamps in ascending
+            order.
+        """
+        vertices = np.asarray(vertices, dtype=np.int64)
+        t_start = np.broadcast_to(np.asarray(t_start, dtype=np.float32),
+                                  vertices.shape)
+        t_end = np.broadcast_to(np.asarray(t_end, dtype=np.float32),
+                                vertices.shape)
+        return self._dgraph.neighbors_in_range(vertices, t_start, t_end)
+
+    def save(self, path: str):
+        """
+        Save the graph to a single checkpoint file.
+
+        The file has a flat, versioned layout: a small header with the graph
+        config followed by the node table (CSR indptr) and the edges of all
+        temporal blocks in CSR order. See `DynamicGraph.load`. The edges in
+        the reorder buffer are flushed first, and the watermark of the
+        reorder buffer is saved in the header.
+
+        Args:
+            path: the path of the checkpoint file.
+        """
+        self.flush()
+        arrays = {}
+        entries = []
+        offset = 0
+        for (name, dtype), array in zip(_kCheckpointArrays, self.to_csr()):
+            arrays[name] = np.ascontiguousarray(array, dtype=dtype)
+            # NB: the offsets are relative to the end of the header
+            entries.append({"name": name, "dtype": np.dtype(dtype).str,
+                            "length": len(array), "offset": offset})
+            offset = _align_up(offset + arrays[name].nbytes,
+                               _kCheckpointAlignment)
+
+        # NB: -inf is not valid JSON
+        reorder_state = {
+            name: value if np.isfinite(value) else None
+            for name, value in [("watermark", self._watermark),
+                                ("max_timestamp", self._max_timestamp)]}
+        header = json.dumps({"config": self._config,
+                             "reorder_state": reorder_state,
+                             "arrays": entries}).encode("utf-8")
+        data_offset = _align_up(_kCheckpointPrefix.size + len(header),
+                                _kCheckpointAlignment)
+        with open(path, "wb") as f:
+            f.write(_kCheckpointPrefix.pack(
+                _kCheckpointMagic, _kCheckpointVersion, len(header)))
+            f.write(header)
+            for entry in entries:
+                f.seek(data_offset + entry["offset"])
+                arrays[entry["name"]].tofile(f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True, **kwargs) -> "DynamicGraph":
+        """
+        Load a graph from a checkpoint file written by `DynamicGraph.save`.
+
+        With the "cpu" backend and `mmap=True`, the edges are memory-mapped
+        (copy-on-write) and used as the memory pool of the graph without
+        copying. With the "cuda" backend, the memory-mapped edges are
+        inserted into the device blocks in a single batch, bypassing the
+        reorder buffer. The watermark of the reorder buffer is restored so
+        that the edges older than the saved ones are still detected.
+
+        Args:
+            path: the path of the checkpoint file.
+            mmap: optional, bool, whether to memory-map the edges instead of
+                reading them into memory.
+            kwargs: optional, override the saved config of the graph (e.g.,
+                backend, device, or mem_resource_type).
+
+        Returns: the loaded graph.
+
+        Raises:
+            ValueError: if the file is not a valid checkpoint.
+        """
+        with open(path, "rb") as f:
+            prefix = f.read(_kCheckpointPrefix.size)
+            if len(prefix) != _kCheckpointPrefix.size:
+                raise ValueError("Invalid checkpoint file: {}".format(path))
+            magic, version, header_length = _kCheckpointPrefix.unpack(prefix)
+            if magic != _kCheckpointMagic:
+                raise ValueError("Invalid checkpoint file: {}".format(path))
+            if version != _kCheckpointVersion:
+                raise ValueError(
+                    "Unsupported checkpoint version: {}".format(version))
+            header = json.loads(f.read(header_length).decode("utf-8"))
+
+        data_offset = _align_up(_kCheckpointPrefix.size + header_length,
+                                _kCheckpointAlignment)
+        arrays = {}
+        for entry in header["arrays"]:
+            dtype = np.dtype(entry["dtype"])
+            offset = data_offset + entry["offset"]
+            if entry["length"] == 0:
+                arrays[entry["name"]] = np.zeros(0, dtype=dtype)
+            elif mmap:
+                arrays[entry["name"]] = np.memmap(
+                    path, dtype=dtype, mode="c", offset=offset,
+                    shape=(entry["length"],))
+            else:
+                arrays[entry["name"]] = np.fromfile(
+                    path, dtype=dtype, count=entry["length"], offset=offset)
+
+        config = header["config"]
+        config.update(kwargs)
+        if config.get("backend") != "cpu":
+            for key in ["cold_storage_path", "temporal_index",
+                        "compact_payload"]:
+                if key not in kwargs:
+                    config.pop(key, None)
+        graph = cls(**config)
+        indptr, indices, timestamps, eids = \
+            [arrays[name] for name, _ in _kCheckpointArrays]
+        if graph.backend == "cpu":
+            graph._dgraph.load_csr(indptr, indices, timestamps, eids)
+        elif len(indices) > 0:
+            source_vertices = np.repeat(
+                np.arange(len(indptr) - 1, dtype=np.int64), np.diff(indptr))
+            # NB: the saved edges are already flushed and sorted
+            graph._insert_edges(source_vertices, indices, timestamps, eids)
+        if len(eids) > 0:
+            graph._next_eid = int(eids.max()) + 1
+
+        reorder_state = header.get("reorder_state", {})
+        for name in ["watermark", "max_timestamp"]:
+            if reorder_state.get(name) is not None:
+                setattr(graph, "_" + name, float(reorder_state[name]))
+        return graph
+
     def avg_linked_list_length(self) -> float:
         """
         Return the average linked list length.
@@ -202,3 +803,165 @@ class DynamicGraph:
         Return the metadata memory usage of the graph in bytes.
         """
         return self._dgraph.get_metadata_memory_usage()
+
+    def stats(self) -> dict:
+        """
+        Return a report of the shape and the memory usage of the graph. It
+        does not change the graph.
+
+        The histograms are dicts of "bin_edges" and "counts", where
+        counts[i] is the number of values in [bin_edges[i], bin_edges[i+1])
+        (the last bin is closed). The report has:
+
+            - the number of vertices, source vertices, edges, blocks, and
+              buffered edges (see `reorder_window`).
+            - degree_histogram: the out degrees of the vertices in
+              power-of-two bins.
+            - block_count_histogram: the linked list lengths of the
+              vertices in power-of-two bins.
+            - block_fill_histogram: the fill ratios (size / capacity) of the
+              blocks in ten bins over [0, 1].
+            - memory_tiers: the bytes of edge data in each tier. The blocks
+              are in the memory of `mem_resource_type` ("cpu" for the cpu
+              backend) and the spilled blocks are on "disk".
+            - graph_memory_usage, metadata_memory_usage: see
+              `get_graph_memory_usage` and `get_metadata_memory_usage`.
+            - edge_size: the bytes of an edge in a block (see
+              `compact_payload`).
+            - wasted_bytes: the unused capacity of the partially filled
+              blocks.
+            - offloaded_blocks, offloaded_bytes: the blocks evicted by the
+              retention policy or `offload_old_blocks`.
+        """
+        degrees, list_lengths, block_sizes, block_capacities = [
+            np.asarray(array, dtype=np.int64)
+            for array in self._dgraph.block_stats()]
+        block_fills = block_sizes / np.maximum(block_capacities, 1)
+        edge_size = self._dgraph.edge_size() if self._backend == "cpu" \
+            else kBlockSpaceSize
+
+        graph_memory_usage = int(self.get_graph_memory_usage())
+        if self._backend == "cpu":
+            memory_tiers = {"cpu": graph_memory_usage}
+        else:
+            memory_tiers = {
+                self._config["mem_resource_type"].lower(): graph_memory_usage}
+        num_cold_bytes = self.cold_storage_stats().get("num_cold_bytes", 0)
+        if num_cold_bytes > 0:
+            memory_tiers["disk"] = num_cold_bytes
+
+        return {
+            "num_vertices": self.num_vertices(),
+            "num_source_vertices": self.num_source_vertices(),
+            "num_edges": self.num_edges(),
+            "num_blocks": len(block_sizes),
+            "num_buffered_edges": self.num_buffered_edges(),
+            "avg_linked_list_length": self.avg_linked_list_length(),
+            "degree_histogram": _log2_histogram(degrees),
+            "block_count_histogram": _log2_histogram(list_lengths),
+            "block_fill_histogram": _histogram(
+                block_fills, np.linspace(0, 1, 11)),
+            "memory_tiers": memory_tiers,
+            "graph_memory_usage": graph_memory_usage,
+            "metadata_memory_usage": int(self.get_metadata_memory_usage()),
+            "edge_size": edge_size,
+            "wasted_bytes": int((block_capacities - block_sizes).sum()) *
+            edge_size,
+            "offloaded_blocks": self.num_evicted_blocks(),
+            "offloaded_bytes": self.num_evicted_bytes(),
+        }
+
+
+class GraphSnapshot:
+    """
+    A read-only view of a `DynamicGraph` taken by `DynamicGraph.snapshot`.
+    It can be passed to `TemporalSampler` in place of the graph.
+    """
+
+    def __init__(self, dgraph):
+        self._dgraph = dgraph
+
+    def __enter__(self) -> "GraphSnapshot":
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    def __del__(self):
+        self.release()
+
+    @property
+    def backend(self) -> str:
+        """
+        Return the backend of the graph.
+        """
+        return "cpu"
+
+    def get_temporal_neighbors(self, vertex: int) \
+            -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return the neighbors of the specified vertex in the snapshot. The
+        neighbors are sorted by timestamps in decending order.
+
+        Args:
+            vertex: the vertex to get neighbors for.
+
+        Returns: A tuple of (target_vertices, timestamps, edge_ids)
+        """
+        return self._dgraph.get_temporal_neighbors(vertex)
+
+    def to_csr(self, time_upper_bound: Optional[float] = None,
+               vertices: Optional[np.ndarray] = None) \
+            -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Export the snapshot in CSR format. See `DynamicGraph.to_csr`.
+        """
+        if time_upper_bound is None:
+            time_upper_bound = float("inf")
+
+        if vertices is None:
+            num_rows = self._dgraph.max_vertex_id() + 1 \
+                if self._dgraph.num_vertices() > 0 else 0
+            vertices = np.arange(num_rows, dtype=np.int64)
+
+        return self._dgraph.to_csr(vertices, time_upper_bound)
+
+    def neighbors_in_range(self, vertices: np.ndarray,
+                           t_start: Union[float, np.ndarray],
+                           t_end: Union[float, np.ndarray]) \
+            -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return the out edges of a batch of vertices in a time window in the
+        snapshot. See `DynamicGraph.neighbors_in_range`.
+        """
+        vertices = np.asarray(vertices, dtype=np.int64)
+        t_start = np.broadcast_to(np.asarray(t_start, dtype=np.float32),
+                                  vertices.shape)
+        t_end = np.broadcast_to(np.asarray(t_end, dtype=np.float32),
+                                vertices.shape)
+        return self._dgraph.neighbors_in_range(vertices, t_start, t_end)
+
+    def release(self):
+        """
+        Release the snapshot. It cannot be sampled afterwards.
+        """
+        self._dgraph.release()
+
+
+def _histogram(values: np.ndarray, bin_edges: np.ndarray) -> dict:
+    counts, bin_edges = np.histogram(values, bins=bin_edges)
+    return {"bin_edges": bin_edges.tolist(), "counts": counts.tolist()}
+
+
+def _log2_histogram(values: np.ndarray) -> dict:
+    """
+    Histogram with the bins [0, 1), [1, 2), [2, 4), [4, 8), ...
+    """
+    max_value = int(values.max()) if len(values) > 0 else 0
+    num_bins = max(max_value, 1).bit_length() + 1
+    bin_edges = np.concatenate([[0], 1 << np.arange(num_bins)])
+    return _histogram(values, bin_edges)
+
+
+def _align_up(size: int, alignment: int) -> int:
+    return (size + alignment - 1) // alignment * alignment
@@ -1,13 +1,23 @@
-from typing import List, Union
+import collections
+import concurrent.futures
+import threading
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
 
 import dgl
 import numpy as np
 import torch
 from dgl.heterograph import DGLBlock
 
-from libgnnflow import SamplingPolicy, SamplingResult, _TemporalSampler
+from .cpu import SamplingResult as _CPUSamplingResult
+from .cpu import _TemporalSampler as _CPUTemporalSampler
+from .cpu.utils import ragged_arange
+from .dynamic_graph import DynamicGraph, GraphSnapshot
 
-from .dynamic_graph import DynamicGraph
+try:
+    from libgnnflow import SamplingPolicy, SamplingResult, _TemporalSampler
+except ImportError:
+    # NB: the CUDA extension is not built on CPU-only hosts
+    from .cpu import SamplingResult
 
 
 class TemporalSampler:
@@ -16,43 +26,104 @@ class TemporalSampler:
     """
 
     def __init__(
-            self, graph: DynamicGraph, fanouts: List[int],
+            self, graph: Union[DynamicGraph, GraphSnapshot],
+            fanouts: List[int],
             sample_strategy: str = "recent", num_snapshots: int = 1,
             snapshot_time_window: float = 0.0, prop_time: bool = False,
-            seed: int = 1234, *args, **kwargs):
+            seed: int = 1234, cache_size: int = 0,
+            dedup_frontier: bool = False, decay_rate: float = 0.0,
+            edge_weights: Optional[np.ndarray] = None, *args, **kwargs):
         """
-        Initialize the sampler.
+        Initialize the sampler. The sampler runs on the backend of the graph.
 
         Args:
-            graph: the dynamic graph.
+            graph: the dynamic graph or a snapshot of it (see
+                `DynamicGraph.snapshot`).
             fanouts: fanouts of each layer.
-            samplle_strategy: sampling strategy, 'recent' or 'uniform' (case insensitive).
+            samplle_strategy: sampling strategy, 'recent', 'uniform',
+                'time_decay' or 'weighted' (case insensitive). 'time_decay'
+                draws the neighbors with probability proportional to
+                exp(-decay_rate * (t - t_e)) and 'weighted' proportional to
+                edge_weights[eid]. Both draw with replacement and are only
+                supported by the cpu backend: the cuda sampler has no
+                kernels for them and a cuda graph raises ValueError.
             num_snapshots: number of snapshots to sample.
             snapshot_time_window: time window every snapshot cover. It only makes
                                   sense when num_snapshots > 1.
             prop_time: whether to propagate timestamps to neighbors.
             seed: random seed.
+            cache_size: the maximum number of (vertex, fanout) pairs whose
+                sampled neighbors are cached and reused by later requests
+                for the same vertices, as long as no edges that would change
+                the result have been added since. 0 disables the cache. Only
+                supported by the 'recent' strategy with one snapshot and
+                without prop_time. See `cache_stats`.
+            dedup_frontier: whether to sample each unique (vertex,
+                timestamp) pair of the targets of a layer only once and
+                scatter the sampled neighbors back to the duplicates. The
+                message flow graphs are the same as without it, except that
+                with the 'uniform' strategy the duplicates share one sample
+                instead of being sampled independently.
+            decay_rate: the decay rate of the 'time_decay' strategy.
+            edge_weights: the weights of the edges indexed by the edge ids
+                for the 'weighted' strategy.
         """
         sample_strategy = sample_strategy.lower()
-        if sample_strategy not in ["recent", "uniform"]:
-            raise ValueError("strategy must be 'recent' or 'uniform'")
+        if sample_strategy not in ["recent", "uniform", "time_decay",
+                                   "weighted"]:
+            raise ValueError("strategy must be 'recent', 'uniform', "
+                             "'time_decay' or 'weighted'")
+        if sample_strategy in ["time_decay", "weighted"] and \
+                graph.backend != "cpu":
+            raise ValueError("The '{}' strategy is only supported by the "
+                             "cpu backend; the cuda sampler only supports "
+                             "'recent' and 'uniform'".format(sample_strategy))
+        if cache_size < 0:
+            raise ValueError("cache_size must be non-negative")
+        if cache_size > 0 and (sample_strategy != "recent" or
+                               num_snapshots != 1 or prop_time):
+            raise ValueError(
+                "The sampling cache only supports the 'recent' strategy "
+                "with one snapshot and prop_time=False")
 
-        if sample_strategy == "recent":
-            sample_strategy = SamplingPolicy.RECENT
+        if graph.backend == "cpu":
+            self._sampler = _CPUTemporalSampler(
+                graph._dgraph, fanouts, sample_strategy, num_snapshots,
+                snapshot_time_window, prop_time, seed, decay_rate,
+                edge_weights)
         else:
-            sample_strategy = SamplingPolicy.UNIFORM
+            if sample_strategy == "recent":
+                sample_strategy = SamplingPolicy.RECENT
+            else:
+                sample_strategy = SamplingPolicy.UNIFORM
 
-        self._sampler = _TemporalSampler(
-            graph._dgraph, fanouts, sample_strategy, num_snapshots,
-            snapshot_time_window, prop_time, seed)
+            self._sampler = _TemporalSampler(
+                graph._dgraph, fanouts, sample_strategy, num_snapshots,
+                snapshot_time_window, prop_time, seed)
         self._num_layers = len(fanouts)
         self._num_snapshots = num_snapshots
+        self._fanouts = list(fanouts)
+        self._graph = graph
+        self._dedup_frontier = dedup_frontier
+        # the number of target vertices of all layers with and without
+        # duplicates
+        self._num_targets = 0
+        self._num_unique_targets = 0
+
+        self._cache = None
+        if cache_size > 0:
+            self._cache = _SamplingCache(cache_size, fanouts)
+            if isinstance(graph, DynamicGraph):
+                graph._sampling_caches.add(self._cache)
 
         if 'is_static' in kwargs and kwargs['is_static'] == True:
             self._is_static = True
         else:
             self._is_static = False
 
+        # NB: created on the first call of `sample_async`
+        self._executor = None
+
     def sample(self, target_vertices: np.ndarray, timestamps: np.ndarray) -> List[List[DGLBlock]]:
         """
         Sample k-hop neighbors of given vertices.
@@ -66,15 +137,57 @@ class TemporalSampler:
             each layer.
         """
         if self._is_static:
-            sampling_results = self._sampler.sample(
-                target_vertices,
-                np.full(target_vertices.shape,
-                        np.finfo(np.float32).max))
+            timestamps = np.full(target_vertices.shape,
+                                 np.finfo(np.float32).max)
+        if self._cache is not None or self._dedup_frontier:
+            sampling_results = []
+            for layer in range(self._num_layers):
+                layer_results = []
+                for snapshot in range(self._num_snapshots):
+                    if layer == 0:
+                        nodes, node_timestamps = target_vertices, timestamps
+                    else:
+                        prev_result = sampling_results[-1][snapshot]
+                        nodes = prev_result.all_nodes()
+                        node_timestamps = prev_result.all_timestamps()
+                    layer_results.append(self._sample_layer(
+                        nodes, node_timestamps, layer, snapshot))
+                sampling_results.append(layer_results)
         else:
             sampling_results = self._sampler.sample(
                 target_vertices, timestamps)
         return self._to_dgl_block(sampling_results)
 
+    def sample_async(self, target_vertices: np.ndarray,
+                     timestamps: np.ndarray) -> concurrent.futures.Future:
+        """
+        Sample k-hop neighbors of given vertices on a background thread.
+
+        The requests are served one at a time in submission order, so the
+        results are the same as calling `sample` in that order. The graph
+        must not be modified until the returned future is done.
+
+        Args:
+            target_vertices: root vertices to sample. CPU tensor.
+            timestamps: timestamps of target vertices in the graph. CPU tensor.
+
+        Returns:
+            a future of the result of `sample`.
+        """
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="gnnflow-sampler")
+        return self._executor.submit(self.sample, target_vertices, timestamps)
+
+    def shutdown(self):
+        """
+        Wait for the pending `sample_async` requests and stop the background
+        thread. It is restarted by the next `sample_async`.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
     def sample_layer(self, target_vertices:  np.ndarray, timestamps: np.ndarray,
                      layer: int, snapshot: int, to_dgl_block: bool = True) \
             -> Union[DGLBlock, SamplingResult]:
@@ -90,34 +203,180 @@ class TemporalSampler:
         Returns:
             either a DGLBlock or a SamplingResult.
         """
-        sampling_result = self._sampler.sample_layer(
+        sampling_result = self._sample_layer(
             target_vertices, timestamps, layer, snapshot)
         if to_dgl_block:
             return self._to_dgl_block_layer_snapshot(sampling_result)
         return sampling_result
 
+    def _sample_layer(self, target_vertices: np.ndarray,
+                      timestamps: np.ndarray, layer: int, snapshot: int) \
+            -> SamplingResult:
+        if not self._dedup_frontier:
+            return self._sample_unique_layer(target_vertices, timestamps,
+                                             layer, snapshot)
+
+        target_vertices = np.asarray(target_vertices, dtype=np.int64)
+        timestamps = np.asarray(timestamps, dtype=np.float32)
+        unique_vertices, unique_timestamps, inverse = _unique_frontier(
+            target_vertices, timestamps)
+        self._num_targets += len(target_vertices)
+        self._num_unique_targets += len(unique_vertices)
+        if len(unique_vertices) == len(target_vertices):
+            return self._sample_unique_layer(target_vertices, timestamps,
+                                             layer, snapshot)
+
+        sampling_result = self._sample_unique_layer(
+            unique_vertices, unique_timestamps, layer, snapshot)
+        num_dst_nodes = sampling_result.num_dst_nodes()
+        row, (src_nodes, src_timestamps, delta_timestamps, eids) = \
+            _expand_frontier(inverse, len(unique_vertices),
+                            sampling_result.row(),
+                            sampling_result.all_nodes()[num_dst_nodes:],
+                            sampling_result.all_timestamps()[num_dst_nodes:],
+                            sampling_result.delta_timestamps(),
+                            sampling_result.eids())
+
+        num_root_nodes = len(target_vertices)
+        num_sampled_nodes = len(row)
+        result = _CPUSamplingResult._allocate(num_root_nodes,
+                                              num_sampled_nodes)
+        result.row()[:] = row
+        result.col()[:] = np.arange(num_root_nodes,
+                                    num_root_nodes + num_sampled_nodes)
+        result.all_nodes()[:num_root_nodes] = target_vertices
+        result.all_nodes()[num_root_nodes:] = src_nodes
+        result.all_timestamps()[:num_root_nodes] = timestamps
+        result.all_timestamps()[num_root_nodes:] = src_timestamps
+        result.delta_timestamps()[:] = delta_timestamps
+        result.eids()[:] = eids
+        return result
+
+    def _sample_unique_layer(self, target_vertices: np.ndarray,
+                             timestamps: np.ndarray, layer: int,
+                             snapshot: int) -> SamplingResult:
+        if self._cache is not None:
+            return self._sample_layer_cached(target_vertices, timestamps,
+                                             layer)
+        return self._sampler.sample_layer(target_vertices, timestamps,
+                                          layer, snapshot)
+
+    def frontier_stats(self) -> dict:
+        """
+        Return the total number of target vertices of all layers
+        ("num_targets") and the number of them that were sampled
+        ("num_unique_targets") with `dedup_frontier`.
+        """
+        return {"num_targets": self._num_targets,
+                "num_unique_targets": self._num_unique_targets}
+
+    def cache_stats(self) -> dict:
+        """
+        Return the counters of the sampling cache: the number of vertices
+        served from the cache ("hits") and sampled ("misses"), "hit_rate",
+        the number of cached (vertex, fanout) pairs ("num_entries"),
+        "capacity", and the number of LRU evictions ("evictions") and
+        invalidations ("invalidations"). Empty if the cache is disabled.
+        """
+        if self._cache is None:
+            return {}
+        return self._cache.stats()
+
+    def clear_cache(self):
+        """
+        Drop all cached samples. The counters are kept.
+        """
+        if self._cache is not None:
+            self._cache.invalidate()
+
+    def _sample_layer_cached(self, target_vertices: np.ndarray,
+                             timestamps: np.ndarray, layer: int) \
+            -> _CPUSamplingResult:
+        """
+        Sample a layer with the 'recent' strategy and serve the vertices
+        whose recent neighbors at the timestamp are cached without sampling
+        them.
+
+        The cached neighbors of a vertex sampled at t are the newest edges
+        before t. They are still the newest edges before t' if t' is after
+        the newest of them, and either t' <= t or no edge of the vertex is
+        at or after t (i.e., t is after its newest block).
+        """
+        target_vertices = np.asarray(target_vertices, dtype=np.int64)
+        timestamps = np.asarray(timestamps, dtype=np.float32)
+        fanout = self._fanouts[layer]
+        cache = self._cache
+        dgraph = self._graph._dgraph
+        # NB: the retention policy evicts blocks inside the graph
+        cache.check_evicted_blocks(dgraph.num_evicted_blocks())
+
+        # the neighbors of each root, padded to the fanout
+        hits, counts, src_nodes, src_timestamps, eids = cache.lookup(
+            target_vertices, timestamps, fanout)
+        misses = np.flatnonzero(~hits)
+        if len(misses) > 0:
+            miss_vertices = target_vertices[misses]
+            miss_timestamps = timestamps[misses]
+            sampling_result = self._sampler.sample_layer(
+                miss_vertices, miss_timestamps, layer, 0)
+            num_dst_nodes = sampling_result.num_dst_nodes()
+            # NB: the sampled neighbors are grouped by root
+            miss_counts = np.bincount(sampling_result.row(),
+                                      minlength=len(misses))
+            rows = misses[sampling_result.row()]
+            cols = ragged_arange(np.zeros(len(misses), dtype=np.int64),
+                                 miss_counts)
+            counts[misses] = miss_counts
+            src_nodes[rows, cols] = \
+                sampling_result.all_nodes()[num_dst_nodes:]
+            src_timestamps[rows, cols] = \
+                sampling_result.all_timestamps()[num_dst_nodes:]
+            eids[rows, cols] = sampling_result.eids()
+
+            lo = src_timestamps[misses].max(
+                axis=1, initial=-np.inf,
+                where=np.arange(fanout) < miss_counts[:, None])
+            newest_timestamps = dgraph.newest_timestamps(miss_vertices)
+            hi = np.where(miss_timestamps > newest_timestamps, np.inf,
+                          miss_timestamps).astype(np.float32)
+            cache.insert(miss_vertices, fanout, lo, hi, miss_counts,
+                         src_nodes[misses], src_timestamps[misses],
+                         eids[misses])
+
+        num_root_nodes = len(target_vertices)
+        mask = np.arange(fanout) < counts[:, None]
+        num_sampled_nodes = int(counts.sum())
+        result = _CPUSamplingResult._allocate(num_root_nodes,
+                                              num_sampled_nodes)
+        result.row()[:] = np.repeat(np.arange(num_root_nodes), counts)
+        result.col()[:] = np.arange(num_root_nodes,
+                                    num_root_nodes + num_sampled_nodes)
+        result.all_nodes()[:num_root_nodes] = target_vertices
+        result.all_nodes()[num_root_nodes:] = src_nodes[mask]
+        result.all_timestamps()[:num_root_nodes] = timestamps
+        result.all_timestamps()[num_root_nodes:] = src_timestamps[mask]
+        result.eids()[:] = eids[mask]
+        np.subtract(timestamps[result.row()],
+                    result.all_timestamps()[num_root_nodes:],
+                    out=result.delta_timestamps())
+        return result
+
     def _to_dgl_block(self, sampling_results: SamplingResult) -> List[List[DGLBlock]]:
         mfgs = list()
         for sampling_results_layer in sampling_results:
             for r in sampling_results_layer:
-                b = dgl.create_block(
-                    (r.col(),
-                     r.row()),
-                    num_src_nodes=r.num_src_nodes(),
-                    num_dst_nodes=r.num_dst_nodes())
-                b.srcdata['ID'] = torch.from_numpy(r.all_nodes())
-                b.edata['dt'] = torch.from_numpy(r.delta_timestamps())
-                b.srcdata['ts'] = torch.from_numpy(r.all_timestamps())
-                b.edata['ID'] = torch.from_numpy(r.eids())
-                mfgs.append(b)
+                mfgs.append(self._to_dgl_block_layer_snapshot(r))
         mfgs = list(map(list, zip(*[iter(mfgs)] * self._num_snapshots)))
         mfgs.reverse()
         return mfgs
 
     def _to_dgl_block_layer_snapshot(self, sampling_result: SamplingResult) -> DGLBlock:
+        # NB: the fields are views of the sampling result and
+        # `torch.from_numpy` shares their memory, so no copies are made
+        # unless DGL is given NumPy arrays.
         mfg = dgl.create_block(
-            (sampling_result.col(),
-             sampling_result.row()),
+            (torch.from_numpy(sampling_result.col()),
+             torch.from_numpy(sampling_result.row())),
             num_src_nodes=sampling_result.num_src_nodes(),
             num_dst_nodes=sampling_result.num_dst_nodes())
         mfg.srcdata['ID'] = torch.from_numpy(sampling_result.all_nodes())
@@ -125,3 +384,277 @@ class TemporalSampler:
         mfg.srcdata['ts'] = torch.from_numpy(sampling_result.all_timestamps())
         mfg.edata['ID'] = torch.from_numpy(sampling_result.eids())
         return mfg
+
+
+def _unique_frontier(vertices: np.ndarray, timestamps: np.ndarray) \
+        -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Deduplicate the (vertex, timestamp) pairs of the target vertices.
+
+    Returns: A tuple of (unique_vertices, unique_timestamps, inverse), where
+        the i-th target is the inverse[i]-th unique pair.
+    """
+    vertices = np.asarray(vertices, dtype=np.int64)
+    timestamps = np.asarray(timestamps, dtype=np.float32)
+    if len(vertices) == 0:
+        return vertices, timestamps, np.zeros(0, dtype=np.int64)
+    order = np.lexsort((timestamps, vertices))
+    sorted_vertices = vertices[order]
+    sorted_timestamps = timestamps[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = (sorted_vertices[1:] != sorted_vertices[:-1]) | \
+        (sorted_timestamps[1:] != sorted_timestamps[:-1])
+    inverse = np.empty(len(order), dtype=np.int64)
+    inverse[order] = np.cumsum(first) - 1
+    return sorted_vertices[first], sorted_timestamps[first], inverse
+
+
+def _expand_frontier(inverse: np.ndarray, num_unique: int, row: np.ndarray,
+                    *edge_arrays: np.ndarray) \
+        -> Tuple[np.ndarray, List[np.ndarray]]:
+    """
+    Scatter the neighbors sampled for the unique target pairs back to all
+    targets (see `_unique_frontier`).
+
+    Args:
+        inverse: the unique pair of each target.
+        num_unique: the number of unique pairs.
+        row: the unique pair (i.e., the row) of each sampled edge.
+        edge_arrays: the arrays of the sampled edges, e.g., the source
+            vertices and the edge ids.
+
+    Returns: A tuple of (row, edge_arrays) of the expanded edges, where the
+        edges of each target are grouped and in the order of the edges of
+        its unique pair.
+    """
+    row = np.asarray(row, dtype=np.int64)
+    order = np.argsort(row, kind="stable")
+    counts = np.bincount(row, minlength=num_unique)
+    offsets = np.cumsum(counts) - counts
+    target_counts = counts[inverse]
+    positions = order[ragged_arange(offsets[inverse], target_counts)]
+    expanded_row = np.repeat(np.arange(len(inverse), dtype=np.int64),
+                             target_counts)
+    return expanded_row, [np.asarray(array)[positions]
+                          for array in edge_arrays]
+
+
+class _SamplingCache:
+    """
+    An LRU cache of the sampled neighbors of vertices, kept in fixed-size
+    slot arrays. A slot holds the neighbors of a vertex sampled with a
+    fanout, padded to the largest fanout, and the range (lo, hi] of the
+    timestamps they are valid for.
+    """
+
+    def __init__(self, capacity: int, fanouts: List[int]):
+        self._capacity = capacity
+        self._columns = {fanout: i for i, fanout in
+                         enumerate(sorted(set(fanouts)))}
+        width = max(fanouts)
+        # (vertex, fanout) -> slot, -1 if not cached
+        self._slot_map = np.full((0, len(self._columns)), -1, dtype=np.int64)
+        # slot -> (vertex, fanout), -1 if free
+        self._slot_vertex = np.full(capacity, -1, dtype=np.int64)
+        self._slot_column = np.zeros(capacity, dtype=np.int64)
+        # the tick of the last access, -1 if free
+        self._last_used = np.full(capacity, -1, dtype=np.int64)
+        self._clock = 0
+        self._lo = np.zeros(capacity, dtype=np.float32)
+        self._hi = np.zeros(capacity, dtype=np.float32)
+        self._counts = np.zeros(capacity, dtype=np.int64)
+        self._nodes = np.zeros((capacity, width), dtype=np.int64)
+        self._timestamps = np.zeros((capacity, width), dtype=np.float32)
+        self._eids = np.zeros((capacity, width), dtype=np.int64)
+        # NB: the graph may invalidate the cache while it is sampled by
+        # `sample_async`
+        self._lock = threading.Lock()
+        self._num_evicted_blocks = None
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def _get_slots(self, vertices: np.ndarray, column: int) -> np.ndarray:
+        slots = np.full(len(vertices), -1, dtype=np.int64)
+        in_map = vertices < len(self._slot_map)
+        slots[in_map] = self._slot_map[vertices[in_map], column]
+        return slots
+
+    def lookup(self, vertices: np.ndarray, timestamps: np.ndarray,
+               fanout: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray,
+                                     np.ndarray, np.ndarray]:
+        """
+        Return whether each vertex is cached at its timestamp, and the
+        number of cached neighbors, their ids, timestamps and edge ids
+        padded to the fanout (zero for the misses).
+        """
+        num_vertices = len(vertices)
+        counts = np.zeros(num_vertices, dtype=np.int64)
+        nodes = np.zeros((num_vertices, fanout), dtype=np.int64)
+        node_timestamps = np.zeros((num_vertices, fanout), dtype=np.float32)
+        eids = np.zeros((num_vertices, fanout), dtype=np.int64)
+        with self._lock:
+            slots = self._get_slots(vertices, self._columns[fanout])
+            rows = np.flatnonzero(slots >= 0)
+            valid = (self._lo[slots[rows]] < timestamps[rows]) & \
+                (timestamps[rows] <= self._hi[slots[rows]])
+            rows = rows[valid]
+            slots = slots[rows]
+            self._clock += 1
+            self._last_used[slots] = self._clock
+            counts[rows] = self._counts[slots]
+            nodes[rows] = self._nodes[slots, :fanout]
+            node_timestamps[rows] = self._timestamps[slots, :fanout]
+            eids[rows] = self._eids[slots, :fanout]
+            self._hits += len(rows)
+            self._misses += num_vertices - len(rows)
+        hits = np.zeros(num_vertices, dtype=bool)
+        hits[rows] = True
+        return hits, counts, nodes, node_timestamps, eids
+
+    def insert(self, vertices: np.ndarray, fanout: int, lo: np.ndarray,
+               hi: np.ndarray, counts: np.ndarray, nodes: np.ndarray,
+               timestamps: np.ndarray, eids: np.ndarray):
+        """
+        Cache the neighbors of the vertices in the layout returned by
+        `lookup`, evicting the least recently used slots if full.
+        """
+        column = self._columns[fanout]
+        # NB: a vertex may be sampled more than once at different timestamps
+        vertices, rows = np.unique(vertices, return_index=True)
+        vertices = vertices[:self._capacity]
+        rows = rows[:self._capacity]
+        with self._lock:
+            if len(vertices) > 0 and vertices[-1] >= len(self._slot_map):
+                num_rows = max(int(vertices[-1]) + 1,
+                               2 * len(self._slot_map))
+                slot_map = np.full((num_rows, len(self._columns)), -1,
+                                   dtype=np.int64)
+                slot_map[:len(self._slot_map)] = self._slot_map
+                self._slot_map = slot_map
+
+            slots = self._get_slots(vertices, column)
+            new = np.flatnonzero(slots < 0)
+            if len(new) > 0:
+                # the free slots first, then the least recently used ones
+                # that are not overwritten by this insert
+                last_used = self._last_used.copy()
+                last_used[slots[slots >= 0]] = np.iinfo(np.int64).max
+                candidates = np.argpartition(last_used, len(new) - 1)
+                candidates = candidates[:len(new)]
+                evicted = candidates[self._slot_vertex[candidates] >= 0]
+                self._slot_map[self._slot_vertex[evicted],
+                               self._slot_column[evicted]] = -1
+                self._evictions += len(evicted)
+                slots[new] = candidates
+
+            self._clock += 1
+            self._slot_map[vertices, column] = slots
+            self._slot_vertex[slots] = vertices
+            self._slot_column[slots] = column
+            self._last_used[slots] = self._clock
+            self._lo[slots] = lo[rows]
+            self._hi[slots] = hi[rows]
+            self._counts[slots] = counts[rows]
+            self._nodes[slots, :fanout] = nodes[rows]
+            self._timestamps[slots, :fanout] = timestamps[rows]
+            self._eids[slots, :fanout] = eids[rows]
+
+    def _release(self, slots: np.ndarray):
+        self._slot_map[self._slot_vertex[slots],
+                       self._slot_column[slots]] = -1
+        self._slot_vertex[slots] = -1
+        self._last_used[slots] = -1
+        self._invalidations += len(slots)
+
+    def invalidate(self, vertices: Optional[np.ndarray] = None):
+        with self._lock:
+            if vertices is None:
+                self._release(np.flatnonzero(self._slot_vertex >= 0))
+                return
+            vertices = np.unique(np.asarray(vertices, dtype=np.int64))
+            vertices = vertices[vertices < len(self._slot_map)]
+            slots = self._slot_map[vertices].ravel()
+            self._release(slots[slots >= 0])
+
+    def check_evicted_blocks(self, num_evicted_blocks: int):
+        if self._num_evicted_blocks is not None and \
+                num_evicted_blocks != self._num_evicted_blocks:
+            self.invalidate()
+        self._num_evicted_blocks = num_evicted_blocks
+
+    def stats(self) -> dict:
+        with self._lock:
+            num_lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / num_lookups if num_lookups else 0.0,
+                "num_entries": int(np.count_nonzero(
+                    self._slot_vertex >= 0)),
+                "capacity": self._capacity,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+
+class SamplingPipeline:
+    """
+    Iterate over a batch source and sample the batches ahead of the consumer
+    so that sampling overlaps with the model computation.
+
+    Each batch is a tuple whose first two elements are the target vertices
+    and their timestamps, e.g., the batches of `gnnflow.utils.get_batch` or
+    of the edge prediction DataLoader. The pipeline yields (batch, mfgs) in
+    the order of the batch source.
+
+    Example:
+        for (target_nodes, ts, eid), mfgs in SamplingPipeline(
+                sampler, train_loader, prefetch=2):
+            ...
+    """
+
+    def __init__(self, sampler: TemporalSampler, batches: Iterable[Tuple],
+                 prefetch: int = 2):
+        """
+        Args:
+            sampler: the sampler to use.
+            batches: the batch source.
+            prefetch: the number of batches sampled ahead. If 0, the batches
+                are sampled on the calling thread when they are consumed.
+        """
+        if prefetch < 0:
+            raise ValueError("prefetch must be non-negative")
+        self._sampler = sampler
+        self._batches = batches
+        self._prefetch = prefetch
+
+    def __len__(self) -> int:
+        return len(self._batches)
+
+    def __iter__(self) -> Iterator[Tuple[Tuple, List[List[DGLBlock]]]]:
+        if self._prefetch == 0:
+            for batch in self._batches:
+                yield batch, self._sampler.sample(batch[0], batch[1])
+            return
+
+        pending = collections.deque()
+        try:
+            for batch in self._batches:
+                pending.append(
+                    (batch, self._sampler.sample_async(batch[0], batch[1])))
+                if len(pending) > self._prefetch:
+                    batch, future = pending.popleft()
+                    yield batch, future.result()
+            while pending:
+                batch, future = pending.popleft()
+                yield batch, future.result()
+        finally:
+            # NB: do not leave the sampler reading the graph behind the
+            # consumer if it stops early
+            for _, future in pending:
+                future.cancel()
+            for _, future in pending:
+                if not future.cancelled():
+                    concurrent.futures.wait([future])
@@ -11,6 +11,7 @@ import torch.distributed
 from dgl.heterograph import DGLBlock
 from dgl.utils.shared_mem import create_shared_mem_array, get_shared_mem_array
 
+from .config import profile_edges
 from .dynamic_graph import DynamicGraph
 
 NODE_FEATS = None
@@ -409,16 +410,21 @@ def get_batch_no_neg(df: pd.DataFrame, batch_size: int):
 
 
 def build_dynamic_graph(
-        initial_pool_size: int,
-        maximum_pool_size: int,
-        mem_resource_type: str,
-        minimum_block_size: int,
-        blocks_to_preallocate: int,
-        insertion_policy: str,
-        undirected: bool,
+        initial_pool_size: Optional[int] = None,
+        maximum_pool_size: Optional[int] = None,
+        mem_resource_type: str = "cuda",
+        minimum_block_size: Optional[int] = None,
+        blocks_to_preallocate: Optional[int] = None,
+        insertion_policy: str = "insert",
+        undirected: bool = False,
         device: int = 0,
         adaptive_block_size: bool = True,
         dataset_df: Optional[pd.DataFrame] = None,
+        backend: str = "cuda",
+        retention_window: Optional[float] = None,
+        max_edges: Optional[int] = None,
+        num_ingest_threads: int = 1,
+        config: Optional[str] = None,
         *args, **kwargs) -> DynamicGraph:
     """
     Builds a dynamic graph from the given dataframe.
@@ -436,7 +442,34 @@ def build_dynamic_graph(
         undirected: whether the graph is undirected.
         device: the device to use.
         adaptive_block_size: whether to use adaptive block size.
+        backend: the backend to store the graph ("cuda" or "cpu").
+        retention_window: optional, the retention window of the edges.
+        max_edges: optional, the maximum number of edges to keep.
+        num_ingest_threads: the number of worker threads to add edges.
+        config: optional, "auto" to tune `initial_pool_size`,
+            `maximum_pool_size`, `minimum_block_size` and
+            `blocks_to_preallocate` by profiling `dataset_df` (see
+            `gnnflow.config.profile_edges`). The tuned values override the
+            given ones.
     """
+    if config == "auto":
+        if dataset_df is None:
+            raise ValueError("The auto config requires dataset_df")
+        profile = profile_edges(dataset_df, undirected)
+        logging.info("Auto config: {} (predicted graph memory usage: {} "
+                     "bytes)".format(profile["config"],
+                                     profile["predicted_graph_memory_usage"]))
+        initial_pool_size = profile["config"]["initial_pool_size"]
+        maximum_pool_size = profile["config"]["maximum_pool_size"]
+        minimum_block_size = profile["config"]["minimum_block_size"]
+        blocks_to_preallocate = profile["config"]["blocks_to_preallocate"]
+    elif config is not None:
+        raise ValueError("Invalid config: {}".format(config))
+    elif None in (initial_pool_size, maximum_pool_size, minimum_block_size,
+                  blocks_to_preallocate):
+        raise ValueError(
+            "The pool and block sizes are required unless config is 'auto'")
+
     if dataset_df is None:
         src = dst = ts = eids = None
     else:
@@ -455,7 +488,11 @@ def build_dynamic_graph(
         src, dst, ts, eids,
         undirected,
         device,
-        adaptive_block_size)
+        adaptive_block_size,
+        backend,
+        retention_window,
+        max_edges,
+        num_ingest_threads=num_ingest_threads)
 
     return dgraph
 
@@ -21,7 +21,7 @@ from gnnflow.data import (DistributedBatchSampler, EdgePredictionDataset,
 from gnnflow.models.dgnn import DGNN
 from gnnflow.models.gat import GAT
 from gnnflow.models.graphsage import SAGE
-from gnnflow.temporal_sampler import TemporalSampler
+from gnnflow.temporal_sampler import SamplingPipeline, TemporalSampler
 from gnnflow.utils import (DstRandEdgeSampler, EarlyStopMonitor,
                            build_dynamic_graph, get_pinned_buffers,
                            get_project_root_dir, load_dataset, load_feat,
@@ -56,6 +56,9 @@ parser.add_argument("--edge-cache-ratio", type=float, default=0,
                     help="cache ratio for edge feature cache")
 parser.add_argument("--node-cache-ratio", type=float, default=0,
                     help="cache ratio for node feature cache")
+parser.add_argument("--sampling-prefetch", type=int, default=2,
+                    help="number of batches sampled ahead of training "
+                    "(0 to sample synchronously)")
 args = parser.parse_args()
 
 logging.basicConfig(level=logging.DEBUG)
@@ -83,8 +86,8 @@ def evaluate(dataloader, sampler, model, criterion, cache, device):
 
     with torch.no_grad():
         total_loss = 0
-        for target_nodes, ts, eid in dataloader:
-            mfgs = sampler.sample(target_nodes, ts)
+        for (target_nodes, ts, eid), mfgs in SamplingPipeline(
+                sampler, dataloader, prefetch=args.sampling_prefetch):
             mfgs_to_cuda(mfgs, device)
             mfgs = cache.fetch_feature(
                 mfgs, eid)
@@ -276,10 +279,9 @@ def train(train_loader, val_loader, sampler, model, optimizer, criterion,
         total_samples = 0
 
         epoch_time_start = time.time()
-        for i, (target_nodes, ts, eid) in enumerate(train_loader):
-            # Sample
-            mfgs = sampler.sample(target_nodes, ts)
-
+        # Sample (ahead of training)
+        for i, ((target_nodes, ts, eid), mfgs) in enumerate(SamplingPipeline(
+                sampler, train_loader, prefetch=args.sampling_prefetch)):
             # Feature
             mfgs_to_cuda(mfgs, device)
             mfgs = cache.fetch_feature(
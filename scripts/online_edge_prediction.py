@@ -18,7 +18,7 @@ from gnnflow.config import get_default_config
 from gnnflow.models.dgnn import DGNN
 from gnnflow.models.gat import GAT
 from gnnflow.models.graphsage import SAGE
-from gnnflow.temporal_sampler import TemporalSampler
+from gnnflow.temporal_sampler import SamplingPipeline, TemporalSampler
 from gnnflow.utils import (DstRandEdgeSampler, EarlyStopMonitor,
                            build_dynamic_graph, get_batch, get_pinned_buffers,
                            get_project_root_dir, load_dataset, load_feat,
@@ -53,6 +53,9 @@ parser.add_argument("--edge-cache-ratio", type=float, default=0,
                     help="edge cache ratio for feature cache")
 parser.add_argument("--node-cache-ratio", type=float, default=0,
                     help="node cache ratio for feature cache")
+parser.add_argument("--sampling-prefetch", type=int, default=2,
+                    help="number of batches sampled ahead of training "
+                    "(0 to sample synchronously)")
 
 # online learning
 parser.add_argument("--phase1-ratio", type=float, default=0.3,
@@ -88,12 +91,13 @@ def evaluate(df, sampler, model, criterion, cache, device, rand_edge_sampler):
 
     with torch.no_grad():
         total_loss = 0
-        for target_nodes, ts, eid in get_batch(df=df,
-                                               batch_size=args.batch_size,
-                                               num_chunks=0,
-                                               rand_edge_sampler=rand_edge_sampler,
-                                               world_size=args.world_size):
-            mfgs = sampler.sample(target_nodes, ts)
+        batches = get_batch(df=df,
+                            batch_size=args.batch_size,
+                            num_chunks=0,
+                            rand_edge_sampler=rand_edge_sampler,
+                            world_size=args.world_size)
+        for (target_nodes, ts, eid), mfgs in SamplingPipeline(
+                sampler, batches, prefetch=args.sampling_prefetch):
             mfgs_to_cuda(mfgs, device)
             mfgs = cache.fetch_feature(
                 mfgs, eid)
@@ -415,14 +419,16 @@ def train(train_df, val_df, sampler, model, optimizer, criterion,
         total_sample_time = 0
 
         epoch_time_start = time.time()
-        for i, (target_nodes, ts, eid) in enumerate(get_batch(df=train_df,
-                                                              batch_size=args.batch_size,
-                                                              num_chunks=0,
-                                                              rand_edge_sampler=train_rand_sampler,
-                                                              world_size=args.world_size)):
-            # Sample
-            start = time.time()
-            mfgs = sampler.sample(target_nodes, ts)
+        batches = get_batch(df=train_df,
+                            batch_size=args.batch_size,
+                            num_chunks=0,
+                            rand_edge_sampler=train_rand_sampler,
+                            world_size=args.world_size)
+        # Sample (ahead of training)
+        # NB: only the time spent waiting for the sampler is counted
+        start = time.time()
+        for i, ((target_nodes, ts, eid), mfgs) in enumerate(SamplingPipeline(
+                sampler, batches, prefetch=args.sampling_prefetch)):
             total_sample_time += time.time() - start
 
             # Feature
@@ -471,6 +477,8 @@ def train(train_df, val_df, sampler, model, optimizer, criterion,
                     logging.info('Epoch {:d}/{:d} | Iter {:d}/{:d} | Throughput {:.2f} samples/s | Loss {:.4f} | Cache node ratio {:.4f} | Cache edge ratio {:.4f} | Total sample time {:.2f}s'.format(e + 1, args.epoch, i + 1, int(len(
                         train_df)/args.batch_size), total_samples * args.world_size / (time.time() - epoch_time_start), total_loss / (i + 1), cache_node_ratio_sum / (i + 1), cache_edge_ratio_sum / (i + 1), total_sample_time))
 
+            start = time.time()
+
         epoch_time = time.time() - epoch_time_start
         epoch_time_sum += epoch_time
 
@@ -63,6 +63,10 @@ class CustomBuildExt(build_ext):
         os.chdir(curdir)
 
 
+# NB: set CPU_ONLY=1 to skip building the CUDA extension. Only the CPU
+# backend (`backend="cpu"`) is available then.
+cpu_only = os.environ.get("CPU_ONLY", "0") == "1"
+
 require_list = ["torch", "numpy"]
 
 test_require_list = ["unittest", "parameterized"]
@@ -74,7 +78,7 @@ setup(
     license="Apache 2.0",
     url="https://github.com/jasperzhong/GNNFlow",
     packages=find_packages(exclude=("tests")),
-    ext_modules=[gnnflow_lib],
+    ext_modules=[] if cpu_only else [gnnflow_lib],
     cmdclass={"build_ext": CustomBuildExt},
     classifiers=[
         "Programming Language :: Python :: 3",
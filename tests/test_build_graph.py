@@ -2,9 +2,10 @@ import itertools
 import unittest
 
 import numpy as np
+import pandas as pd
 from parameterized import parameterized
 
-from gnnflow.config import get_default_config
+from gnnflow.config import get_default_config, profile_edges
 from gnnflow.utils import build_dynamic_graph, load_dataset
 
 MB = 1 << 20
@@ -89,3 +90,29 @@ class TestBuildGraph(unittest.TestCase):
             self.assertEqual(len(out_edges), len(graph_out_edges))
             self.assertEqual(len(graph_out_edges), dgraph.out_degree([src]))
             self.assertTrue(np.allclose(ts, graph_ts))
+
+    @parameterized.expand(itertools.product([False, True]))
+    def test_build_graph_auto_config(self, undirected):
+        num_edges = 10000
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({
+            "src": rng.integers(0, 100, num_edges),
+            "dst": rng.integers(100, 200, num_edges),
+            "time": np.arange(num_edges, dtype=np.float32),
+            "eid": np.arange(num_edges)})
+        profile = profile_edges(df, undirected)
+
+        dgraph = build_dynamic_graph(
+            undirected=undirected, dataset_df=df, backend="cpu",
+            config="auto")
+        self.assertEqual(dgraph.out_degree(dgraph.nodes()).sum(),
+                         2 * num_edges if undirected else num_edges)
+        self.assertEqual(dgraph.get_graph_memory_usage(),
+                         profile["predicted_graph_memory_usage"])
+        self.assertEqual(dgraph.stats()["num_blocks"],
+                         profile["predicted_num_blocks"])
+        sources = np.concatenate([df["src"], df["dst"]]) if undirected \
+            else df["src"].values
+        degrees = np.unique(sources, return_counts=True)[1]
+        self.assertEqual(profile["config"]["minimum_block_size"],
+                         int(np.ceil(np.median(degrees))))
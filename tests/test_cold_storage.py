@@ -0,0 +1,124 @@
+import itertools
+import tempfile
+import unittest
+
+import numpy as np
+from parameterized import parameterized
+
+from gnnflow import DynamicGraph, TemporalSampler
+
+MB = 1 << 20
+
+default_config = {
+    "initial_pool_size": 1 * MB,
+    "maximum_pool_size": 2 * MB,
+    "mem_resource_type": "cuda",
+    "minimum_block_size": 64,
+    "blocks_to_preallocate": 128,
+    "insertion_policy": "insert",
+    "backend": "cpu",
+}
+
+
+class TestColdStorage(unittest.TestCase):
+
+    @parameterized.expand(itertools.product(["recent", "uniform"]))
+    def test_cold_storage(self, sample_strategy):
+        rng = np.random.default_rng(0)
+        source_vertices = rng.integers(0, 8, 400)
+        target_vertices = rng.integers(0, 8, 400)
+        timestamps = np.arange(400, dtype=np.float32)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dgraphs = []
+            for cold_storage_path in [None, tmpdir]:
+                config = default_config.copy()
+                config["minimum_block_size"] = 4
+                config["cold_storage_path"] = cold_storage_path
+                config["cold_cache_size"] = 4
+                dgraph = DynamicGraph(**config)
+                for i in range(0, 400, 50):
+                    dgraph.add_edges(source_vertices[i:i + 50],
+                                     target_vertices[i:i + 50],
+                                     timestamps[i:i + 50], add_reverse=False)
+                dgraphs.append(dgraph)
+
+            hot, cold = dgraphs
+            self.assertGreater(cold.spill_old_blocks(300), 0)
+            stats = cold.cold_storage_stats()
+            self.assertGreater(stats["num_cold_blocks"], 0)
+            self.assertEqual(stats["num_faulted_blocks"], 0)
+            self.assertEqual(cold.num_edges(), hot.num_edges())
+
+            target_vertices = np.arange(8)
+            for ts in [100, 250, 399]:
+                blocks = []
+                for dgraph in dgraphs:
+                    sampler = TemporalSampler(
+                        dgraph, [8], sample_strategy=sample_strategy)
+                    blocks.append(sampler.sample_layer(
+                        target_vertices, np.full(8, ts), 0, 0))
+                self.assertEqual(blocks[0].srcdata['ID'].tolist(),
+                                 blocks[1].srcdata['ID'].tolist())
+                self.assertEqual(blocks[0].edata['ID'].tolist(),
+                                 blocks[1].edata['ID'].tolist())
+
+            for expected, actual in zip(hot.to_csr(), cold.to_csr()):
+                self.assertEqual(expected.tolist(), actual.tolist())
+            for expected, actual in zip(hot.get_temporal_neighbors(3),
+                                        cold.get_temporal_neighbors(3)):
+                self.assertEqual(expected.tolist(), actual.tolist())
+
+            stats = cold.cold_storage_stats()
+            self.assertGreater(stats["cache_misses"], 0)
+            # the faulted blocks are released before the next access
+            cold.get_temporal_neighbors(8)
+            self.assertLessEqual(
+                cold.cold_storage_stats()["num_faulted_blocks"], 4)
+        print("Test cold storage passed (cpu backend) "
+              "(sample_strategy: {})".format(sample_strategy))
+
+    @parameterized.expand(
+        itertools.product(["recent", "uniform"], [False, True]))
+    def test_temporal_index(self, sample_strategy, spill):
+        rng = np.random.default_rng(0)
+        source_vertices = rng.integers(0, 8, 800)
+        target_vertices = rng.integers(0, 8, 800)
+        timestamps = np.arange(800, dtype=np.float32)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dgraphs = []
+            for temporal_index in [False, True]:
+                config = default_config.copy()
+                config["minimum_block_size"] = 2
+                config["max_edges"] = 600
+                config["cold_storage_path"] = tmpdir if spill else None
+                config["temporal_index"] = temporal_index
+                dgraph = DynamicGraph(**config)
+                for i in range(0, 800, 20):
+                    dgraph.add_edges(source_vertices[i:i + 20],
+                                     target_vertices[i:i + 20],
+                                     timestamps[i:i + 20], add_reverse=False)
+                if spill:
+                    dgraph.spill_old_blocks(500)
+                dgraphs.append(dgraph)
+
+            target_vertices = np.arange(8)
+            for ts in [150, 300, 450, 650, 799]:
+                blocks = []
+                for dgraph in dgraphs:
+                    sampler = TemporalSampler(
+                        dgraph, [4], sample_strategy=sample_strategy)
+                    blocks.append(sampler.sample_layer(
+                        target_vertices, np.full(8, ts), 0, 0))
+                self.assertEqual(blocks[0].srcdata['ID'].tolist(),
+                                 blocks[1].srcdata['ID'].tolist())
+                self.assertEqual(blocks[0].edata['ID'].tolist(),
+                                 blocks[1].edata['ID'].tolist())
+        print("Test temporal index passed (cpu backend) "
+              "(sample_strategy: {}, spill: {})".format(
+                  sample_strategy, spill))
+
+
+if __name__ == '__main__':
+    unittest.main()
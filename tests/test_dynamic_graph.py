@@ -1,10 +1,12 @@
 import itertools
+import os
+import tempfile
 import unittest
 
 import numpy as np
 from parameterized import parameterized
 
-from gnnflow import DynamicGraph
+from gnnflow import DynamicGraph, TemporalSampler
 
 MB = 1 << 20
 GB = 1 << 30
@@ -18,6 +20,8 @@ default_config = {
     "insertion_policy": "insert",
 }
 
+cpu_config = dict(default_config, backend="cpu")
+
 
 class TestDynamicGraph(unittest.TestCase):
 
@@ -572,6 +576,866 @@ class TestDynamicGraph(unittest.TestCase):
         print("Test offload old blocks passed. (mem_resource_type: {})".format(
             mem_resource_type))
 
+    @parameterized.expand(
+        itertools.product(["cuda", "unified", "pinned", "shared"]))
+    def test_to_csr(self, mem_resource_type):
+        """
+        Test if the "to_csr(time_upper_bound, vertices)" works
+        """
+        config = default_config.copy()
+        config["minimum_block_size"] = 4
+        config["mem_resource_type"] = mem_resource_type
+        dgraph = DynamicGraph(**config)
+        source_vertices = np.array([0, 0, 0, 1, 1, 1, 2, 2, 2])
+        target_vertices = np.array([1, 2, 3, 1, 2, 3, 1, 2, 3])
+        timestamps = np.array([0, 1, 2, 0, 1, 2, 0, 1, 2])
+        dgraph.add_edges(source_vertices, target_vertices,
+                         timestamps, add_reverse=False)
+        dgraph.add_edges(source_vertices, target_vertices,
+                         timestamps + 3, add_reverse=False)
+
+        indptr, indices, timestamps, edge_ids = dgraph.to_csr()
+        self.assertEqual(indptr.tolist(), [0, 6, 12, 18, 18])
+        self.assertEqual(indices.tolist(), [1, 2, 3] * 6)
+        self.assertEqual(timestamps[6:12].tolist(), [0, 1, 2, 3, 4, 5])
+        self.assertEqual(edge_ids[6:12].tolist(), [3, 4, 5, 12, 13, 14])
+
+        # the time upper bound is exclusive and clips the second block
+        indptr, indices, timestamps, edge_ids = dgraph.to_csr(
+            time_upper_bound=4, vertices=np.array([2, 0, 7]))
+        self.assertEqual(indptr.tolist(), [0, 4, 8, 8])
+        self.assertEqual(indices.tolist(), [1, 2, 3, 1] * 2)
+        self.assertEqual(timestamps.tolist(), [0, 1, 2, 3] * 2)
+        self.assertEqual(edge_ids.tolist(), [6, 7, 8, 15, 0, 1, 2, 9])
+
+        print("Test to_csr passed. (mem_resource_type: {})".format(
+            mem_resource_type))
+
+    @parameterized.expand(
+        itertools.product(["cuda", "unified", "pinned", "shared"],
+                          [True, False]))
+    def test_save_load(self, mem_resource_type, mmap):
+        """
+        Test if the "save(path)" and "load(path, mmap)" work
+        """
+        config = default_config.copy()
+        config["minimum_block_size"] = 4
+        config["mem_resource_type"] = mem_resource_type
+        dgraph = DynamicGraph(**config)
+        source_vertices = np.array([0, 0, 0, 1, 1, 1, 2, 2, 2])
+        target_vertices = np.array([1, 2, 3, 1, 2, 3, 1, 2, 3])
+        timestamps = np.array([0, 1, 2, 0, 1, 2, 0, 1, 2])
+        dgraph.add_edges(source_vertices, target_vertices,
+                         timestamps, add_reverse=False)
+        dgraph.add_edges(source_vertices, target_vertices,
+                         timestamps + 3, add_reverse=False)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "graph.bin")
+            dgraph.save(path)
+            loaded = DynamicGraph.load(path, mmap=mmap)
+
+            self.assertEqual(loaded.num_edges(), 18)
+            self.assertEqual(loaded.num_vertices(), 4)
+            self.assertEqual(loaded.num_source_vertices(), 3)
+            for expected, actual in zip(dgraph.to_csr(), loaded.to_csr()):
+                self.assertEqual(expected.tolist(), actual.tolist())
+
+            # the loaded graph is still dynamic
+            loaded.add_edges(source_vertices, target_vertices,
+                             timestamps + 6, add_reverse=False)
+            target_vertices, timestamps, edge_ids = \
+                loaded.get_temporal_neighbors(2)
+            self.assertEqual(target_vertices.tolist(), [3, 2, 1] * 3)
+            self.assertEqual(timestamps.tolist(), list(range(8, -1, -1)))
+            self.assertEqual(edge_ids.tolist(),
+                             [26, 25, 24, 17, 16, 15, 8, 7, 6])
+
+        print("Test save and load passed. (mem_resource_type: {}, "
+              "mmap: {})".format(mem_resource_type, mmap))
+
+    @parameterized.expand(
+        itertools.product(["cuda", "unified", "pinned", "shared"]))
+    def test_save_load_reorder_window(self, mem_resource_type):
+        """
+        Test if "load(path)" inserts all saved edges and restores the
+        watermark of the reorder buffer
+        """
+        config = default_config.copy()
+        config["minimum_block_size"] = 4
+        config["mem_resource_type"] = mem_resource_type
+        dgraph = DynamicGraph(**config, reorder_window=2)
+        for i in range(3):
+            dgraph.add_edges(np.arange(3), np.arange(1, 4),
+                             np.full(3, 2 * i))
+        # 2 batches flushed, the last one buffered
+        self.assertEqual(dgraph.num_buffered_edges(), 3)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "graph.bin")
+            dgraph.save(path)
+            loaded = DynamicGraph.load(path)
+
+            # the buffered edges are saved and not buffered again
+            self.assertEqual(loaded.num_edges(), 9)
+            self.assertEqual(loaded.num_buffered_edges(), 0)
+            self.assertEqual(loaded._watermark, dgraph._watermark)
+            self.assertEqual(loaded._max_timestamp, dgraph._max_timestamp)
+            # an edge older than the restored watermark is rejected instead
+            # of being buffered
+            with self.assertRaises(ValueError):
+                loaded.add_edges(np.array([0]), np.array([1]), np.array([3]))
+        print("Test save and load with reorder window passed. "
+              "(mem_resource_type: {})".format(mem_resource_type))
+
+    @parameterized.expand(
+        itertools.product(["pinned", "shared"], [(3.5, None), (None, 10)]))
+    def test_retention_policy(self, mem_resource_type, policy):
+        """
+        Test if the retention policy evicts the old blocks in "add_edges"
+        """
+        retention_window, max_edges = policy
+        config = default_config.copy()
+        config["minimum_block_size"] = 4
+        config["mem_resource_type"] = mem_resource_type
+        config["retention_window"] = retention_window
+        config["max_edges"] = max_edges
+        dgraph = DynamicGraph(**config)
+        source_vertices = np.array([0, 0, 0, 1, 1, 1, 2, 2, 2])
+        target_vertices = np.array([1, 2, 3, 1, 2, 3, 1, 2, 3])
+        timestamps = np.array([0, 1, 2, 0, 1, 2, 0, 1, 2])
+        for i in range(4):
+            dgraph.add_edges(source_vertices, target_vertices,
+                             timestamps + 3 * i, add_reverse=False)
+
+        target_vertices, timestamps, edge_ids = dgraph.get_temporal_neighbors(
+            2)
+        # blocks [0, 1, 2, 3] and [4, 5, 6, 7] are evicted
+        self.assertEqual(timestamps.tolist(), [11, 10, 9, 8])
+        self.assertEqual(edge_ids.tolist(), [35, 34, 33, 26])
+        if retention_window is not None:
+            self.assertEqual(dgraph.num_edges(), 12)
+            self.assertEqual(dgraph.num_evicted_blocks(), 6)
+        else:
+            # the oldest blocks in the graph are evicted first
+            self.assertEqual(dgraph.num_edges(), 8)
+            self.assertEqual(dgraph.num_evicted_blocks(), 7)
+        self.assertEqual(dgraph.num_evicted_bytes(),
+                         dgraph.num_evicted_blocks() * 4 * 20)
+        print("Test retention policy passed. (mem_resource_type: {}, "
+              "retention_window: {}, max_edges: {})".format(
+                  mem_resource_type, retention_window, max_edges))
+
+    @parameterized.expand(
+        itertools.product(["cuda", "unified", "pinned", "shared"]))
+    def test_compact(self, mem_resource_type):
+        """
+        Test if "compact" merges the small blocks without changing the edges.
+        """
+        config = default_config.copy()
+        config["minimum_block_size"] = 1
+        config["mem_resource_type"] = mem_resource_type
+        dgraph = DynamicGraph(**config)
+        # ten blocks of one edge and a block of 16 edges
+        for i in range(10):
+            dgraph.add_edges(np.array([0]), np.array([i]), np.array([i]))
+        dgraph.add_edges(np.zeros(16, dtype=np.int64), np.arange(16),
+                         np.arange(10, 26))
+        target_vertices, timestamps, edge_ids = dgraph.get_temporal_neighbors(
+            0)
+        self.assertEqual(dgraph.avg_linked_list_length(), 11 / 16)
+
+        # the small blocks are merged into one block of 10 edges
+        self.assertEqual(dgraph.compact(0.5), (0, 9))
+        self.assertEqual(dgraph.avg_linked_list_length(), 2 / 16)
+        new_target_vertices, new_timestamps, new_edge_ids = \
+            dgraph.get_temporal_neighbors(0)
+        self.assertEqual(target_vertices.tolist(),
+                         new_target_vertices.tolist())
+        self.assertEqual(timestamps.tolist(), new_timestamps.tolist())
+        self.assertEqual(edge_ids.tolist(), new_edge_ids.tolist())
+        self.assertEqual(dgraph.compact(0.5), (0, 0))
+        print("Test compact passed. (mem_resource_type: {})".format(
+            mem_resource_type))
+
+    @parameterized.expand(
+        itertools.product(["cuda", "pinned"], ["insert", "replace"]))
+    def test_add_edges_multiple_threads(self, mem_resource_type,
+                                        insertion_policy):
+        """
+        Test if the multi-threaded ingest builds the same graph as the
+        single-threaded one after every batch.
+        """
+        rng = np.random.default_rng(0)
+        source_vertices = rng.integers(0, 100, 10000)
+        target_vertices = rng.integers(0, 100, 10000)
+        timestamps = np.arange(10000, dtype=np.float32)
+
+        dgraphs = []
+        for num_ingest_threads in [1, 4]:
+            config = default_config.copy()
+            config["minimum_block_size"] = 4
+            config["mem_resource_type"] = mem_resource_type
+            config["insertion_policy"] = insertion_policy
+            config["num_ingest_threads"] = num_ingest_threads
+            dgraphs.append(DynamicGraph(**config))
+
+        for i in range(0, 10000, 1000):
+            # later batches append to the blocks left by the earlier ones
+            csrs = []
+            for dgraph in dgraphs:
+                dgraph.add_edges(source_vertices[i:i + 1000],
+                                 target_vertices[i:i + 1000],
+                                 timestamps[i:i + 1000], add_reverse=True)
+                self.assertEqual(dgraph.num_edges(), i + 1000)
+                csrs.append(dgraph.to_csr())
+            for expected, actual in zip(*csrs):
+                self.assertEqual(expected.tobytes(), actual.tobytes())
+            self.assertEqual(dgraphs[0].avg_linked_list_length(),
+                             dgraphs[1].avg_linked_list_length())
+        print("Test add edges with multiple threads passed. "
+              "(mem_resource_type: {}, insertion_policy: {})".format(
+                  mem_resource_type, insertion_policy))
+
+
+class TestDynamicGraphCPU(unittest.TestCase):
+
+    def test_add_edges_unsorted(self):
+        config = cpu_config.copy()
+        dgraph = DynamicGraph(**config)
+        source_vertices = np.array([0, 0, 0, 1, 1, 1, 2, 2, 2])
+        target_vertices = np.array([1, 2, 3, 1, 2, 3, 1, 2, 3])
+        timestamps = np.array([2, 1, 0, 2, 1, 0, 2, 1, 0])
+        dgraph.add_edges(source_vertices, target_vertices,
+                         timestamps, add_reverse=False)
+        self.assertEqual(dgraph.num_edges(), 9)
+        self.assertEqual(dgraph.num_vertices(), 4)
+        self.assertEqual(dgraph.num_source_vertices(), 3)
+        self.assertEqual(dgraph.out_degree(
+            [0, 1, 2, 3]).tolist(), [3, 3, 3, 0])
+
+        target_vertices, timestamps, edge_ids = dgraph.get_temporal_neighbors(
+            1)
+        self.assertEqual(target_vertices.tolist(), [1, 2, 3])
+        self.assertEqual(timestamps.tolist(), [2, 1, 0])
+        self.assertEqual(edge_ids.tolist(), [3, 4, 5])
+
+        target_vertices, timestamps, edge_ids = dgraph.get_temporal_neighbors(
+            3)
+        self.assertEqual(target_vertices.tolist(), [])
+        print("Test add edges unsorted passed (cpu backend)")
+
+    @parameterized.expand(itertools.product(["insert", "replace"]))
+    def test_add_edges_multiple_times(self, insertion_policy):
+        config = cpu_config.copy()
+        config["minimum_block_size"] = 4
+        config["insertion_policy"] = insertion_policy
+        dgraph = DynamicGraph(**config)
+        source_vertices = np.array([0, 0, 0, 1, 1, 1, 2, 2, 2])
+        target_vertices = np.array([1, 2, 3, 1, 2, 3, 1, 2, 3])
+        timestamps = np.array([0, 1, 2, 0, 1, 2, 0, 1, 2])
+        dgraph.add_edges(source_vertices, target_vertices,
+                         timestamps, add_reverse=False)
+        dgraph.add_edges(source_vertices, target_vertices,
+                         timestamps + 3, add_reverse=False)
+
+        self.assertEqual(dgraph.num_edges(), 18)
+        self.assertEqual(dgraph.out_degree(
+            [0, 1, 2, 3]).tolist(), [6, 6, 6, 0])
+
+        target_vertices, timestamps, edge_ids = dgraph.get_temporal_neighbors(
+            2)
+        self.assertEqual(target_vertices.tolist(), [3, 2, 1, 3, 2, 1])
+        self.assertEqual(timestamps.tolist(), [5, 4, 3, 2, 1, 0])
+        self.assertEqual(edge_ids.tolist(), [17, 16, 15, 8, 7, 6])
+
+        expected_length = 2 * 3 / 4 if insertion_policy == "insert" else 3 / 4
+        self.assertAlmostEqual(dgraph.avg_linked_list_length(),
+                               expected_length)
+        print("Test add edges multiple times passed (cpu backend) "
+              "(insertion_policy: {})".format(insertion_policy))
+
+    @parameterized.expand(itertools.product(["insert", "replace"]))
+    def test_add_edges_batched(self, insertion_policy):
+        # the edges of all source vertices are staged and copied at once,
+        # which must be the same as adding them one source vertex at a time
+        config = cpu_config.copy()
+        config["minimum_block_size"] = 4
+        config["insertion_policy"] = insertion_policy
+        batched = DynamicGraph(**config)
+        per_node = DynamicGraph(**config)
+        rng = np.random.default_rng(0)
+        eid = 0
+        for i in range(4):
+            # fill the tail blocks partially, fully, or overflow them
+            num_edges = rng.integers(1, 7, 5)
+            source_vertices = np.repeat(np.arange(5), num_edges)
+            target_vertices = rng.integers(0, 10, len(source_vertices))
+            timestamps = rng.random(len(source_vertices)) + i
+            eids = np.arange(eid, eid + len(source_vertices))
+            eid += len(source_vertices)
+            batched.add_edges(source_vertices, target_vertices, timestamps,
+                              eids)
+            for node in range(5):
+                mask = source_vertices == node
+                per_node.add_edges(source_vertices[mask],
+                                   target_vertices[mask], timestamps[mask],
+                                   eids[mask])
+
+        for node in range(5):
+            for expected, actual in zip(
+                    per_node.get_temporal_neighbors(node),
+                    batched.get_temporal_neighbors(node)):
+                self.assertEqual(actual.tolist(), expected.tolist())
+        self.assertAlmostEqual(batched.avg_linked_list_length(),
+                               per_node.avg_linked_list_length())
+        print("Test add edges batched passed (cpu backend) "
+              "(insertion_policy: {})".format(insertion_policy))
+
+    @parameterized.expand(itertools.product(["insert", "replace"]))
+    def test_add_old_edges(self, insertion_policy):
+        config = cpu_config.copy()
+        config["minimum_block_size"] = 4
+        config["insertion_policy"] = insertion_policy
+        dgraph = DynamicGraph(**config)
+        # fill the tail block of vertex 0
+        dgraph.add_edges(np.zeros(4, dtype=np.int64), np.arange(4),
+                         np.arange(10, 14))
+
+        # older than the full tail, into the tail or into a new block
+        for timestamps in [np.array([5]), np.array([5, 20, 21, 22, 23])]:
+            with self.assertRaisesRegex(ValueError, "older"):
+                dgraph.add_edges(np.zeros(len(timestamps), dtype=np.int64),
+                                 np.arange(len(timestamps)), timestamps)
+        with self.assertRaisesRegex(ValueError, "non-negative"):
+            dgraph.add_edges(np.array([1]), np.array([0]), np.array([-1]))
+        self.assertEqual(dgraph.get_temporal_neighbors(0)[1].tolist(),
+                         [13, 12, 11, 10])
+
+        # as old as the tail
+        dgraph.add_edges(np.array([0]), np.array([0]), np.array([13]))
+        self.assertEqual(dgraph.get_temporal_neighbors(0)[1].tolist(),
+                         [13, 13, 12, 11, 10])
+        print("Test add old edges passed (cpu backend) "
+              "(insertion_policy: {})".format(insertion_policy))
+
+    def test_add_edges_add_reverse(self):
+        config = cpu_config.copy()
+        dgraph = DynamicGraph(**config)
+        source_vertices = np.array([0, 0, 0, 1, 1, 1, 2, 2, 2])
+        target_vertices = np.array([1, 2, 3, 1, 2, 3, 1, 2, 3])
+        timestamps = np.array([0, 1, 2, 0, 1, 2, 0, 1, 2])
+        dgraph.add_edges(source_vertices, target_vertices,
+                         timestamps, add_reverse=True)
+        self.assertEqual(dgraph.num_edges(), 9)
+        self.assertEqual(dgraph.out_degree(
+            [0, 1, 2, 3]).tolist(), [3, 6, 6, 3])
+
+        target_vertices, timestamps, edge_ids = dgraph.get_temporal_neighbors(
+            3)
+        self.assertEqual(target_vertices.tolist(), [2, 1, 0])
+        self.assertEqual(timestamps.tolist(), [2, 2, 2])
+        self.assertEqual(edge_ids.tolist(), [8, 5, 2])
+        print("Test add edges add reverse passed (cpu backend)")
+
+    @parameterized.expand(itertools.product([True, False]))
+    def test_edge_bookkeeping(self, add_reverse):
+        config = cpu_config.copy()
+        config["minimum_block_size"] = 3
+        dgraph = DynamicGraph(**config)
+        source_vertices = np.array([0, 0, 0, 1, 1, 1])
+        target_vertices = np.array([4, 5, 6, 4, 5, 6])
+        timestamps = np.array([0, 1, 2, 0, 1, 2])
+        dgraph.add_edges(source_vertices, target_vertices,
+                         timestamps, add_reverse=add_reverse)
+        dgraph.add_edges(source_vertices, target_vertices,
+                         timestamps + 3, add_reverse=add_reverse)
+        self.assertEqual(dgraph.num_edges(), 12)
+        self.assertEqual(dgraph.edges().tolist(), list(range(12)))
+        self.assertEqual(dgraph.num_vertices(), 5)
+        self.assertEqual(dgraph.nodes().tolist(), [0, 1, 4, 5, 6])
+        self.assertEqual(dgraph.num_source_vertices(),
+                         5 if add_reverse else 2)
+        self.assertGreater(dgraph.get_metadata_memory_usage(), 0)
+
+        # the reverse edges of the first batch share blocks with the edges of
+        # the second batch and thus are not offloaded
+        dgraph.offload_old_blocks(2.5)
+        if add_reverse:
+            self.assertEqual(dgraph.num_edges(), 12)
+        else:
+            self.assertEqual(dgraph.edges().tolist(), list(range(6, 12)))
+        print("Test edge bookkeeping passed (cpu backend) "
+              "(add_reverse: {})".format(add_reverse))
+
+    @parameterized.expand(itertools.product([True, False]))
+    def test_offload_old_blocks(self, to_file):
+        config = cpu_config.copy()
+        config["minimum_block_size"] = 4
+        dgraph = DynamicGraph(**config)
+        source_vertices = np.array([0, 0, 0, 1, 1, 1, 2, 2, 2])
+        target_vertices = np.array([1, 2, 3, 1, 2, 3, 1, 2, 3])
+        timestamps = np.array([0, 1, 2, 0, 1, 2, 0, 1, 2])
+        edge_ids = np.array([0, 2, 4, 6, 8, 10, 12, 14, 16])
+        dgraph.add_edges(source_vertices, target_vertices,
+                         timestamps, edge_ids, add_reverse=False)
+        edge_ids = np.array([17, 19, 21, 23, 25, 27, 29, 31, 33])
+        dgraph.add_edges(source_vertices, target_vertices,
+                         timestamps + 3, edge_ids, add_reverse=False)
+
+        num_blocks = dgraph.offload_old_blocks(3.5, to_file)
+        self.assertEqual(num_blocks, 3)
+        self.assertEqual(dgraph.num_edges(), 6)
+
+        target_vertices, timestamps, edge_ids = dgraph.get_temporal_neighbors(
+            0)
+        self.assertEqual(target_vertices.tolist(), [3, 2])
+        self.assertEqual(timestamps.tolist(), [5, 4])
+        self.assertEqual(edge_ids.tolist(), [21, 19])
+
+    @parameterized.expand([(3.5, None), (None, 10)])
+    def test_retention_policy(self, retention_window, max_edges):
+        config = cpu_config.copy()
+        config["minimum_block_size"] = 4
+        config["retention_window"] = retention_window
+        config["max_edges"] = max_edges
+        dgraph = DynamicGraph(**config)
+        source_vertices = np.array([0, 0, 0, 1, 1, 1, 2, 2, 2])
+        target_vertices = np.array([1, 2, 3, 1, 2, 3, 1, 2, 3])
+        timestamps = np.array([0, 1, 2, 0, 1, 2, 0, 1, 2])
+        # (num_edges, num_evicted_blocks) after each batch
+        if retention_window is not None:
+            # the blocks [0, 1, 2, 3] leave the window in the third batch
+            # and the blocks [4, 5, 6, 7] in the fourth
+            expected = [(9, 0), (18, 0), (15, 3), (12, 6)]
+        else:
+            # the oldest blocks in the graph are evicted first
+            expected = [(9, 0), (10, 2), (7, 5), (8, 7)]
+        for i in range(4):
+            dgraph.add_edges(source_vertices, target_vertices,
+                             timestamps + 3 * i, add_reverse=False)
+            self.assertEqual((dgraph.num_edges(),
+                              dgraph.num_evicted_blocks()), expected[i])
+            self.assertEqual(dgraph.num_evicted_bytes(),
+                             dgraph.num_evicted_blocks() * 4 * 20)
+            # the newest edges are kept and the evicted ones are gone from
+            # the bookkeeping
+            self.assertEqual(
+                dgraph.get_temporal_neighbors(2)[1][:3].tolist(),
+                [3 * i + 2, 3 * i + 1, 3 * i])
+            edge_ids = np.concatenate(
+                [dgraph.get_temporal_neighbors(node)[2]
+                 for node in range(3)])
+            self.assertEqual(sorted(edge_ids.tolist()),
+                             dgraph.edges().tolist())
+
+        target_vertices, timestamps, edge_ids = dgraph.get_temporal_neighbors(
+            2)
+        self.assertEqual(timestamps.tolist(), [11, 10, 9, 8])
+        self.assertEqual(edge_ids.tolist(), [35, 34, 33, 26])
+        print("Test retention policy passed (cpu backend) "
+              "(retention_window: {}, max_edges: {})".format(
+                  retention_window, max_edges))
+
+    @parameterized.expand(itertools.product([False, True]))
+    def test_compact(self, temporal_index):
+        config = cpu_config.copy()
+        config["minimum_block_size"] = 1
+        config["temporal_index"] = temporal_index
+        dgraph = DynamicGraph(**config)
+        # ten blocks of one edge and a block of 16 edges
+        for i in range(10):
+            dgraph.add_edges(np.array([0]), np.array([i]), np.array([i]))
+        dgraph.add_edges(np.zeros(16, dtype=np.int64), np.arange(16),
+                         np.arange(10, 26))
+        neighbors = dgraph.get_temporal_neighbors(0)
+        sampler = TemporalSampler(dgraph, [4])
+        block = sampler.sample_layer(np.array([0, 0]), np.array([8, 30]), 0, 0)
+        self.assertEqual(dgraph.avg_linked_list_length(), 11 / 16)
+
+        # the small blocks are merged into one block of 10 edges
+        self.assertEqual(dgraph.compact(0.5), (0, 9))
+        self.assertEqual(dgraph.avg_linked_list_length(), 2 / 16)
+        for expected, actual in zip(neighbors,
+                                    dgraph.get_temporal_neighbors(0)):
+            self.assertEqual(expected.tolist(), actual.tolist())
+        new_block = sampler.sample_layer(np.array([0, 0]), np.array([8, 30]),
+                                         0, 0)
+        self.assertEqual(block.edata['ID'].tolist(),
+                         new_block.edata['ID'].tolist())
+        self.assertEqual(dgraph.compact(0.5), (0, 0))
+
+        # the graph keeps growing after compaction
+        dgraph.add_edges(np.array([0]), np.array([1]), np.array([26]))
+        self.assertEqual(dgraph.get_temporal_neighbors(0)[1][:2].tolist(),
+                         [26, 25])
+        print("Test compact passed (cpu backend) (temporal_index: {})".format(
+            temporal_index))
+
+    def test_auto_compact(self):
+        config = cpu_config.copy()
+        config["minimum_block_size"] = 1
+        config["adaptive_block_size"] = False
+        config["compact_threshold"] = 4
+        dgraph = DynamicGraph(**config)
+        dgraph.add_edges(np.zeros(16, dtype=np.int64), np.ones(16),
+                         np.arange(16))
+        for i in range(16, 26):
+            dgraph.add_edges(np.array([0]), np.array([1]), np.array([i]))
+            self.assertLessEqual(dgraph.avg_linked_list_length(), 4)
+        # [16] -> [16, 1, ..., 1] -> [16, 7, 1] -> [16, 7, 1, 1, 1]
+        self.assertEqual(dgraph.avg_linked_list_length(), 5 / 2)
+        self.assertEqual(dgraph.get_temporal_neighbors(0)[1].tolist(),
+                         list(range(25, -1, -1)))
+        print("Test auto compact passed (cpu backend)")
+
+    @parameterized.expand(itertools.product([False, True]))
+    def test_compact_between_batches(self, temporal_index):
+        config = cpu_config.copy()
+        config["minimum_block_size"] = 1
+        config["adaptive_block_size"] = False
+        expected = DynamicGraph(**config)
+        config["temporal_index"] = temporal_index
+        dgraph = DynamicGraph(**config)
+        rng = np.random.default_rng(0)
+        num_reclaimed_blocks = 0
+        for step in range(8):
+            # a large batch followed by small ones that leave sparse blocks
+            num_edges = 40 if step % 4 == 0 else 5
+            source_vertices = rng.integers(0, 5, num_edges)
+            target_vertices = rng.integers(0, 5, num_edges)
+            timestamps = np.sort(rng.random(num_edges) * 10 + step * 10)
+            for graph in [dgraph, expected]:
+                graph.add_edges(source_vertices, target_vertices,
+                                timestamps.astype(np.float32),
+                                add_reverse=False)
+            if step % 2 == 1:
+                length = dgraph.avg_linked_list_length()
+                reclaimed_blocks = dgraph.compact(0.5)[1]
+                self.assertAlmostEqual(dgraph.avg_linked_list_length(),
+                                       length - reclaimed_blocks / 5)
+                num_reclaimed_blocks += reclaimed_blocks
+            # the compacted graph keeps growing like the original one
+            self._assert_same_graph(dgraph, expected, 5, "recent")
+        self.assertGreater(num_reclaimed_blocks, 0)
+        print("Test compact between batches passed (cpu backend) "
+              "(temporal_index: {})".format(temporal_index))
+
+    def _assert_same_graph(self, dgraph, expected, num_nodes,
+                           sample_strategy):
+        for node in range(num_nodes):
+            for expected_array, array in zip(
+                    expected.get_temporal_neighbors(node),
+                    dgraph.get_temporal_neighbors(node)):
+                self.assertEqual(array.tolist(), expected_array.tolist())
+        for expected_array, array in zip(expected.to_csr(), dgraph.to_csr()):
+            self.assertEqual(array.tolist(), expected_array.tolist())
+
+        root_nodes = np.arange(num_nodes).repeat(2)
+        root_timestamps = np.tile(np.array([15, 40], dtype=np.float32),
+                                  num_nodes)
+        blocks = []
+        for graph in [expected, dgraph]:
+            sampler = TemporalSampler(graph, [4],
+                                      sample_strategy=sample_strategy, seed=0)
+            blocks.append(sampler.sample_layer(root_nodes, root_timestamps,
+                                               0, 0))
+        self.assertEqual(blocks[1].edata['ID'].tolist(),
+                         blocks[0].edata['ID'].tolist())
+
+    @parameterized.expand(itertools.product(["recent", "uniform"]))
+    def test_delete_edges(self, sample_strategy):
+        config = cpu_config.copy()
+        config["minimum_block_size"] = 4
+        dgraph = DynamicGraph(**config)
+        rng = np.random.default_rng(0)
+        source_vertices = rng.integers(0, 5, 60)
+        target_vertices = rng.integers(0, 5, 60)
+        timestamps = np.arange(60) / 2
+        for i in range(0, 60, 20):
+            dgraph.add_edges(source_vertices[i:i + 20],
+                             target_vertices[i:i + 20],
+                             timestamps[i:i + 20], add_reverse=True)
+
+        deleted = rng.choice(60, 20, replace=False)
+        self.assertEqual(dgraph.delete_edges(np.append(deleted, 100)), 20)
+        self.assertEqual(dgraph.delete_edges(deleted), 0)
+        self.assertEqual(dgraph.num_edges(), 40)
+
+        keep = np.setdiff1d(np.arange(60), deleted)
+        expected = DynamicGraph(**config)
+        expected.add_edges(source_vertices[keep], target_vertices[keep],
+                           timestamps[keep], keep, add_reverse=True)
+        self.assertEqual(dgraph.out_degree(np.arange(5)).tolist(),
+                         expected.out_degree(np.arange(5)).tolist())
+        self._assert_same_graph(dgraph, expected, 5, sample_strategy)
+
+        # the eid ranges of the blocks narrow the search of the edges
+        graph = dgraph._dgraph
+        blocks = np.flatnonzero(graph._block_size[:graph._num_blocks] > 0)
+        for block in blocks.tolist():
+            offset = graph._block_offset[block]
+            eids = graph._read_eids(
+                slice(offset, offset + graph._block_size[block]))
+            self.assertGreaterEqual(eids.min(), graph._block_min_eid[block])
+            self.assertLessEqual(eids.max(), graph._block_max_eid[block])
+
+        # compaction drops the tombstones
+        dgraph.compact()
+        self.assertEqual(dgraph._dgraph._num_deleted, 0)
+        self._assert_same_graph(dgraph, expected, 5, sample_strategy)
+        print("Test delete edges passed (cpu backend) "
+              "(sample_strategy: {})".format(sample_strategy))
+
+    @parameterized.expand(itertools.product(["recent", "uniform"]))
+    def test_update_edges(self, sample_strategy):
+        config = cpu_config.copy()
+        config["minimum_block_size"] = 4
+        dgraph = DynamicGraph(**config)
+        rng = np.random.default_rng(0)
+        source_vertices = rng.integers(0, 5, 60)
+        target_vertices = rng.integers(0, 5, 60)
+        timestamps = np.arange(60) / 2
+        for i in range(0, 60, 20):
+            dgraph.add_edges(source_vertices[i:i + 20],
+                             target_vertices[i:i + 20], timestamps[i:i + 20])
+
+        # move some edges to the past and some to the future
+        updated = rng.choice(60, 10, replace=False)
+        new_timestamps = timestamps.copy()
+        new_timestamps[updated[:5]] = rng.random(5) * 10
+        new_timestamps[updated[5:]] = 30 + np.arange(5)
+        dgraph.update_edges(updated, new_timestamps[updated])
+        self.assertEqual(dgraph.num_edges(), 60)
+
+        expected = DynamicGraph(**config)
+        expected.add_edges(source_vertices, target_vertices, new_timestamps,
+                           np.arange(60))
+        self._assert_same_graph(dgraph, expected, 5, sample_strategy)
+
+        with self.assertRaises(ValueError):
+            dgraph.update_edges(np.array([100]), np.array([1]))
+        print("Test update edges passed (cpu backend) "
+              "(sample_strategy: {})".format(sample_strategy))
+
+    @parameterized.expand(itertools.product(["recent", "uniform"]))
+    def test_compact_payload(self, sample_strategy):
+        graphs = []
+        for compact_payload in [False, True]:
+            config = cpu_config.copy()
+            config["minimum_block_size"] = 4
+            config["compact_payload"] = compact_payload
+            dgraph = DynamicGraph(**config)
+            rng = np.random.default_rng(0)
+            source_vertices = rng.integers(0, 5, 60)
+            target_vertices = rng.integers(0, 5, 60)
+            timestamps = np.arange(60) / 2
+            for i in range(0, 60, 20):
+                dgraph.add_edges(source_vertices[i:i + 20],
+                                 target_vertices[i:i + 20],
+                                 timestamps[i:i + 20],
+                                 np.arange(i, i + 20) + 1000,
+                                 add_reverse=True)
+            dgraph.delete_edges(np.arange(1000, 1060, 6))
+            dgraph.update_edges(np.array([1005, 1010]), np.array([40, 50]))
+            graphs.append(dgraph)
+
+        expected, dgraph = graphs
+        self.assertEqual(dgraph.stats()["edge_size"], 12)
+        self.assertEqual(dgraph.get_graph_memory_usage() * 20,
+                         expected.get_graph_memory_usage() * 12)
+        self._assert_same_graph(dgraph, expected, 5, sample_strategy)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "graph.bin")
+            dgraph.save(path)
+            loaded = DynamicGraph.load(path)
+        self.assertEqual(loaded.stats()["edge_size"], 12)
+        self._assert_same_graph(loaded, expected, 5, sample_strategy)
+
+        # the int64 edges are still decoded correctly after widening
+        dgraph._dgraph._widen_pool(True, True)
+        self.assertEqual(dgraph.stats()["edge_size"], 20)
+        self.assertEqual(dgraph.get_graph_memory_usage(),
+                         expected.get_graph_memory_usage())
+        self._assert_same_graph(dgraph, expected, 5, sample_strategy)
+        print("Test compact payload passed (cpu backend) "
+              "(sample_strategy: {})".format(sample_strategy))
+
+    @parameterized.expand(itertools.product([False, True]))
+    def test_reorder_window(self, temporal_index):
+        config = cpu_config.copy()
+        config["minimum_block_size"] = 4
+        config["temporal_index"] = temporal_index
+        dgraph = DynamicGraph(**config, reorder_window=5)
+        rng = np.random.default_rng(0)
+        source_vertices = rng.integers(0, 5, 100)
+        target_vertices = rng.integers(0, 5, 100)
+        timestamps = np.arange(100, dtype=np.float32)
+        eids = np.arange(100)
+        # every edge arrives at most 5 time units late, except a few edges
+        # that arrive after all the others
+        arrival = timestamps + rng.random(100) * 5
+        arrival[10:15] = 200
+        order = np.argsort(arrival, kind="stable")
+        for i in range(0, 100, 10):
+            batch = order[i:i + 10]
+            dgraph.add_edges(source_vertices[batch], target_vertices[batch],
+                             timestamps[batch], eids[batch])
+            self.assertEqual(dgraph.num_edges() +
+                             dgraph.num_buffered_edges(), i + 10)
+        # the last edges are older than the flushed ones and are merged
+        self.assertTrue(np.all(np.isin(np.arange(10, 15), dgraph.edges())))
+        dgraph.flush()
+        self.assertEqual(dgraph.num_buffered_edges(), 0)
+        self.assertEqual(dgraph.num_edges(), 100)
+
+        expected = DynamicGraph(**config)
+        expected.add_edges(source_vertices, target_vertices, timestamps, eids)
+        self._assert_same_graph(dgraph, expected, 5, "recent")
+
+        # an edge older than the window is merged
+        dgraph.add_edges(np.array([0]), np.array([1]), np.array([50.5]),
+                         np.array([100]))
+        self.assertEqual(dgraph.num_edges(), 101)
+        self.assertIn(50.5, dgraph.get_temporal_neighbors(0)[1].tolist())
+        self.assertEqual(dgraph.get_temporal_neighbors(0)[1].tolist(),
+                         sorted(dgraph.get_temporal_neighbors(0)[1].tolist(),
+                                reverse=True))
+        print("Test reorder window passed (cpu backend) "
+              "(temporal_index: {})".format(temporal_index))
+
+    def test_stats(self):
+        config = cpu_config.copy()
+        config["minimum_block_size"] = 4
+        dgraph = DynamicGraph(**config)
+        source_vertices = np.array([0, 0, 0, 1, 1, 1, 2, 2, 2])
+        target_vertices = np.array([1, 2, 3, 1, 2, 3, 1, 2, 3])
+        timestamps = np.array([0, 1, 2, 0, 1, 2, 0, 1, 2])
+        dgraph.add_edges(source_vertices, target_vertices,
+                         timestamps, add_reverse=False)
+        dgraph.add_edges(np.array([0, 0]), np.array([4, 5]),
+                         np.array([3, 4]), add_reverse=False)
+        num_edges = dgraph.num_edges()
+
+        stats = dgraph.stats()
+        self.assertEqual(dgraph.num_edges(), num_edges)
+        self.assertEqual(stats["num_vertices"], 6)
+        self.assertEqual(stats["num_source_vertices"], 3)
+        self.assertEqual(stats["num_edges"], 11)
+        self.assertEqual(stats["num_blocks"], 4)
+        self.assertEqual(stats["avg_linked_list_length"], 4 / 6)
+        # out degrees: 5, 3, 3, 0, 0, 0
+        self.assertEqual(stats["degree_histogram"]["bin_edges"],
+                         [0, 1, 2, 4, 8])
+        self.assertEqual(stats["degree_histogram"]["counts"], [3, 0, 2, 1])
+        self.assertEqual(sum(stats["block_count_histogram"]["counts"]), 6)
+        self.assertEqual(sum(stats["block_fill_histogram"]["counts"]), 4)
+        self.assertEqual(stats["wasted_bytes"], 5 * 20)
+        self.assertEqual(stats["memory_tiers"],
+                         {"cpu": dgraph.get_graph_memory_usage()})
+        self.assertEqual(stats["offloaded_blocks"], 0)
+
+        dgraph.offload_old_blocks(2.5)
+        stats = dgraph.stats()
+        self.assertEqual(stats["num_blocks"], 2)
+        self.assertEqual(stats["offloaded_blocks"], 2)
+        self.assertEqual(stats["offloaded_bytes"], 2 * 4 * 20)
+        print("Test stats passed (cpu backend)")
+
+    def test_to_csr(self):
+        config = cpu_config.copy()
+        config["minimum_block_size"] = 4
+        dgraph = DynamicGraph(**config)
+        source_vertices = np.array([0, 0, 0, 1, 1, 1, 2, 2, 2])
+        target_vertices = np.array([1, 2, 3, 1, 2, 3, 1, 2, 3])
+        timestamps = np.array([0, 1, 2, 0, 1, 2, 0, 1, 2])
+        dgraph.add_edges(source_vertices, target_vertices,
+                         timestamps, add_reverse=False)
+        dgraph.add_edges(source_vertices, target_vertices,
+                         timestamps + 3, add_reverse=False)
+
+        indptr, indices, timestamps, edge_ids = dgraph.to_csr()
+        self.assertEqual(indptr.tolist(), [0, 6, 12, 18, 18])
+        self.assertEqual(indices.tolist(), [1, 2, 3] * 6)
+        self.assertEqual(timestamps[6:12].tolist(), [0, 1, 2, 3, 4, 5])
+        self.assertEqual(edge_ids[6:12].tolist(), [3, 4, 5, 12, 13, 14])
+
+        # the time upper bound is exclusive and clips the second block
+        indptr, indices, timestamps, edge_ids = dgraph.to_csr(
+            time_upper_bound=4, vertices=np.array([2, 0, 7]))
+        self.assertEqual(indptr.tolist(), [0, 4, 8, 8])
+        self.assertEqual(indices.tolist(), [1, 2, 3, 1] * 2)
+        self.assertEqual(timestamps.tolist(), [0, 1, 2, 3] * 2)
+        self.assertEqual(edge_ids.tolist(), [6, 7, 8, 15, 0, 1, 2, 9])
+
+        print("Test to_csr passed (cpu backend)")
+
+    @parameterized.expand(itertools.product([True, False]))
+    def test_save_load(self, mmap):
+        config = cpu_config.copy()
+        config["minimum_block_size"] = 4
+        dgraph = DynamicGraph(**config)
+        source_vertices = np.array([0, 0, 0, 1, 1, 1, 2, 2, 2])
+        target_vertices = np.array([1, 2, 3, 1, 2, 3, 1, 2, 3])
+        timestamps = np.array([0, 1, 2, 0, 1, 2, 0, 1, 2])
+        dgraph.add_edges(source_vertices, target_vertices,
+                         timestamps, add_reverse=False)
+        dgraph.add_edges(source_vertices, target_vertices,
+                         timestamps + 3, add_reverse=False)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "graph.bin")
+            dgraph.save(path)
+            loaded = DynamicGraph.load(path, mmap=mmap)
+
+            self.assertEqual(loaded.num_edges(), 18)
+            self.assertEqual(loaded.num_vertices(), 4)
+            self.assertEqual(loaded.num_source_vertices(), 3)
+            for expected, actual in zip(dgraph.to_csr(), loaded.to_csr()):
+                self.assertEqual(expected.tolist(), actual.tolist())
+
+            # the loaded graph is still dynamic
+            loaded.add_edges(source_vertices, target_vertices,
+                             timestamps + 6, add_reverse=False)
+            target_vertices, timestamps, edge_ids = \
+                loaded.get_temporal_neighbors(2)
+            self.assertEqual(target_vertices.tolist(), [3, 2, 1] * 3)
+            self.assertEqual(timestamps.tolist(), list(range(8, -1, -1)))
+            self.assertEqual(edge_ids.tolist(),
+                             [26, 25, 24, 17, 16, 15, 8, 7, 6])
+
+        print("Test save and load passed (cpu backend) (mmap: {})".format(
+            mmap))
+
+    def test_save_load_reorder_window(self):
+        config = cpu_config.copy()
+        config["minimum_block_size"] = 4
+        dgraph = DynamicGraph(**config, reorder_window=2)
+        for i in range(3):
+            dgraph.add_edges(np.arange(3), np.arange(1, 4),
+                             np.full(3, 2 * i))
+        # 2 batches flushed, the last one buffered
+        self.assertEqual(dgraph.num_buffered_edges(), 3)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "graph.bin")
+            dgraph.save(path)
+            loaded = DynamicGraph.load(path)
+
+            # the buffered edges are saved and not buffered again
+            self.assertEqual(loaded.num_edges(), 9)
+            self.assertEqual(loaded.num_buffered_edges(), 0)
+            self.assertEqual(loaded._watermark, dgraph._watermark)
+            self.assertEqual(loaded._max_timestamp, dgraph._max_timestamp)
+            # an edge older than the restored watermark is merged at once
+            # instead of being buffered
+            loaded.add_edges(np.array([0]), np.array([1]), np.array([3]))
+            self.assertEqual(loaded.num_buffered_edges(), 0)
+            self.assertEqual(loaded.get_temporal_neighbors(0)[1].tolist(),
+                             [4, 3, 2, 0])
+        print("Test save and load with reorder window passed (cpu backend)")
+
 
 if __name__ == '__main__':
     unittest.main()
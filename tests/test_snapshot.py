@@ -0,0 +1,120 @@
+import itertools
+import unittest
+
+import numpy as np
+from parameterized import parameterized
+
+from gnnflow import DynamicGraph, TemporalSampler
+
+MB = 1 << 20
+
+default_config = {
+    "initial_pool_size": 1 * MB,
+    "maximum_pool_size": 2 * MB,
+    "mem_resource_type": "cuda",
+    "minimum_block_size": 64,
+    "blocks_to_preallocate": 128,
+    "insertion_policy": "insert",
+    "backend": "cpu",
+}
+
+
+class TestSnapshot(unittest.TestCase):
+
+    @parameterized.expand(itertools.product(["insert", "replace"],
+                                            ["recent", "uniform"]))
+    def test_snapshot(self, insertion_policy, sample_strategy):
+        rng = np.random.default_rng(0)
+        source_vertices = rng.integers(0, 5, 60)
+        target_vertices = rng.integers(0, 5, 60)
+        timestamps = np.arange(60) / 2
+        graphs = []
+        for _ in range(2):
+            config = default_config.copy()
+            config["minimum_block_size"] = 4
+            config["insertion_policy"] = insertion_policy
+            dgraph = DynamicGraph(**config)
+            for i in range(0, 40, 20):
+                dgraph.add_edges(source_vertices[i:i + 20],
+                                 target_vertices[i:i + 20],
+                                 timestamps[i:i + 20], add_reverse=True)
+            graphs.append(dgraph)
+        expected, dgraph = graphs
+
+        with dgraph.snapshot() as snapshot:
+            for i in range(40, 60, 10):
+                dgraph.add_edges(source_vertices[i:i + 10],
+                                 target_vertices[i:i + 10],
+                                 timestamps[i:i + 10], add_reverse=True)
+            dgraph.add_edges(np.array([7]), np.array([8]), np.array([30]))
+            with self.assertRaises(RuntimeError):
+                dgraph.delete_edges(np.array([0]))
+
+            for node in range(9):
+                for expected_array, array in zip(
+                        expected.get_temporal_neighbors(node),
+                        snapshot.get_temporal_neighbors(node)):
+                    self.assertEqual(array.tolist(), expected_array.tolist())
+
+            root_nodes = np.arange(9).repeat(2)
+            root_timestamps = np.tile(np.array([15, 40], dtype=np.float32),
+                                      9)
+            blocks = []
+            for graph in [expected, snapshot]:
+                sampler = TemporalSampler(
+                    graph, [4], sample_strategy=sample_strategy, seed=0)
+                blocks.append(sampler.sample_layer(
+                    root_nodes, root_timestamps, 0, 0))
+            self.assertEqual(blocks[1].edata['ID'].tolist(),
+                             blocks[0].edata['ID'].tolist())
+            self.assertEqual(blocks[1].srcdata['ts'].tolist(),
+                             blocks[0].srcdata['ts'].tolist())
+
+        self.assertEqual(dgraph.out_degree([7]).tolist(), [1])
+        dgraph.delete_edges(np.array([0]))
+        print("Test snapshot passed (cpu backend) (insertion_policy: {}, "
+              "sample_strategy: {})".format(insertion_policy, sample_strategy))
+
+    def test_snapshot_range_queries(self):
+        config = default_config.copy()
+        config["minimum_block_size"] = 4
+        rng = np.random.default_rng(0)
+        source_vertices = rng.integers(0, 5, 60)
+        target_vertices = rng.integers(0, 5, 60)
+        timestamps = np.arange(60) / 2
+        expected = DynamicGraph(**config)
+        expected.add_edges(source_vertices[:30], target_vertices[:30],
+                           timestamps[:30])
+        dgraph = DynamicGraph(**config)
+        dgraph.add_edges(source_vertices[:30], target_vertices[:30],
+                         timestamps[:30])
+
+        with dgraph.snapshot() as snapshot:
+            # appended to the tails, in new blocks and for new vertices
+            dgraph.add_edges(source_vertices[30:], target_vertices[30:],
+                             timestamps[30:])
+            dgraph.add_edges(np.array([7]), np.array([8]), np.array([40]))
+
+            vertices = np.arange(9)
+            for expected_array, array in zip(
+                    expected.neighbors_in_range(vertices, 5, 100),
+                    snapshot.neighbors_in_range(vertices, 5, 100)):
+                self.assertEqual(array.tolist(), expected_array.tolist())
+            for expected_array, array in zip(expected.to_csr(),
+                                             snapshot.to_csr()):
+                self.assertEqual(array.tolist(), expected_array.tolist())
+            for expected_array, array in zip(
+                    expected.to_csr(vertices=vertices),
+                    snapshot.to_csr(vertices=vertices)):
+                self.assertEqual(array.tolist(), expected_array.tolist())
+            # the node and edge sets and the linked lists are pinned too
+            view = snapshot._dgraph
+            self.assertEqual(view.nodes().tolist(), expected.nodes().tolist())
+            self.assertEqual(view.edges().tolist(), expected.edges().tolist())
+            self.assertEqual(view.avg_linked_list_length(),
+                             expected.avg_linked_list_length())
+        print("Test snapshot range queries passed (cpu backend)")
+
+
+if __name__ == '__main__':
+    unittest.main()
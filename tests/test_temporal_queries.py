@@ -0,0 +1,100 @@
+import itertools
+import unittest
+
+import numpy as np
+from parameterized import parameterized
+
+from gnnflow import DynamicGraph
+
+MB = 1 << 20
+
+default_config = {
+    "initial_pool_size": 1 * MB,
+    "maximum_pool_size": 2 * MB,
+    "mem_resource_type": "cuda",
+    "minimum_block_size": 64,
+    "blocks_to_preallocate": 128,
+    "insertion_policy": "insert",
+    "backend": "cpu",
+}
+
+
+class TestTemporalQueries(unittest.TestCase):
+
+    @parameterized.expand(itertools.product([False, True]))
+    def test_out_degree_before(self, delete_edges):
+        config = default_config.copy()
+        config["minimum_block_size"] = 4
+        dgraph = DynamicGraph(**config)
+        rng = np.random.default_rng(0)
+        source_vertices = rng.integers(0, 10, 200)
+        target_vertices = rng.integers(0, 10, 200)
+        timestamps = np.arange(200) / 4
+        for i in range(0, 200, 25):
+            dgraph.add_edges(source_vertices[i:i + 25],
+                             target_vertices[i:i + 25],
+                             timestamps[i:i + 25], add_reverse=True)
+        if delete_edges:
+            dgraph.delete_edges(rng.choice(200, 50, replace=False))
+
+        vertices = rng.integers(0, 12, 1000)
+        before = (rng.random(1000) * 60).astype(np.float32)
+        degrees = dgraph.out_degree(vertices, before=before)
+        for vertex, timestamp, degree in zip(vertices, before, degrees):
+            _, neighbor_timestamps, _ = dgraph.get_temporal_neighbors(vertex)
+            self.assertEqual(degree, np.sum(neighbor_timestamps < timestamp))
+
+        self.assertEqual(
+            dgraph.out_degree(np.arange(10), before=100).tolist(),
+            dgraph.out_degree(np.arange(10)).tolist())
+        print("Test out degree before passed (cpu backend) "
+              "(delete_edges: {})".format(delete_edges))
+
+    @parameterized.expand(itertools.product([True, False]))
+    def test_neighbors_in_range(self, delete_edges):
+        config = default_config.copy()
+        config["minimum_block_size"] = 4
+        dgraph = DynamicGraph(**config)
+        rng = np.random.default_rng(0)
+        source_vertices = rng.integers(0, 10, 200)
+        target_vertices = rng.integers(0, 10, 200)
+        timestamps = np.arange(200) / 4
+        for i in range(0, 200, 25):
+            dgraph.add_edges(source_vertices[i:i + 25],
+                             target_vertices[i:i + 25],
+                             timestamps[i:i + 25], add_reverse=True)
+        if delete_edges:
+            dgraph.delete_edges(rng.choice(200, 50, replace=False))
+
+        vertices = rng.integers(0, 12, 500)
+        t_start = (rng.random(500) * 60 - 5).astype(np.float32)
+        t_end = t_start + (rng.random(500) * 20).astype(np.float32)
+        offsets, neighbors, neighbor_timestamps, edge_ids = \
+            dgraph.neighbors_in_range(vertices, t_start, t_end)
+        self.assertEqual(len(offsets), len(vertices) + 1)
+        for i, vertex in enumerate(vertices):
+            expected = dgraph.get_temporal_neighbors(vertex)
+            mask = (expected[1] >= t_start[i]) & (expected[1] < t_end[i])
+            row = slice(offsets[i], offsets[i + 1])
+            self.assertEqual(neighbors[row].tolist(),
+                             expected[0][mask][::-1].tolist())
+            self.assertEqual(neighbor_timestamps[row].tolist(),
+                             expected[1][mask][::-1].tolist())
+            self.assertEqual(edge_ids[row].tolist(),
+                             expected[2][mask][::-1].tolist())
+
+        # the scalar time window is broadcast to all vertices
+        offsets, _, neighbor_timestamps, _ = dgraph.neighbors_in_range(
+            np.arange(10), 10, 20)
+        self.assertTrue(np.all((neighbor_timestamps >= 10) &
+                               (neighbor_timestamps < 20)))
+        self.assertEqual(
+            np.diff(offsets).tolist(),
+            (dgraph.out_degree(np.arange(10), before=20) -
+             dgraph.out_degree(np.arange(10), before=10)).tolist())
+        print("Test neighbors in range passed (cpu backend) "
+              "(delete_edges: {})".format(delete_edges))
+
+
+if __name__ == '__main__':
+    unittest.main()
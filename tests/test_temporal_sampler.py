@@ -4,9 +4,15 @@ import unittest
 import numpy as np
 from parameterized import parameterized
 
-from gnnflow import DynamicGraph, TemporalSampler
+from gnnflow import DynamicGraph, SamplingPipeline, TemporalSampler
 from gnnflow.utils import build_dynamic_graph, load_dataset
 
+try:
+    import libgnnflow  # noqa: F401
+    has_cuda_backend = True
+except ImportError:
+    has_cuda_backend = False
+
 MB = 1 << 20
 GB = 1 << 30
 
@@ -19,6 +25,16 @@ default_config = {
     "insertion_policy": "insert",
 }
 
+cpu_config = {
+    "initial_pool_size": 1 * MB,
+    "maximum_pool_size": 2 * MB,
+    "mem_resource_type": "cuda",
+    "minimum_block_size": 64,
+    "blocks_to_preallocate": 128,
+    "insertion_policy": "insert",
+    "backend": "cpu",
+}
+
 
 class TestTemporalSampler(unittest.TestCase):
 
@@ -723,5 +739,371 @@ class TestTemporalSampler(unittest.TestCase):
                 print("orgin time: {}".format(time))
 
 
+class TestTemporalSamplerCPU(unittest.TestCase):
+
+    def test_sample_layer(self):
+        config = cpu_config.copy()
+        dgraph = DynamicGraph(**config)
+        source_vertices = np.array([0, 0, 0, 1, 1, 1, 2, 2, 2])
+        target_vertices = np.array([1, 2, 3, 1, 2, 3, 1, 2, 3])
+        timestamps = np.array([0, 1, 2, 0, 1, 2, 0, 1, 2])
+        dgraph.add_edges(source_vertices, target_vertices,
+                         timestamps, add_reverse=False)
+
+        sampler = TemporalSampler(dgraph, [2])
+        target_vertices = np.array([0, 1, 2, 0])
+        block = sampler.sample_layer(target_vertices,
+                                     np.array([1.5, 1.5, 1.5, 1.5]), 0, 0)
+        self.assertEqual(block.srcdata['ID'].tolist(), [
+            0, 1, 2, 0,
+            2, 1, 2, 1, 2, 1, 2, 1])
+        self.assertEqual(block.srcdata['ts'].tolist(), [
+            1.5, 1.5, 1.5, 1.5,
+            1, 0, 1, 0, 1, 0, 1, 0])
+        self.assertEqual(block.edata['dt'].tolist(), [
+            0.5, 1.5, 0.5, 1.5, 0.5, 1.5, 0.5, 1.5])
+        self.assertEqual(block.edata['ID'].tolist(), [1, 0, 4, 3, 7, 6, 1, 0])
+        self.assertEqual(block.num_src_nodes(), 12)
+        self.assertEqual(block.num_dst_nodes(), 4)
+        self.assertEqual(block.edges()[0].tolist(), [4, 5, 6, 7, 8, 9, 10, 11])
+        self.assertEqual(block.edges()[1].tolist(), [0, 0, 1, 1, 2, 2, 3, 3])
+        print("Test sample_layer passed (cpu backend)")
+
+    def test_sample_layer_uniform(self):
+        config = cpu_config.copy()
+        config["minimum_block_size"] = 2
+        dgraph = DynamicGraph(**config)
+        source_vertices = np.array([0, 0, 0, 1, 1, 1, 2, 2, 2])
+        target_vertices = np.array([1, 2, 3, 1, 2, 3, 1, 2, 3])
+        timestamps = np.array([0, 1, 2, 0, 1, 2, 0, 1, 2])
+        dgraph.add_edges(source_vertices, target_vertices,
+                         timestamps, add_reverse=False)
+        dgraph.add_edges(source_vertices, target_vertices,
+                         timestamps + 3, add_reverse=False)
+
+        sampler = TemporalSampler(dgraph, [4], sample_strategy="uniform")
+        target_vertices = np.array([0, 1, 2, 3])
+        block = sampler.sample_layer(target_vertices,
+                                     np.array([4.5, 4.5, 4.5, 4.5]), 0, 0)
+        self.assertEqual(block.num_dst_nodes(), 4)
+        self.assertEqual(block.num_src_nodes(), 4 + 3 * 4)
+        self.assertEqual(block.edges()[1].tolist(), [0] * 4 + [1] * 4 + [2] * 4)
+        self.assertTrue(np.all(block.edata['dt'].numpy() > 0))
+        # the sampled edges are ordered from newer to older
+        dt = block.edata['dt'].numpy().reshape(3, 4)
+        self.assertTrue(np.all(np.diff(dt, axis=1) >= 0))
+        print("Test sample_layer uniform passed (cpu backend)")
+
+    def test_sample_multi_layers_multi_snapshots(self):
+        config = cpu_config.copy()
+        dgraph = DynamicGraph(**config)
+        source_vertices = np.array(
+            [0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 2, 2, 2, 2, 2, 2])
+        target_vertices = np.array(
+            [1, 2, 3, 4, 5, 6, 1, 2, 3, 4, 5, 6, 1, 2, 3, 4, 5, 6])
+        timestamps = np.array(
+            [0, 1, 2, 3, 4, 5, 0, 1, 2, 3, 4, 5, 0, 1, 2, 3, 4, 5])
+        dgraph.add_edges(source_vertices, target_vertices,
+                         timestamps, add_reverse=False)
+
+        sampler = TemporalSampler(dgraph, [2, 2], num_snapshots=2,
+                                  snapshot_time_window=1)
+        blocks = sampler.sample(np.array([0, 1, 2]), np.array([5, 5, 5]))
+
+        # root -> layer 1, timestamp range: [4, 5)
+        block = blocks[1][1]
+        self.assertEqual(block.srcdata['ID'].tolist(), [0, 1, 2, 5, 5, 5])
+        self.assertEqual(block.srcdata['ts'].tolist(), [5, 5, 5, 4, 4, 4])
+        self.assertEqual(block.edata['ID'].tolist(), [4, 10, 16])
+
+        # root -> layer 1, timestamp range: [3, 4)
+        block = blocks[1][0]
+        self.assertEqual(block.srcdata['ID'].tolist(), [0, 1, 2, 4, 4, 4])
+        self.assertEqual(block.edata['ID'].tolist(), [3, 9, 15])
+
+        # layer 1 -> layer 0, timestamp range: [4, 5)
+        block = blocks[0][1]
+        self.assertEqual(block.srcdata['ID'].tolist(), [
+            0, 1, 2, 5, 5, 5,
+            5, 5, 5])
+        self.assertEqual(block.edata['dt'].tolist(), [1, 1, 1])
+        self.assertEqual(block.edges()[1].tolist(), [0, 1, 2])
+        print("Test sample_multi_layers_multi_snapshots passed (cpu backend)")
+
+    @unittest.skipIf(not has_cuda_backend, "libgnnflow is not available")
+    def test_recent_sampling_matches_cuda(self):
+        num_nodes = 100
+        num_edges = 10000
+        rng = np.random.default_rng(0)
+        source_vertices = rng.integers(0, num_nodes, num_edges)
+        target_vertices = rng.integers(0, num_nodes, num_edges)
+        timestamps = np.sort(rng.random(num_edges) * 1000).astype(np.float32)
+
+        samplers = []
+        for backend in ["cpu", "cuda"]:
+            config = cpu_config.copy()
+            config["minimum_block_size"] = 16
+            config["backend"] = backend
+            dgraph = DynamicGraph(**config)
+            for i in range(0, num_edges, 1000):
+                dgraph.add_edges(source_vertices[i:i + 1000],
+                                 target_vertices[i:i + 1000],
+                                 timestamps[i:i + 1000], add_reverse=True)
+            samplers.append(TemporalSampler(
+                dgraph, [10, 5], num_snapshots=2, snapshot_time_window=100))
+
+        root_nodes = rng.integers(0, num_nodes, 600)
+        root_timestamps = (rng.random(600) * 1000).astype(np.float32)
+        cpu_blocks = samplers[0].sample(root_nodes, root_timestamps)
+        cuda_blocks = samplers[1].sample(root_nodes, root_timestamps)
+        for cpu_layer, cuda_layer in zip(cpu_blocks, cuda_blocks):
+            for cpu_block, cuda_block in zip(cpu_layer, cuda_layer):
+                self.assertEqual(cpu_block.srcdata['ID'].tolist(),
+                                 cuda_block.srcdata['ID'].tolist())
+                self.assertEqual(cpu_block.srcdata['ts'].tolist(),
+                                 cuda_block.srcdata['ts'].tolist())
+                self.assertEqual(cpu_block.edata['ID'].tolist(),
+                                 cuda_block.edata['ID'].tolist())
+                self.assertEqual(cpu_block.edges()[1].tolist(),
+                                 cuda_block.edges()[1].tolist())
+        print("Test recent sampling matches cuda passed (cpu backend)")
+
+    def test_sampling_result_arenas(self):
+        config = cpu_config.copy()
+        config["minimum_block_size"] = 4
+        dgraph = DynamicGraph(**config)
+        rng = np.random.default_rng(0)
+        sampler = TemporalSampler(dgraph, [4, 4])
+        # the blocks of the earlier batches and copies of their data
+        blocks = []
+        for step in range(5):
+            dgraph.add_edges(rng.integers(0, 10, 100),
+                             rng.integers(0, 10, 100),
+                             np.arange(step * 100, (step + 1) * 100),
+                             add_reverse=False)
+            end_timestamp = (step + 1) * 100
+            results = sampler._sampler.sample(
+                np.arange(10), np.full(10, end_timestamp, dtype=np.float32))
+            for result in itertools.chain(*results):
+                ids, timestamps = result.arenas()
+                for field in [result.row(), result.col(),
+                              result.all_nodes(), result.eids()]:
+                    self.assertTrue(np.shares_memory(field, ids))
+                for field in [result.all_timestamps(),
+                              result.delta_timestamps()]:
+                    self.assertTrue(np.shares_memory(field, timestamps))
+                self.assertEqual(len(ids), 3 * len(result.row()) +
+                                 result.num_src_nodes())
+
+                # the block shares the memory of the result
+                block = sampler._to_dgl_block_layer_snapshot(result)
+                self.assertTrue(np.shares_memory(
+                    block.srcdata['ID'].numpy(), ids))
+                self.assertTrue(np.shares_memory(
+                    block.edata['dt'].numpy(), timestamps))
+                self.assertEqual(block.srcdata['ID'].tolist(),
+                                 result.all_nodes().tolist())
+                self.assertEqual(block.edata['ID'].tolist(),
+                                 result.eids().tolist())
+                # NB: the edge ids are the timestamps of the edges
+                self.assertTrue(
+                    np.all(block.edata['ID'].numpy() < end_timestamp))
+                blocks.append((block, block.srcdata['ID'].tolist(),
+                               block.edata['ID'].tolist(),
+                               block.edata['dt'].tolist()))
+
+            # the later batches do not overwrite the earlier blocks
+            for block, ids, eids, delta_timestamps in blocks:
+                self.assertEqual(block.srcdata['ID'].tolist(), ids)
+                self.assertEqual(block.edata['ID'].tolist(), eids)
+                self.assertEqual(block.edata['dt'].tolist(),
+                                 delta_timestamps)
+        print("Test sampling result arenas passed (cpu backend)")
+
+    @parameterized.expand([("time_decay",), ("weighted",)])
+    def test_weighted_sampling(self, sample_strategy):
+        config = cpu_config.copy()
+        config["minimum_block_size"] = 4
+        dgraph = DynamicGraph(**config)
+        # edge i: 0 -> i at time i
+        num_edges = 30
+        edge_weights = (np.arange(num_edges) % 3).astype(np.float64)
+        sampler = TemporalSampler(dgraph, [5], sample_strategy=sample_strategy,
+                                  decay_rate=0.2, edge_weights=edge_weights)
+
+        for begin, end in [(0, 10), (10, 30)]:
+            # the second batch extends the prefix sums of the tail
+            dgraph.add_edges(np.zeros(end - begin, dtype=np.int64),
+                             np.arange(begin, end),
+                             np.arange(begin, end).astype(np.float32))
+            sampler.sample_layer(np.array([0]), np.array([end]), 0, 0)
+        dgraph.delete_edges(np.array([num_edges - 1]))
+
+        num_roots = 4000
+        block = sampler.sample_layer(np.zeros(num_roots, dtype=np.int64),
+                                     np.full(num_roots, 100), 0, 0)
+        self.assertEqual(block.num_dst_nodes(), num_roots)
+        self.assertEqual(block.num_src_nodes(), num_roots * 6)
+        self.assertEqual(block.edges()[1].tolist(),
+                         np.repeat(np.arange(num_roots), 5).tolist())
+        eids = block.edata['ID'].numpy()
+        self.assertTrue(np.all(eids == block.srcdata['ID'][num_roots:].numpy()))
+        # the sampled edges are ordered from newer to older
+        dt = block.edata['dt'].numpy().reshape(num_roots, 5)
+        self.assertTrue(np.all(np.diff(dt, axis=1) >= 0))
+
+        if sample_strategy == "time_decay":
+            expected = np.exp(0.2 * np.arange(num_edges))
+        else:
+            expected = edge_weights.copy()
+        expected[num_edges - 1] = 0
+        expected /= expected.sum()
+        frequencies = np.bincount(eids, minlength=num_edges) / len(eids)
+        self.assertTrue(np.all(frequencies[expected == 0] == 0))
+        np.testing.assert_allclose(frequencies, expected, atol=0.01)
+        print("Test weighted sampling passed (cpu backend) "
+              "(sample_strategy: {})".format(sample_strategy))
+
+    @parameterized.expand([(1, 0), (2, 0), (1, 8)])
+    def test_dedup_frontier(self, num_snapshots, cache_size):
+        config = cpu_config.copy()
+        config["minimum_block_size"] = 4
+        dgraph = DynamicGraph(**config)
+        rng = np.random.default_rng(0)
+        dgraph.add_edges(rng.integers(0, 10, 300), rng.integers(0, 10, 300),
+                         np.sort(rng.random(300) * 100).astype(np.float32),
+                         add_reverse=True)
+
+        kwargs = dict(num_snapshots=num_snapshots,
+                      snapshot_time_window=20 if num_snapshots > 1 else 0)
+        sampler = TemporalSampler(dgraph, [3, 3], **kwargs)
+        dedup_sampler = TemporalSampler(dgraph, [3, 3], dedup_frontier=True,
+                                        cache_size=cache_size, **kwargs)
+        for _ in range(5):
+            # duplicate (vertex, timestamp) pairs
+            vertices = rng.integers(0, 10, 32)
+            timestamps = rng.integers(5, 10, 32).astype(np.float32) * 10
+            blocks = sampler.sample(vertices, timestamps)
+            dedup_blocks = dedup_sampler.sample(vertices, timestamps)
+            for layer_blocks, dedup_layer_blocks in zip(blocks, dedup_blocks):
+                for block, dedup_block in zip(layer_blocks,
+                                              dedup_layer_blocks):
+                    self.assertEqual(block.num_dst_nodes(),
+                                     dedup_block.num_dst_nodes())
+                    self.assertEqual(
+                        [edges.tolist() for edges in block.edges()],
+                        [edges.tolist() for edges in dedup_block.edges()])
+                    for key in ['ID', 'ts']:
+                        self.assertEqual(
+                            block.srcdata[key].tolist(),
+                            dedup_block.srcdata[key].tolist())
+                    for key in ['ID', 'dt']:
+                        self.assertEqual(
+                            block.edata[key].tolist(),
+                            dedup_block.edata[key].tolist())
+
+        stats = dedup_sampler.frontier_stats()
+        self.assertLess(stats["num_unique_targets"], stats["num_targets"])
+        print("Test dedup frontier passed (cpu backend) "
+              "(num_snapshots: {}, cache_size: {})".format(
+                  num_snapshots, cache_size))
+
+    @parameterized.expand(itertools.product([[4], [3, 2]], [None, 40]))
+    def test_sampling_cache(self, fanouts, retention_window):
+        config = cpu_config.copy()
+        config["minimum_block_size"] = 4
+        config["retention_window"] = retention_window
+        dgraph = DynamicGraph(**config)
+        rng = np.random.default_rng(0)
+        sampler = TemporalSampler(dgraph, fanouts)
+        cached_sampler = TemporalSampler(dgraph, fanouts, cache_size=8)
+
+        for step in range(10):
+            timestamps = np.sort(rng.random(20) * 10 + step * 10)
+            dgraph.add_edges(rng.integers(0, 12, 20), rng.integers(0, 12, 20),
+                             timestamps.astype(np.float32), add_reverse=False)
+            if step == 5:
+                dgraph.delete_edges(rng.choice(100, 20, replace=False))
+            for _ in range(3):
+                # repeated vertices at nearby (past and current) timestamps
+                vertices = rng.integers(0, 12, 16)
+                query_timestamps = (step * 10 + rng.integers(0, 3, 16) * 5
+                                    ).astype(np.float32)
+                blocks = sampler.sample(vertices, query_timestamps)
+                cached_blocks = cached_sampler.sample(vertices,
+                                                      query_timestamps)
+                for block, cached_block in zip(blocks, cached_blocks):
+                    for key in ['ID', 'ts']:
+                        self.assertEqual(
+                            block[0].srcdata[key].tolist(),
+                            cached_block[0].srcdata[key].tolist())
+                    for key in ['ID', 'dt']:
+                        self.assertEqual(
+                            block[0].edata[key].tolist(),
+                            cached_block[0].edata[key].tolist())
+
+        stats = cached_sampler.cache_stats()
+        self.assertGreater(stats["hits"], 0)
+        self.assertGreater(stats["misses"], 0)
+        self.assertAlmostEqual(
+            stats["hit_rate"],
+            stats["hits"] / (stats["hits"] + stats["misses"]))
+        self.assertLessEqual(stats["num_entries"], 8)
+        self.assertGreater(stats["evictions"], 0)
+        self.assertEqual(sampler.cache_stats(), {})
+
+        cached_sampler.clear_cache()
+        self.assertEqual(cached_sampler.cache_stats()["num_entries"], 0)
+        with self.assertRaises(ValueError):
+            TemporalSampler(dgraph, fanouts, sample_strategy="uniform",
+                            cache_size=8)
+        print("Test sampling cache passed (cpu backend) "
+              "(fanouts: {}, retention_window: {})".format(
+                  fanouts, retention_window))
+
+    @parameterized.expand(itertools.product(["recent", "uniform"], [0, 1, 3]))
+    def test_sampling_pipeline(self, sample_strategy, prefetch):
+        config = cpu_config.copy()
+        config["minimum_block_size"] = 4
+        dgraph = DynamicGraph(**config)
+        rng = np.random.default_rng(0)
+        dgraph.add_edges(rng.integers(0, 10, 200), rng.integers(0, 10, 200),
+                         np.arange(200), add_reverse=False)
+        batches = [(rng.integers(0, 10, 8),
+                    rng.integers(50, 200, 8).astype(np.float32),
+                    np.arange(8) + i) for i in range(10)]
+
+        sampler = TemporalSampler(dgraph, [4, 4], sample_strategy, seed=1)
+        expected = [sampler.sample(nodes, ts) for nodes, ts, _ in batches]
+
+        # the batches are sampled in order, so the same seed gives the same
+        # samples
+        sampler = TemporalSampler(dgraph, [4, 4], sample_strategy, seed=1)
+        pipeline = SamplingPipeline(sampler, batches, prefetch=prefetch)
+        self.assertEqual(len(pipeline), len(batches))
+        num_batches = 0
+        for (batch, mfgs), expected_mfgs, expected_batch in zip(
+                pipeline, expected, batches):
+            self.assertIs(batch, expected_batch)
+            for blocks, expected_blocks in zip(mfgs, expected_mfgs):
+                for block, expected_block in zip(blocks, expected_blocks):
+                    self.assertEqual(block.srcdata['ID'].tolist(),
+                                     expected_block.srcdata['ID'].tolist())
+                    self.assertEqual(block.edata['ID'].tolist(),
+                                     expected_block.edata['ID'].tolist())
+            num_batches += 1
+        self.assertEqual(num_batches, len(batches))
+
+        # the pending requests are cancelled or finished on early exit
+        for _ in SamplingPipeline(sampler, batches, prefetch=prefetch):
+            break
+        future = sampler.sample_async(*batches[0][:2])
+        self.assertEqual(len(future.result()), 2)
+        sampler.shutdown()
+        print("Test sampling pipeline passed (cpu backend) "
+              "(sample_strategy: {}, prefetch: {})".format(
+                  sample_strategy, prefetch))
+
+
 if __name__ == '__main__':
     unittest.main()